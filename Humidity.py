@@ -7,10 +7,15 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QPushButton, QFrame, 
                              QGridLayout, QTabWidget, QGroupBox, QProgressBar,
                              QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (QFont, QPixmap)
 import pyqtgraph as pg
 
+from plot_curves import SeriesCurve, TargetLine
+from zone_model import format_reading
+from history_view import HistoryRange
+from rolling_stats import format_summary, format_duration
+
 
 class Humidity_Dashboard(QMainWindow):
     def __init__(self, back_to_main, main_system=None):
@@ -39,10 +44,8 @@ class Humidity_Dashboard(QMainWindow):
         # Setup UI
         self.initUI()
         
-        # Start timer for real-time updates
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_values)
-        self.timer.start(1000)
+        # Real-time updates run on the main system's scheduler while shown
+        self.update_task = None
         
     def initUI(self):
         # Create central widget
@@ -182,7 +185,7 @@ class Humidity_Dashboard(QMainWindow):
                     background-color: #2980b9;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_humidifier)
+            self.power_btn.clicked.connect(lambda: self.toggle_humidifier())
         # Power button
         else:
             self.power_btn = QPushButton("💧 Humidifier OFF")
@@ -198,13 +201,25 @@ class Humidity_Dashboard(QMainWindow):
                     background-color: #1abc9c;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_humidifier)
+            self.power_btn.clicked.connect(lambda: self.toggle_humidifier())
 
 
 
     def go_back(self):
         self.back_to_main()
         self.close()    
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.update_task is None:
+            self.update_task = self.main_system.scheduler.add_task(
+                f"{type(self).__name__}.update_values", self.update_values, period=1.0)
+
+    def closeEvent(self, event):
+        if self.update_task is not None:
+            self.main_system.scheduler.remove_task(self.update_task)
+            self.update_task = None
+        super().closeEvent(event)
     
     def create_humidity_control_section(self):
         # Create humidity control frame
@@ -311,7 +326,7 @@ class Humidity_Dashboard(QMainWindow):
         humidity_tab = QWidget()
         humidity_layout = QVBoxLayout(humidity_tab)
         self.humidity_graph = self.create_graph("Humidity (%)")
-        self.update_graph(self.humidity_graph, self.humidity_data, '#4ECDC4')
+        self.update_graph(self.humidity_graph, '#4ECDC4')
         humidity_layout.addWidget(self.humidity_graph)
         
         # Add tabs to widget
@@ -490,46 +505,43 @@ class Humidity_Dashboard(QMainWindow):
         return card
     
     def create_graph(self, title):
-        graph = pg.PlotWidget()
+        graph = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         graph.setBackground('w')
         graph.showGrid(x=True, y=True, alpha=0.3)
         graph.setTitle(title)
         graph.setLabel('left', 'Value')
         graph.setLabel('bottom', 'Time')
-        
-        # Disable all mouse interactions
-        graph.setMouseEnabled(x=False, y=False)
+
+        # Zoom and pan along the time axis, double click returns to live
+        graph.setMouseEnabled(x=True, y=False)
         graph.setMenuEnabled(False)
+        graph.enableAutoRange(y=True)
+        graph.setAutoVisible(y=True)
+
+        # Start on the last 24 hours
+        graph.setXRange(self.time_points[0].timestamp(), self.time_points[-1].timestamp(), padding=0)
 
-        # Set the x-axis to display time values
-        axis = graph.getAxis('bottom')
-        axis.setTicks([[(i, self.time_axis[i]) for i in range(0, len(self.time_axis), 4)]])
+        # Plot items are created by the first update and reused afterwards
+        graph.series = None
+        graph.target = None
+        graph.history = None
         
         return graph
     
-    def update_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
+    def update_graph(self, graph, color):
+        # Persisted history of the visible time range, reloaded as the view moves
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+            graph.history = HistoryRange(graph, graph.series, self.main_system.history_store, "humidity")
+        graph.history.refresh()
         
         # Add target humidity line
-        target_pen = pg.mkPen(color='#2980b9', width=2, style=Qt.DashLine)
-        target_line = pg.InfiniteLine(pos=self.target_humidity, angle=0, pen=target_pen, 
-                                       label=f'Target: {self.target_humidity}%', 
-                                       labelOpts={'color': '#2980b9', 'position': 0.95})
-        graph.addItem(target_line)
-    
+        label = f'Target: {self.target_humidity}%'
+        if graph.target is None:
+            graph.target = TargetLine(graph, self.target_humidity, label)
+        else:
+            graph.target.set_value(self.target_humidity, label)
+        
     def generate_humidity_data(self):
         # Generate humidity pattern: fluctuating throughout the day
         base = np.sin(np.linspace(0, 2*np.pi, 25)) * 15 + 60
@@ -549,11 +561,11 @@ class Humidity_Dashboard(QMainWindow):
         self.humidity_data[-1] = self.humidity
         
         # Update graph displays
-        self.update_graph(self.humidity_graph, self.humidity_data, '#4ECDC4')
+        self.update_graph(self.humidity_graph, '#4ECDC4')
         
         # Update summary text
-        avg_humidity = round(np.mean(self.humidity_data), 1)
-        self.summary_text.setText(f"Today's average humidity: {avg_humidity}%\nTarget humidity: {self.target_humidity}%\nHumidifier status: {'ON' if self.humidifier_on else 'OFF'}\nSystem health: Optimal")
+        today = self.main_system.stats["humidity"].today()
+        self.summary_text.setText(f"Today's average humidity: {format_summary(today, '%')}\nTarget humidity: {self.target_humidity}%\nBelow target today: {format_duration(today['below'])}\nHumidifier status: {'ON' if self.humidifier_on else 'OFF'}\nSystem health: Optimal")
         
         # If auto climate is active, manage climate control
         if self.auto_climate_active:
@@ -567,7 +579,7 @@ class Humidity_Dashboard(QMainWindow):
                 for j in range(item.count()):
                     widget = item.itemAt(j).widget()
                     if isinstance(widget, QLabel) and widget.text() != "%":
-                        widget.setText(str(self.humidity))
+                        widget.setText(format_reading(self.humidity))
                         break
                         
         # Find the target humidity card value label and update it
@@ -599,7 +611,7 @@ class Humidity_Dashboard(QMainWindow):
         
         self.main_layout.addWidget(dashboard)
 
-    def toggle_humidifier(self):
+    def toggle_humidifier(self, cause="manual"):
         self.humidifier_on = not self.humidifier_on
         if self.humidifier_on:
             self.power_btn.setText("💧 Humidifier ON")
@@ -616,7 +628,7 @@ class Humidity_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.humidifier_status = False
-            self.main_system.toggle_humidifier()
+            self.main_system.toggle_humidifier(cause)
         else:
             self.power_btn.setText("💧 Humidifier OFF")
             self.power_btn.setStyleSheet("""
@@ -632,7 +644,7 @@ class Humidity_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.humidifier_status = True
-            self.main_system.toggle_humidifier()
+            self.main_system.toggle_humidifier(cause)
 
     def toggle_auto_climate(self):
         self.auto_climate_active = not self.auto_climate_active
@@ -714,7 +726,7 @@ class Humidity_Dashboard(QMainWindow):
         self.update_cards()
         
         # Update graph to show new target line
-        self.update_graph(self.humidity_graph, self.humidity_data, '#4ECDC4')
+        self.update_graph(self.humidity_graph, '#4ECDC4')
         
         # If auto climate is active, check if humidifier needs adjustment
         if self.auto_climate_active:
@@ -727,7 +739,12 @@ class Humidity_Dashboard(QMainWindow):
 
     def manage_climate_control(self):
         # Auto-manage humidifier based on target humidity
-        if self.humidity < (self.target_humidity - 5.0) and not self.humidifier_on:
-            self.toggle_humidifier()
-        elif self.humidity > (self.target_humidity + 5.0) and self.humidifier_on:
-            self.toggle_humidifier()
+        if not self.main_system.sensor_ok("humidity"):
+            # Faulty probe, see AgriculturalMonitoringSystem.check_sensors
+            return
+        band = self.main_system.control_rules.band_for("humidity", 5.0)
+        humidity = self.main_system.control_value("humidity", self.humidity)
+        if humidity < (self.target_humidity - band) and not self.humidifier_on:
+            self.toggle_humidifier("auto")
+        elif humidity > (self.target_humidity + band) and self.humidifier_on:
+            self.toggle_humidifier("auto")
@@ -7,10 +7,15 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QPushButton, QFrame, 
                             QGridLayout, QTabWidget, QGroupBox, QProgressBar,
                             QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (QFont, QPixmap)
 import pyqtgraph as pg
 
+from plot_curves import SeriesCurve, TargetLine
+from zone_model import format_reading
+from history_view import HistoryRange
+from rolling_stats import format_summary, format_duration
+
 
 class Lighting_Dashboard(QMainWindow):
     def __init__(self, back_to_main, main_system=None):
@@ -39,10 +44,8 @@ class Lighting_Dashboard(QMainWindow):
         # Setup UI
         self.initUI()
         
-        # Start timer for real-time updates
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_values)
-        self.timer.start(1000)
+        # Real-time updates run on the main system's scheduler while shown
+        self.update_task = None
         
     def initUI(self):
         # Create central widget
@@ -183,7 +186,7 @@ class Lighting_Dashboard(QMainWindow):
                     background-color: #e67e22;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_grow_lights)
+            self.power_btn.clicked.connect(lambda: self.toggle_grow_lights())
         # Power button
         else:
             self.power_btn = QPushButton("💡 Grow Lights OFF")
@@ -199,12 +202,24 @@ class Lighting_Dashboard(QMainWindow):
                     background-color: #1abc9c;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_grow_lights)
+            self.power_btn.clicked.connect(lambda: self.toggle_grow_lights())
 
     def go_back(self):
         self.back_to_main()
         self.close()    
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.update_task is None:
+            self.update_task = self.main_system.scheduler.add_task(
+                f"{type(self).__name__}.update_values", self.update_values, period=1.0)
+
+    def closeEvent(self, event):
+        if self.update_task is not None:
+            self.main_system.scheduler.remove_task(self.update_task)
+            self.update_task = None
+        super().closeEvent(event)
+
     def create_light_control_section(self):
         # Create light control frame
         light_control_frame = QFrame()
@@ -310,7 +325,7 @@ class Lighting_Dashboard(QMainWindow):
         light_tab = QWidget()
         light_layout = QVBoxLayout(light_tab)
         self.light_graph = self.create_graph("Light Intensity (%)")
-        self.update_graph(self.light_graph, self.light_data, '#FFD700')
+        self.update_graph(self.light_graph, '#FFD700')
         light_layout.addWidget(self.light_graph)
         
         # Add tabs to widget
@@ -489,46 +504,43 @@ class Lighting_Dashboard(QMainWindow):
         return card
     
     def create_graph(self, title):
-        graph = pg.PlotWidget()
+        graph = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         graph.setBackground('w')
         graph.showGrid(x=True, y=True, alpha=0.3)
         graph.setTitle(title)
         graph.setLabel('left', 'Value')
         graph.setLabel('bottom', 'Time')
-        
-        # Disable all mouse interactions
-        graph.setMouseEnabled(x=False, y=False)
+
+        # Zoom and pan along the time axis, double click returns to live
+        graph.setMouseEnabled(x=True, y=False)
         graph.setMenuEnabled(False)
+        graph.enableAutoRange(y=True)
+        graph.setAutoVisible(y=True)
 
-        # Set the x-axis to display time values
-        axis = graph.getAxis('bottom')
-        axis.setTicks([[(i, self.time_axis[i]) for i in range(0, len(self.time_axis), 4)]])
+        # Start on the last 24 hours
+        graph.setXRange(self.time_points[0].timestamp(), self.time_points[-1].timestamp(), padding=0)
+
+        # Plot items are created by the first update and reused afterwards
+        graph.series = None
+        graph.target = None
+        graph.history = None
         
         return graph
     
-    def update_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
+    def update_graph(self, graph, color):
+        # Persisted history of the visible time range, reloaded as the view moves
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+            graph.history = HistoryRange(graph, graph.series, self.main_system.history_store, "light")
+        graph.history.refresh()
         
         # Add target light line
-        target_pen = pg.mkPen(color='#FF8C00', width=2, style=Qt.DashLine)
-        target_line = pg.InfiniteLine(pos=self.target_light, angle=0, pen=target_pen, 
-                                       label=f'Target: {self.target_light}%', 
-                                       labelOpts={'color': '#FF8C00', 'position': 0.95})
-        graph.addItem(target_line)
-    
+        label = f'Target: {self.target_light}%'
+        if graph.target is None:
+            graph.target = TargetLine(graph, self.target_light, label, color='#FF8C00')
+        else:
+            graph.target.set_value(self.target_light, label)
+        
     def generate_light_data(self):
         # Generate light pattern: higher during day, lower at night
         base = np.sin(np.linspace(0, 2*np.pi, 25)) * 25 + 50
@@ -554,11 +566,11 @@ class Lighting_Dashboard(QMainWindow):
         self.light_data[-1] = self.light_intensity
         
         # Update graph displays
-        self.update_graph(self.light_graph, self.light_data, '#FFD700')
+        self.update_graph(self.light_graph, '#FFD700')
         
         # Update summary text
-        avg_light = round(np.mean(self.light_data), 1)
-        self.summary_text.setText(f"Today's average light: {avg_light}%\nTarget light: {self.target_light}%\nGrow lights status: {'ON' if self.grow_lights_on else 'OFF'}\nSystem health: Optimal")
+        today = self.main_system.stats["light"].today()
+        self.summary_text.setText(f"Today's average light: {format_summary(today, '%')}\nTarget light: {self.target_light}%\nBelow target today: {format_duration(today['below'])}\nGrow lights status: {'ON' if self.grow_lights_on else 'OFF'}\nSystem health: Optimal")
         
         # If auto climate is active, manage light control
         if self.auto_climate_active:
@@ -572,7 +584,7 @@ class Lighting_Dashboard(QMainWindow):
                 for j in range(item.count()):
                     widget = item.itemAt(j).widget()
                     if isinstance(widget, QLabel) and widget.text() != "%":
-                        widget.setText(str(self.light_intensity))
+                        widget.setText(format_reading(self.light_intensity))
                         break
                         
         # Find the target light card value label and update it
@@ -604,7 +616,7 @@ class Lighting_Dashboard(QMainWindow):
         
         self.main_layout.addWidget(dashboard)
 
-    def toggle_grow_lights(self):
+    def toggle_grow_lights(self, cause="manual"):
         self.grow_lights_on = not self.grow_lights_on
         if self.grow_lights_on:
             self.power_btn.setText("💡 Grow Lights ON")
@@ -621,7 +633,7 @@ class Lighting_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.light_status = False
-            self.main_system.toggle_light()
+            self.main_system.toggle_light(cause)
         else:
             self.power_btn.setText("💡 Grow Lights OFF")
             self.power_btn.setStyleSheet("""
@@ -637,7 +649,7 @@ class Lighting_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.light_status = True
-            self.main_system.toggle_light()
+            self.main_system.toggle_light(cause)
 
     def toggle_auto_climate(self):
         self.auto_climate_active = not self.auto_climate_active
@@ -719,7 +731,7 @@ class Lighting_Dashboard(QMainWindow):
         self.update_cards()
         
         # Update graph to show new target line
-        self.update_graph(self.light_graph, self.light_data, '#FFD700')
+        self.update_graph(self.light_graph, '#FFD700')
         
         # If auto climate is active, check if grow lights need adjustment
         if self.auto_climate_active:
@@ -730,7 +742,12 @@ class Lighting_Dashboard(QMainWindow):
 
     def manage_light_control(self):
         # Auto-manage grow lights based on target light intensity
-        if self.light_intensity < (self.target_light - 10.0) and not self.grow_lights_on:
-            self.toggle_grow_lights()
-        elif self.light_intensity > (self.target_light + 10.0) and self.grow_lights_on:
-            self.toggle_grow_lights()
+        if not self.main_system.sensor_ok("light"):
+            # Faulty probe, see AgriculturalMonitoringSystem.check_sensors
+            return
+        band = self.main_system.control_rules.band_for("lighting", 10.0)
+        light_intensity = self.main_system.control_value("lighting", self.light_intensity)
+        if light_intensity < (self.target_light - band) and not self.grow_lights_on:
+            self.toggle_grow_lights("auto")
+        elif light_intensity > (self.target_light + band) and self.grow_lights_on:
+            self.toggle_grow_lights("auto")
@@ -1,31 +1,132 @@
-import smbus
 import time
-from flask import Flask, jsonify
+import threading
+from flask import Flask, jsonify, request, Response, g
+
+import hardware
+from metrics import Registry, add_system_metrics, CONTENT_TYPE
+from sample_ring import FIELDS, SampleRing, Sampler, encode_records, pack_columns, to_json
 
 app = Flask(__name__)
-bus = smbus.SMBus(1)
-address = 0x48
+
+# Metrics, served on /metrics next to /sensor
+registry = Registry()
+add_system_metrics(registry)
+i2c_seconds = registry.histogram("i2c_transaction_seconds", "Duration of one PCF8591 channel read")
+i2c_errors = registry.counter("i2c_errors_total", "Failed I2C transactions")
+http_requests = registry.counter("http_requests_total", "HTTP requests served")
+http_seconds = registry.histogram("http_request_seconds", "HTTP request handling time")
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+# Clients seen in the last minute count as connected (HTTP has no sessions)
+CLIENT_WINDOW = 60.0
+clients_seen = {}
+clients_lock = threading.Lock()
+
+
+def connected_clients():
+    now = time.time()
+    with clients_lock:
+        for addr in [a for a, seen in clients_seen.items() if now - seen > CLIENT_WINDOW]:
+            del clients_seen[addr]
+        return {(): len(clients_seen)}
+
+
+registry.gauge("clients_connected", "Distinct clients seen in the last minute", connected_clients)
+
 
 def read_sensor(channel):
-    if channel < 0 or channel > 3:
-        raise ValueError("Channel must be 0-3")
-    
-    control_byte = 0x40 | channel  # Select AINx
-    bus.write_byte(address, control_byte)
-    bus.read_byte(address)  # Dummy read
-    analog_value = bus.read_byte(address)
+    try:
+        with i2c_seconds.time(channel=channel):
+            analog_value = hardware.read_channel(channel)
+    except OSError:
+        i2c_errors.inc(channel=channel)
+        raise
     return analog_value
 
+
+def read_all():
+    return {name: read_sensor(channel) for name, channel in hardware.CHANNELS.items()}
+
+
+# Every second a sample goes to the on-disk ring, so a client that lost the
+# network can fetch what it missed from /backfill
+SAMPLE_PERIOD = 1.0
+ring = SampleRing()
+sampler = Sampler(ring, read_all, SAMPLE_PERIOD)
+registry.gauge("sample_ring_last_seq", "Sequence number of the newest buffered sample",
+               lambda: {(): ring.last_seq})
+
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    http_in_flight.inc()
+    with clients_lock:
+        clients_seen[request.remote_addr] = time.time()
+
+
+@app.after_request
+def finish_request(response):
+    http_requests.inc(path=request.path, status=response.status_code)
+    http_seconds.observe(time.perf_counter() - g.started, path=request.path)
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    http_in_flight.dec()
+
+
 @app.route('/sensor')
 def sensor_data():
-    temperature = read_sensor(0)      # AIN0
-    soil_moisture = read_sensor(1)    # AIN1
-    humidity = read_sensor(2)         # AIN2
+    temperature = read_sensor(hardware.CHANNELS["temperature"])
+    soil_moisture = read_sensor(hardware.CHANNELS["soil_moisture"])
+    humidity = read_sensor(hardware.CHANNELS["humidity"])
     return jsonify({
         "temperature": temperature,
         "soil_moisture": soil_moisture,
-        "humidity": humidity
+        "humidity": humidity,
+        "seq": ring.last_seq
+    })
+
+
+@app.route('/backfill')
+def backfill():
+    # /backfill?since=<seq>[&limit=<n>]: every buffered sample after `seq`
+    since = request.args.get("since", default=0, type=int)
+    limit = request.args.get("limit", default=None, type=int)
+    return jsonify({
+        "fields": ["seq", "ts"] + FIELDS,
+        "first_seq": ring.first_seq,
+        "last_seq": ring.last_seq,
+        "samples": to_json(ring.since(since, limit))
     })
 
+
+@app.route('/history')
+def history():
+    # Buffered samples as one zlib-compressed columnar batch (see
+    # sample_ring.pack_columns), selected by time or by sequence number:
+    #   /history?start=<unix>&end=<unix>   samples with start <= ts < end
+    #   /history?since=<seq>               samples after seq
+    # Either form takes an optional &limit=<n>, and &codec=tsc for the
+    # delta/XOR block codec of ts_codec.py instead of zlib columns.
+    records = ring.select(since=request.args.get("since", default=None, type=int),
+                          start=request.args.get("start", default=None, type=float),
+                          end=request.args.get("end", default=None, type=float),
+                          limit=request.args.get("limit", default=None, type=int))
+    if request.args.get("codec") == "tsc":
+        return Response(encode_records(records), content_type="application/octet-stream",
+                        headers={"X-First-Seq": str(ring.first_seq), "X-Last-Seq": str(ring.last_seq)})
+    return Response(pack_columns(records, ring.first_seq, ring.last_seq),
+                    content_type="application/octet-stream")
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 if __name__ == '__main__':
+    sampler.start()
     app.run(host='0.0.0.0', port=5000)
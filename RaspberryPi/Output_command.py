@@ -1,19 +1,18 @@
 import socket
 import json
-from gpiozero import LED
+import time
 
-# Map device names to GPIO pins
-device_gpio_map = {
-    "HEATING": LED(17),
-    "WATERING": LED(27),
-    "HUMIDIFIER": LED(22),
-    "WATER_PUMP": LED(5),
-    "LIGHTNING": LED(6)
-}
+import devices
+from devices import (registry, connections, clients_connected, command_errors,
+                     apply_seconds, handle_command, METRICS_PORT)
+from metrics import serve_metrics
 
 HOST = ''
 PORT = 65432
 
+devices.start()
+serve_metrics(registry, METRICS_PORT)
+
 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
     s.bind((HOST, PORT))
     s.listen()
@@ -22,23 +21,23 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
     while True:
         conn, addr = s.accept()
         print(f"Connected by {addr}")
+        connections.inc()
+        clients_connected.inc()
         with conn:
             try:
-                data = conn.recv(1024)
+                data = conn.recv(4096)
                 if not data:
                     continue
-
-                device_states = json.loads(data.decode('utf-8'))
-
-                for device, state in device_states.items():
-                    led = device_gpio_map.get(device.upper())
-                    if led:
-                        if state:
-                            led.on()
-                        else:
-                            led.off()
-                    else:
-                        print(f"Unknown device: {device}")
-
+                received = time.perf_counter()
+                reply = handle_command(json.loads(data.decode('utf-8')))
+                apply_seconds.observe(time.perf_counter() - received)
+                try:
+                    conn.sendall(json.dumps(reply).encode('utf-8'))
+                except OSError:
+                    # Clients that only send states may already have closed
+                    pass
             except (ConnectionResetError, json.JSONDecodeError) as e:
+                command_errors.inc()
                 print(f"Error with {addr}: {e}")
+            finally:
+                clients_connected.dec()
@@ -0,0 +1,192 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def parse_clock(value):
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time of day {value}")
+    return hours, minutes
+
+
+def next_clock(hours, minutes, now=None):
+    # Next local wall-clock time hh:mm as a Unix timestamp
+    now = now or datetime.now()
+    at = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if at <= now:
+        at += timedelta(days=1)
+    return at.timestamp()
+
+
+def in_window(on, off, now=None):
+    # True when the local time lies in the daily [on, off) window, which may
+    # wrap around midnight
+    now = now or datetime.now()
+    current = (now.hour, now.minute)
+    if on <= off:
+        return on <= current < off
+    return current >= on or current < off
+
+
+class ActuationSchedule:
+    # Timed device commands run from a timer heap on the Pi, so their timing
+    # does not depend on the GUI sending states. One job per device, a new
+    # job replaces the previous one:
+    #   {"device": "WATER_PUMP", "on_for": 30}              on now, off 30 s later
+    #   {"device": "WATER_PUMP", "on_at": ts, "off_at": ts} Unix timestamps, either optional
+    #   {"device": "LIGHTNING", "daily": {"on": "06:00", "off": "20:00"}}
+    #   {"device": "WATER_PUMP", "cancel": true}
+    # Durations run on a heap of the monotonic clock; on_at/off_at and daily
+    # times on a heap of the wall clock, checked against time.time() every
+    # time the loop wakes (at least every `wall_check` seconds), so a job
+    # queued before NTP set the clock (the Pi has no RTC) or across a clock
+    # step still fires at its wall time. A step of more than
+    # `max_clock_step` seconds re-plans the daily jobs from the new time.
+    # Entries of a replaced job are dropped through a per-device generation
+    # number. Devices whose job ended or was cancelled are kept in `ended`
+    # until take_ended() hands them over.
+    def __init__(self, set_device, wall_check=1.0, max_clock_step=2.0):
+        self.set_device = set_device
+        self.wall_check = wall_check
+        self.max_clock_step = max_clock_step
+        self.clock_offset = time.time() - time.monotonic()
+        # clock -> heap of (due on that clock, order, device, generation, state, repeat)
+        self.heaps = {time.monotonic: [], time.time: []}
+        self.order = itertools.count()
+        self.generation = {}
+        self.jobs = {}
+        self.pending = {}
+        self.ended = set()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="actuation-schedule", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def active_devices(self):
+        with self.condition:
+            return set(self.jobs)
+
+    def describe(self):
+        with self.condition:
+            return {device: dict(job) for device, job in self.jobs.items()}
+
+    def take_ended(self):
+        with self.condition:
+            ended, self.ended = self.ended, set()
+            return ended
+
+    def plan(self, job):
+        # (clock, due, state, repeat) switches of a job; raises ValueError
+        # before anything of the running job is touched
+        now = time.monotonic()
+        if job.get("cancel"):
+            return []
+        if "on_for" in job:
+            duration = float(job["on_for"])
+            if duration <= 0:
+                raise ValueError("on_for must be positive")
+            return [(time.monotonic, now, True, None), (time.monotonic, now + duration, False, None)]
+        if "daily" in job:
+            on = parse_clock(job["daily"]["on"])
+            off = parse_clock(job["daily"]["off"])
+            # Take the current state of the window right away
+            return [(time.monotonic, now, in_window(on, off), None),
+                    (time.time, next_clock(*on), True, "daily"),
+                    (time.time, next_clock(*off), False, "daily")]
+        if "on_at" in job or "off_at" in job:
+            switches = []
+            if "on_at" in job:
+                switches.append((time.time, float(job["on_at"]), True, None))
+            if "off_at" in job:
+                switches.append((time.time, float(job["off_at"]), False, None))
+            return switches
+        raise ValueError("Schedule job needs on_for, on_at/off_at or daily")
+
+    def submit(self, job, devices):
+        device = str(job["device"]).upper()
+        if device not in devices:
+            raise ValueError(f"Unknown device: {device}")
+        switches = self.plan(job)
+        with self.condition:
+            generation = self.generation.get(device, 0) + 1
+            self.generation[device] = generation
+            self.pending[device] = 0
+            if not switches:
+                if self.jobs.pop(device, None) is not None:
+                    self.ended.add(device)
+                return
+            self.jobs[device] = job
+            self.ended.discard(device)
+            for clock, due, state, repeat in switches:
+                self.push(device, generation, clock, due, state, repeat)
+            self.condition.notify()
+
+    def replan(self, device, job):
+        # Under self.condition: the job's entries queued again from now
+        generation = self.generation[device] + 1
+        self.generation[device] = generation
+        self.pending[device] = 0
+        for clock, due, state, repeat in self.plan(job):
+            self.push(device, generation, clock, due, state, repeat)
+
+    def check_clock_step(self):
+        # Under self.condition: daily times were taken from the wall clock
+        # before it stepped (e.g. NTP sync after boot), plan them again
+        offset = time.time() - time.monotonic()
+        stepped = abs(offset - self.clock_offset) > self.max_clock_step
+        self.clock_offset = offset
+        if not stepped:
+            return
+        for device, job in list(self.jobs.items()):
+            if "daily" in job:
+                print(f"Wall clock stepped, re-planning the daily job of {device}")
+                self.replan(device, job)
+
+    def push(self, device, generation, clock, due, state, repeat=None):
+        heapq.heappush(self.heaps[clock], (due, next(self.order), device, generation, state, repeat))
+        self.pending[device] += 1
+
+    def pop_due(self):
+        # The first entry due on its own clock, or None
+        for clock, heap in self.heaps.items():
+            if heap and heap[0][0] <= clock():
+                return heapq.heappop(heap)
+        return None
+
+    def wait_time(self):
+        # Seconds until the next entry may be due (None: no entries); wall
+        # clock entries are re-checked at least every `wall_check` seconds
+        delays = [heap[0][0] - clock() for clock, heap in self.heaps.items() if heap]
+        if self.heaps[time.time]:
+            delays.append(self.wall_check)
+        return max(0.0, min(delays)) if delays else None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    self.check_clock_step()
+                    entry = self.pop_due()
+                    if entry is not None:
+                        break
+                    self.condition.wait(self.wait_time())
+                _, _, device, generation, state, repeat = entry
+                if generation != self.generation[device]:
+                    continue
+                self.pending[device] -= 1
+                if repeat == "daily":
+                    # Queue the same switch for the next day
+                    hours, minutes = parse_clock(self.jobs[device]["daily"]["on" if state else "off"])
+                    self.push(device, generation, time.time, next_clock(hours, minutes), state, "daily")
+                if self.pending[device] == 0:
+                    self.jobs.pop(device, None)
+                    self.ended.add(device)
+            try:
+                self.set_device(device, state)
+            except Exception as e:
+                print(f"Scheduled switch of {device} failed:", e)
@@ -0,0 +1,140 @@
+import threading
+import time
+from gpiozero import LED
+
+import hardware
+from actuation_schedule import ActuationSchedule
+from edge_control import EdgeController
+from metrics import Registry, add_system_metrics
+
+
+# Device side shared by the Pi services: GPIO map, on-time metrics, the
+# edge control loop, timed jobs and the command handler.
+
+# Map device names to GPIO pins
+device_gpio_map = {
+    "HEATING": LED(17),
+    "WATERING": LED(27),
+    "HUMIDIFIER": LED(22),
+    "WATER_PUMP": LED(5),
+    "LIGHTNING": LED(6)
+}
+
+METRICS_PORT = 9102
+
+# Metrics, served on http://<pi>:9102/metrics by the command service
+registry = Registry()
+add_system_metrics(registry)
+connections = registry.counter("connections_total", "Accepted client connections")
+clients_connected = registry.gauge("clients_connected", "Client connections currently open")
+commands = registry.counter("commands_total", "Device commands received")
+command_errors = registry.counter("command_errors_total", "Connections that failed to deliver a command")
+apply_seconds = registry.histogram("command_apply_seconds", "Time from receiving a command to the GPIO being set")
+scheduled_switches = registry.counter("scheduled_switches_total", "Device switches run from the timer heap")
+edge_switches = registry.counter("edge_switches_total", "Device switches decided by the on-Pi control loop")
+
+# Per-device on-time: seconds accumulated while on, plus the running stretch
+on_since = {device: None for device in device_gpio_map}
+on_seconds = {device: 0.0 for device in device_gpio_map}
+
+
+def device_on_time():
+    now = time.monotonic()
+    return {(("device", device),): on_seconds[device] + (now - on_since[device] if on_since[device] is not None else 0.0)
+            for device in device_gpio_map}
+
+
+registry.gauge("device_on_seconds", "Seconds each device has been switched on", device_on_time)
+registry.gauge("device_state", "Current device state (1 = on)",
+               lambda: {(("device", device),): int(on_since[device] is not None) for device in device_gpio_map})
+
+
+device_lock = threading.Lock()
+
+
+def set_device(device, state):
+    with device_lock:
+        apply_device(device, state)
+
+
+def apply_device(device, state):
+    led = device_gpio_map[device]
+    now = time.monotonic()
+    if state:
+        led.on()
+        if on_since[device] is None:
+            on_since[device] = now
+    else:
+        led.off()
+        if on_since[device] is not None:
+            on_seconds[device] += now - on_since[device]
+            on_since[device] = None
+
+
+def device_state(device):
+    return on_since[device] is not None
+
+
+def edge_set_device(device, state):
+    # A timed job has the device until it ends
+    if device in schedule.active_devices():
+        return
+    set_device(device, state)
+    edge_switches.inc(device=device)
+
+
+# Optional on-Pi control loop. The GUI enables it by sending
+#   {"EDGE": {"enabled": true, "rules": [{"sensor": ..., "actuator": ...,
+#             "target": ..., "band": ..., "direction": ...}, ...]}}
+# next to (or instead of) the device states. Devices driven by an edge rule
+# ignore device states sent by the GUI; the rules stay in force when the GUI
+# disconnects.
+edge = EdgeController(hardware.read_all, edge_set_device, device_state)
+
+
+def scheduled_set_device(device, state):
+    set_device(device, state)
+    scheduled_switches.inc(device=device)
+
+
+# Timed commands, run from the Pi's own timer heap:
+#   {"SCHEDULE": [{"device": "WATER_PUMP", "on_for": 30},
+#                 {"device": "LIGHTNING", "daily": {"on": "06:00", "off": "20:00"}}]}
+# A device with a running job ignores plain device states until the job
+# ends or is cancelled ({"device": ..., "cancel": true}), and in the first
+# command after that: it still carries the job's state, the reply tells the
+# GUI the job is over.
+schedule = ActuationSchedule(scheduled_set_device)
+
+
+def start():
+    # Background threads of the device side, started by the serving process
+    edge.start()
+    schedule.start()
+
+
+def handle_command(message):
+    edge_config = message.pop("EDGE", None)
+    if edge_config is not None:
+        edge.configure(edge_config.get("enabled", False), edge_config.get("rules", []))
+    for job in message.pop("SCHEDULE", []):
+        try:
+            schedule.submit(job, device_gpio_map)
+        except (KeyError, TypeError, ValueError) as e:
+            command_errors.inc()
+            print(f"Rejected schedule {job}: {e}")
+    controlled = edge.controlled_devices() | schedule.active_devices() | schedule.take_ended()
+    for device, state in message.items():
+        device = device.upper()
+        if device not in device_gpio_map:
+            print(f"Unknown device: {device}")
+        elif device not in controlled:
+            set_device(device, state)
+            commands.inc(device=device)
+    # Report the actual states so an observing GUI can follow the edge loop
+    return {
+        "states": {device: device_state(device) for device in device_gpio_map},
+        "edge": sorted(edge.controlled_devices()),
+        "schedule": schedule.describe(),
+        "sensors": edge.last_values
+    }
@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class EdgeController:
+    # Hysteresis control run on the Pi itself: sensors are read and GPIOs
+    # driven locally every `period` seconds, so actuation does not depend on
+    # the network. The GUI only pushes the rules (target, band, direction
+    # per actuator) and observes; the last rules stay active if it goes
+    # away.
+    #
+    # A rule: {"sensor": "temperature", "actuator": "HEATING",
+    #          "target": 15.0, "band": 1.0, "direction": "raise"}
+    # plus, optionally, "forecast": the GUI's forecast of the sensor, used
+    # instead of the reading for `forecast_ttl` seconds after the rules
+    # were pushed. Once stale the rule falls back to the reading.
+    def __init__(self, read_sensors, set_device, get_state, period=0.2, forecast_ttl=10.0):
+        self.read_sensors = read_sensors
+        self.set_device = set_device
+        self.get_state = get_state
+        self.period = period
+        self.forecast_ttl = forecast_ttl
+        self.enabled = False
+        self.rules = []
+        self.configured_at = None
+        self.lock = threading.Lock()
+        self.last_values = {}
+        self.last_error = None
+        self.thread = threading.Thread(target=self.run, name="edge-control", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def configure(self, enabled, rules):
+        with self.lock:
+            self.enabled = bool(enabled)
+            self.rules = [dict(rule) for rule in rules]
+            self.configured_at = time.monotonic()
+
+    def controlled_devices(self):
+        with self.lock:
+            if not self.enabled:
+                return set()
+            return {rule["actuator"] for rule in self.rules}
+
+    def run(self):
+        deadline = time.monotonic()
+        while True:
+            with self.lock:
+                enabled, rules, configured_at = self.enabled, list(self.rules), self.configured_at
+            if enabled and rules:
+                try:
+                    self.step(rules, time.monotonic() - configured_at <= self.forecast_ttl)
+                except Exception as e:
+                    self.last_error = str(e)
+                    print("Edge control step failed:", e)
+
+            # Fixed-rate grid, skipping ticks that were missed
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                deadline = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+
+    def step(self, rules, fresh=False):
+        values = self.read_sensors()
+        self.last_values = values
+        for rule in rules:
+            value = values.get(rule["sensor"])
+            if value is None:
+                continue
+            if fresh and rule.get("forecast") is not None:
+                value = rule["forecast"]
+            target = rule["target"]
+            band = rule["band"]
+            on = self.get_state(rule["actuator"])
+            raising = rule.get("direction", "raise") == "raise"
+            low = value < target - band
+            high = value > target + band
+            if not on and (low if raising else high):
+                self.set_device(rule["actuator"], True)
+            elif on and (high if raising else low):
+                self.set_device(rule["actuator"], False)
@@ -0,0 +1,41 @@
+import fcntl
+import threading
+
+import smbus
+
+
+# PCF8591 ADC on I2C bus 1. A channel read is three bus transactions
+# (select, dummy read, read), so it is serialized both between threads and,
+# through a lock file, between the Pi services that share the converter.
+bus = smbus.SMBus(1)
+address = 0x48
+
+LOCK_PATH = "/tmp/pcf8591.lock"
+
+# Sensor name -> ADC input
+CHANNELS = {
+    "temperature": 0,     # AIN0
+    "soil_moisture": 1,   # AIN1
+    "humidity": 2         # AIN2
+}
+
+thread_lock = threading.Lock()
+lock_file = open(LOCK_PATH, "a")
+
+
+def read_channel(channel):
+    if channel < 0 or channel > 3:
+        raise ValueError("Channel must be 0-3")
+    control_byte = 0x40 | channel  # Select AINx
+    with thread_lock:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            bus.write_byte(address, control_byte)
+            bus.read_byte(address)  # Dummy read
+            return bus.read_byte(address)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_all():
+    return {name: read_channel(channel) for name, channel in CHANNELS.items()}
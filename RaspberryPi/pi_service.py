@@ -0,0 +1,192 @@
+import asyncio
+import base64
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import devices
+import hardware
+from devices import registry, connections, clients_connected, command_errors, apply_seconds, handle_command
+from metrics import serve_metrics
+from sample_ring import FIELDS, SampleRing, Sampler, encode_records, to_json
+
+# One service for telemetry and commands, replacing Input_sensor.py and
+# Output_command.py: it owns the I2C bus and the GPIO map and serves every
+# client over one persistent connection carrying newline-delimited JSON.
+#
+#   -> {"id": 1, "op": "read"}
+#   <- {"id": 1, "ok": true, "sensors": {...}, "ts": ...}
+#   -> {"id": 2, "op": "set", "states": {"HEATING": true, "SCHEDULE": [...]}}
+#   <- {"id": 2, "ok": true, "states": {...}, "edge": [...], "schedule": {...},
+#       "sensors": {...}, "ts": ...}        sensors read after the command
+#   -> {"id": 3, "op": "subscribe", "interval": 1.0}
+#   <- {"id": 3, "ok": true}, then {"op": "telemetry", "sensors": {...}, "ts": ...}
+#   -> {"id": 4, "op": "unsubscribe"}
+#   -> {"id": 5, "op": "backfill", "since": 1200}
+#   <- {"id": 5, "ok": true, "fields": [...], "first_seq": ..., "last_seq": ...,
+#       "samples": [[seq, ts, temperature, soil_moisture, humidity], ...]}
+#   -> {"id": 6, "op": "history", "since": 1200}    or "start"/"end", "limit"
+#   <- {"id": 6, "ok": true, "first_seq": ..., "last_seq": ..., "count": ...,
+#       "codec": "tsc", "data": "<base64>"}    one ts_codec block (seq, ts and
+#       every sensor as columns), as served by Input_sensor.py's /history
+#
+# Failed requests are answered with {"id": ..., "ok": false, "error": "..."}.
+
+HOST = ''
+PORT = 65433
+MIN_INTERVAL = 0.1
+SAMPLE_PERIOD = 1.0
+
+i2c_seconds = registry.histogram("i2c_read_all_seconds", "Duration of reading every ADC channel")
+i2c_errors = registry.counter("i2c_errors_total", "Failed I2C transactions")
+requests_total = registry.counter("requests_total", "Requests served")
+
+# Blocking hardware access runs on one worker thread, off the event loop
+hardware_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hardware")
+
+# Samples buffered on disk for clients catching up after an outage
+ring = SampleRing()
+
+
+class SensorCache:
+    # Concurrent reads (requests and subscriptions of every client) share
+    # one I2C pass when the last reading is younger than `max_age`
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.values = None
+        self.taken = 0.0
+
+    async def read(self, max_age=0.0):
+        async with self.lock:
+            if self.values is None or time.monotonic() - self.taken > max_age:
+                loop = asyncio.get_running_loop()
+                started = time.perf_counter()
+                try:
+                    self.values = await loop.run_in_executor(hardware_executor, hardware.read_all)
+                except OSError:
+                    i2c_errors.inc()
+                    raise
+                i2c_seconds.observe(time.perf_counter() - started)
+                self.taken = time.monotonic()
+            return self.values, time.time()
+
+
+class Client:
+    def __init__(self, reader, writer, sensors):
+        self.reader = reader
+        self.writer = writer
+        self.sensors = sensors
+        self.write_lock = asyncio.Lock()
+        self.subscription = None
+
+    async def send(self, message):
+        async with self.write_lock:
+            self.writer.write(json.dumps(message).encode('utf-8') + b"\n")
+            await self.writer.drain()
+
+    async def serve(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except json.JSONDecodeError as e:
+                    command_errors.inc()
+                    await self.send({"ok": False, "error": f"Invalid JSON: {e}"})
+                    continue
+                await self.handle(request)
+        finally:
+            self.unsubscribe()
+
+    async def handle(self, request):
+        request_id = request.get("id")
+        op = request.get("op")
+        requests_total.inc(op=str(op))
+        try:
+            if op == "read":
+                values, ts = await self.sensors.read()
+                reply = {"sensors": values, "ts": ts, "seq": ring.last_seq}
+            elif op == "set":
+                received = time.perf_counter()
+                loop = asyncio.get_running_loop()
+                reply = await loop.run_in_executor(hardware_executor, handle_command, dict(request.get("states", {})))
+                apply_seconds.observe(time.perf_counter() - received)
+                reply["sensors"], reply["ts"] = await self.sensors.read()
+            elif op == "subscribe":
+                self.unsubscribe()
+                interval = max(MIN_INTERVAL, float(request.get("interval", 1.0)))
+                self.subscription = asyncio.ensure_future(self.stream(interval))
+                reply = {}
+            elif op == "unsubscribe":
+                self.unsubscribe()
+                reply = {}
+            elif op == "backfill":
+                loop = asyncio.get_running_loop()
+                records = await loop.run_in_executor(None, ring.since, int(request.get("since", 0)), request.get("limit"))
+                reply = {"fields": ["seq", "ts"] + FIELDS, "first_seq": ring.first_seq,
+                         "last_seq": ring.last_seq, "samples": to_json(records)}
+            elif op == "history":
+                loop = asyncio.get_running_loop()
+                records = await loop.run_in_executor(None, functools.partial(
+                    ring.select, since=request.get("since"), start=request.get("start"),
+                    end=request.get("end"), limit=request.get("limit")))
+                data = await loop.run_in_executor(None, encode_records, records)
+                reply = {"first_seq": ring.first_seq, "last_seq": ring.last_seq, "count": len(records),
+                         "codec": "tsc", "data": base64.b64encode(data).decode("ascii")}
+            else:
+                raise ValueError(f"Unknown op {op}")
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            command_errors.inc()
+            await self.send({"id": request_id, "ok": False, "error": str(e)})
+            return
+        reply.update({"id": request_id, "ok": True})
+        await self.send(reply)
+
+    async def stream(self, interval):
+        next_at = time.monotonic()
+        while True:
+            try:
+                values, ts = await self.sensors.read(max_age=interval / 2)
+                await self.send({"op": "telemetry", "sensors": values, "ts": ts})
+            except OSError as e:
+                await self.send({"op": "telemetry", "error": str(e), "ts": time.time()})
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    def unsubscribe(self):
+        if self.subscription is not None:
+            self.subscription.cancel()
+            self.subscription = None
+
+
+async def handle_client(sensors, reader, writer):
+    addr = writer.get_extra_info("peername")
+    print(f"Connected by {addr}")
+    connections.inc()
+    clients_connected.inc()
+    try:
+        await Client(reader, writer, sensors).serve()
+    except (ConnectionResetError, BrokenPipeError) as e:
+        print(f"Error with {addr}: {e}")
+    finally:
+        clients_connected.dec()
+        writer.close()
+
+
+async def main():
+    # Created inside the running loop (asyncio primitives bind to it on 3.9)
+    sensors = SensorCache()
+    server = await asyncio.start_server(functools.partial(handle_client, sensors), HOST or None, PORT)
+    print(f"Pi service listening on port {PORT}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    devices.start()
+    Sampler(ring, hardware.read_all, SAMPLE_PERIOD).start()
+    serve_metrics(registry, devices.METRICS_PORT)
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+import numpy as np
+
+import ts_codec
+
+
+# One sample: sequence number, Unix time, then the ADC channels in
+# hardware.CHANNELS order (NaN for a failed read). Sequence numbers start at
+# 1; an all-zero slot is empty.
+RECORD = struct.Struct("<Qd3f")
+FIELDS = ["temperature", "soil_moisture", "humidity"]
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples.ring")
+DEFAULT_CAPACITY = 2 * 86400  # two days at 1 Hz
+
+
+class SampleRing:
+    # Bounded on-disk ring of fixed-size sample records: sample `seq` lives
+    # in slot seq % capacity, so the file never grows and the oldest samples
+    # are overwritten first. The newest sequence number is recovered by
+    # scanning the file at start-up.
+    def __init__(self, path=DEFAULT_PATH, capacity=DEFAULT_CAPACITY, fsync_every=60):
+        self.path = path
+        self.capacity = capacity
+        self.fsync_every = fsync_every
+        self.lock = threading.Lock()
+        self.unsynced = 0
+
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self.file = open(path, "r+b")
+        size = capacity * RECORD.size
+        if os.path.getsize(path) != size:
+            self.file.truncate(size)
+
+        self.last_seq = 0
+        self.first_seq = 0
+        self.file.seek(0)
+        for seq, *_ in RECORD.iter_unpack(self.file.read(size)):
+            if seq:
+                self.last_seq = max(self.last_seq, seq)
+        if self.last_seq:
+            self.first_seq = max(1, self.last_seq - capacity + 1)
+
+    def append(self, timestamp, values):
+        with self.lock:
+            seq = self.last_seq + 1
+            row = [values.get(name) for name in FIELDS]
+            record = RECORD.pack(seq, timestamp, *[math.nan if v is None else v for v in row])
+            self.file.seek((seq % self.capacity) * RECORD.size)
+            self.file.write(record)
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_every:
+                os.fsync(self.file.fileno())
+                self.unsynced = 0
+            self.last_seq = seq
+            if not self.first_seq:
+                self.first_seq = seq
+            self.first_seq = max(self.first_seq, seq - self.capacity + 1)
+            return seq
+
+    def since(self, seq, limit=None):
+        # Samples with a sequence number above `seq`, oldest first, as
+        # (seq, ts, temperature, soil_moisture, humidity) tuples
+        with self.lock:
+            start = max(seq + 1, self.first_seq)
+            end = self.last_seq
+            if limit is not None:
+                end = min(end, start + limit - 1)
+            if not self.last_seq or start > end:
+                return []
+            # At most two contiguous reads, split where the ring wraps
+            first = start % self.capacity
+            count = end - start + 1
+            chunks = []
+            head = min(count, self.capacity - first)
+            self.file.seek(first * RECORD.size)
+            chunks.append(self.file.read(head * RECORD.size))
+            if count > head:
+                self.file.seek(0)
+                chunks.append(self.file.read((count - head) * RECORD.size))
+        return [record for record in RECORD.iter_unpack(b"".join(chunks)) if start <= record[0] <= end]
+
+    def ts_at(self, seq):
+        self.file.seek((seq % self.capacity) * RECORD.size)
+        record_seq, ts, *_ = RECORD.unpack(self.file.read(RECORD.size))
+        return ts if record_seq == seq else None
+
+    def seq_range(self, start, end):
+        # Sequence numbers (first, last) of the samples with start <= ts < end,
+        # binary searched over the slots (timestamps grow with the sequence)
+        with self.lock:
+            if not self.last_seq:
+                return None
+
+            def lower_bound(t):
+                lo, hi = self.first_seq, self.last_seq + 1
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    ts = self.ts_at(mid)
+                    if ts is not None and ts < t:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                return lo
+
+            first = lower_bound(start)
+            last = lower_bound(end) - 1
+        return (first, last) if first <= last else None
+
+    def select(self, since=None, start=None, end=None, limit=None):
+        # Samples after sequence number `since`, or else with
+        # start <= ts < end, at most `limit` of them
+        if since is not None:
+            return self.since(since, limit)
+        span = self.seq_range(0.0 if start is None else start, time.time() + 1 if end is None else end)
+        if span is None:
+            return []
+        first, last = span
+        if limit is not None:
+            last = min(last, first + limit - 1)
+        return self.since(first - 1, last - first + 1)
+
+    def close(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+
+class Sampler:
+    # Reads the sensors on a fixed-rate grid from a daemon thread and
+    # records every sample in the ring, whether or not a client is listening
+    def __init__(self, ring, read, period=1.0):
+        self.ring = ring
+        self.read = read
+        self.period = period
+        self.thread = threading.Thread(target=self.run, name="sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        deadline = time.monotonic()
+        while True:
+            try:
+                values = self.read()
+            except OSError as e:
+                print("Sample read failed:", e)
+                values = {}
+            self.ring.append(time.time(), values)
+
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                deadline = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+
+
+# Column types of a packed batch, as NumPy dtype strings for the reader
+COLUMNS = [("seq", "<u8", "Q"), ("ts", "<f8", "d")] + [(name, "<f4", "f") for name in FIELDS]
+MAGIC = b"SAH1"
+
+
+def pack_columns(records, first_seq, last_seq):
+    # Samples as one zlib-compressed columnar batch:
+    #   MAGIC, uint32 header length, JSON header, then each column as a
+    #   little-endian packed array, all in one zlib stream
+    columns = []
+    for i, (name, dtype, code) in enumerate(COLUMNS):
+        column = array(code, (record[i] for record in records))
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns.append(column.tobytes())
+    header = json.dumps({
+        "count": len(records),
+        "columns": [[name, dtype] for name, dtype, _ in COLUMNS],
+        "first_seq": first_seq,
+        "last_seq": last_seq
+    }).encode("utf-8")
+    return zlib.compress(MAGIC + struct.pack("<I", len(header)) + header + b"".join(columns), 6)
+
+
+def encode_records(records):
+    # Samples as one delta/XOR block of ts_codec.py: ts as the timestamps,
+    # seq and every sensor as columns
+    rows = np.array(records, dtype=float).reshape(-1, 2 + len(FIELDS))
+    columns = {"seq": rows[:, 0].astype(np.uint64)}
+    columns.update({name: rows[:, 2 + i].astype(np.float32) for i, name in enumerate(FIELDS)})
+    return ts_codec.encode(rows[:, 1], columns)
+
+
+def to_json(records):
+    # Compact rows for the backfill endpoints; NaN (failed read) -> null
+    return [[seq, ts] + [None if math.isnan(v) else v for v in values] for seq, ts, *values in records]
@@ -0,0 +1,256 @@
+import struct
+
+import numpy as np
+
+
+# Block codec for sensor time series, after Gorilla: delta-of-delta
+# timestamps and delta or XOR encoded values. Gorilla's per-sample
+# variable-length codes are inherently sequential, so each block instead
+# packs its residuals at one fixed width (the widest residual of the block,
+# rounded up to a power of two); encoding and decoding are then whole-array
+# NumPy operations.
+#
+# A block holds one timestamp stream shared by any number of named value
+# columns:
+#   "TSC1", uint32 count, uint8 columns
+#   time:   int64 t0, int64 first delta, uint8 bits, uint32 nbytes, payload
+#           (zigzag delta-of-delta in milliseconds)
+#   column: uint8 name length, name, then
+#           2s dtype, uint8 mode, uint8 bits, uint8 param, uint8 has_nan,
+#           uint64 first, uint32 nbytes, [NaN bitmap], payload
+#     mode 0 (scaled delta): values are integers once multiplied by
+#       10**param; first is that integer, payload the zigzag deltas
+#     mode 1 (XOR): payload the XOR of consecutive float64 bit patterns,
+#       shifted right by param (their common trailing zero bits)
+# Values round-trip exactly in the column's dtype; timestamps are kept to
+# the millisecond. NaNs travel in a bitmap and are forward filled before
+# encoding so they cost no residual bits.
+
+MAGIC = b"TSC1"
+BLOCK_SIZE = 65536
+MAX_DECIMALS = 3
+
+BLOCK_HEADER = struct.Struct("<4sIB")
+TIME_HEADER = struct.Struct("<qqBI")
+VALUE_HEADER = struct.Struct("<2sBBBBQI")
+
+SCALED_DELTA = 0
+XOR = 1
+
+DTYPES = {"f4": np.float32, "f8": np.float64, "i8": np.int64, "u8": np.uint64, "i4": np.int32, "u1": np.uint8}
+
+
+def zigzag(values):
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    # In place on a freshly decoded uint64 array
+    sign = (values & np.uint64(1)).view(np.int64)
+    np.negative(sign, out=sign)
+    values >>= np.uint64(1)
+    result = values.view(np.int64)
+    result ^= sign
+    return result
+
+
+def bit_width(values):
+    # Widest residual, rounded up to 0, 1, 2, 4, 8, 16, 32 or 64 bits so the
+    # packed values align to bytes and decode as plain NumPy views
+    if len(values) == 0:
+        return 0
+    bits = int(values.max()).bit_length()
+    return 0 if bits == 0 else 1 << (bits - 1).bit_length()
+
+
+def pack_bits(values, bits):
+    # values: uint64 array, each written as `bits` big-endian bits
+    if bits == 0 or len(values) == 0:
+        return b""
+    if bits >= 8:
+        return values.astype(f">u{bits // 8}").tobytes()
+    per_byte = 8 // bits
+    padded = np.zeros(-(-len(values) // per_byte) * per_byte, dtype=np.uint8)
+    padded[:len(values)] = values
+    groups = padded.reshape(-1, per_byte)
+    packed = np.zeros(len(groups), dtype=np.uint8)
+    for j in range(per_byte):
+        packed |= groups[:, j] << np.uint8(8 - bits * (j + 1))
+    return packed.tobytes()
+
+
+def unpack_bits(payload, count, bits):
+    if bits == 0 or count == 0:
+        return np.zeros(count, dtype=np.uint64)
+    if bits >= 8:
+        return np.frombuffer(payload, dtype=f">u{bits // 8}", count=count).astype(np.uint64)
+    per_byte = 8 // bits
+    packed = np.frombuffer(payload, dtype=np.uint8)
+    values = np.empty((len(packed), per_byte), dtype=np.uint8)
+    mask = np.uint8((1 << bits) - 1)
+    for j in range(per_byte):
+        values[:, j] = (packed >> np.uint8(8 - bits * (j + 1))) & mask
+    return values.ravel()[:count].astype(np.uint64)
+
+
+def dtype_code(dtype):
+    dtype = np.dtype(dtype)
+    code = dtype.kind + str(dtype.itemsize)
+    if code not in DTYPES:
+        raise ValueError(f"Unsupported column dtype {dtype}")
+    return code
+
+
+def forward_fill(values, missing):
+    if not missing.any():
+        return values
+    index = np.where(missing, 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    # Leading NaNs take the first real value (or 0 for an all-NaN block)
+    first = np.flatnonzero(~missing)
+    filled[:first[0] if len(first) else len(values)] = values[first[0]] if len(first) else 0
+    return filled
+
+
+def scaled_integers(values, dtype):
+    # Smallest decimal scale turning every value into an integer that maps
+    # back to the same value in `dtype`, or None
+    if np.dtype(dtype).kind in "iu":
+        return 0, values.astype(np.int64)
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        integers = np.round(values * scale)
+        if np.abs(integers).max(initial=0) >= 2 ** 52:
+            return None
+        if np.array_equal((integers / scale).astype(dtype), values.astype(dtype)):
+            return decimals, integers.astype(np.int64)
+    return None
+
+
+def encode_times(timestamps):
+    millis = np.round(np.asarray(timestamps, dtype=np.float64) * 1000).astype(np.int64)
+    t0 = int(millis[0])
+    d0 = int(millis[1] - millis[0]) if len(millis) > 1 else 0
+    residuals = zigzag(np.diff(millis, n=2)) if len(millis) > 2 else np.zeros(0, np.uint64)
+    bits = bit_width(residuals)
+    payload = pack_bits(residuals, bits)
+    return TIME_HEADER.pack(t0, d0, bits, len(payload)) + payload
+
+
+def decode_times(data, offset, count):
+    t0, d0, bits, nbytes = TIME_HEADER.unpack_from(data, offset)
+    offset += TIME_HEADER.size
+    # t[i] = t0 + sum of deltas, delta[i] = d0 + sum of delta-of-deltas
+    dod = unzigzag(unpack_bits(data[offset:offset + nbytes], max(0, count - 2), bits))
+    millis = np.empty(count, dtype=np.int64)
+    millis[0] = 0
+    if count > 1:
+        millis[1] = d0
+        np.cumsum(dod, out=millis[2:])
+        millis[2:] += d0
+        np.cumsum(millis, out=millis)
+    millis += t0
+    return millis / 1000.0, offset + nbytes
+
+
+def encode_values(values):
+    values = np.asarray(values)
+    code = dtype_code(values.dtype)
+    dtype = DTYPES[code]
+    missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), bool)
+    filled = forward_fill(values.astype(np.float64) if values.dtype.kind == "f" else values, missing)
+    nan_bitmap = np.packbits(missing).tobytes() if missing.any() else b""
+
+    scaled = scaled_integers(filled, dtype)
+    if scaled is not None:
+        decimals, integers = scaled
+        residuals = zigzag(np.diff(integers))
+        mode, param, first = SCALED_DELTA, decimals, int(integers[0]) & 0xFFFFFFFFFFFFFFFF
+    else:
+        patterns = filled.astype(np.float64).view(np.uint64)
+        xors = patterns[1:] ^ patterns[:-1]
+        nonzero = xors[xors != 0]
+        # Common trailing zero bits of every XOR (float32 data has >= 29)
+        param = 0
+        if len(nonzero):
+            lowest = np.bitwise_or.reduce(nonzero)
+            param = (int(lowest) & -int(lowest)).bit_length() - 1
+        residuals = xors >> np.uint64(param)
+        mode, first = XOR, int(patterns[0])
+
+    bits = bit_width(residuals)
+    payload = pack_bits(residuals, bits)
+    header = VALUE_HEADER.pack(code.encode("ascii"), mode, bits, param, bool(nan_bitmap), first, len(payload))
+    return header + nan_bitmap + payload
+
+
+def decode_values(data, offset, count):
+    code, mode, bits, param, has_nan, first, nbytes = VALUE_HEADER.unpack_from(data, offset)
+    offset += VALUE_HEADER.size
+    dtype = DTYPES[code.decode("ascii")]
+    missing = None
+    if has_nan:
+        bitmap_size = (count + 7) // 8
+        missing = np.unpackbits(np.frombuffer(data[offset:offset + bitmap_size], dtype=np.uint8), count=count).astype(bool)
+        offset += bitmap_size
+    residuals = unpack_bits(data[offset:offset + nbytes], max(0, count - 1), bits)
+    offset += nbytes
+
+    if mode == SCALED_DELTA:
+        first = np.array([first], dtype=np.uint64).view(np.int64)
+        integers = np.concatenate((first, first[0] + np.cumsum(unzigzag(residuals))))
+        values = integers if param == 0 else integers / 10.0 ** param
+    else:
+        patterns = np.concatenate((np.array([first], dtype=np.uint64), residuals << np.uint64(param)))
+        values = np.bitwise_xor.accumulate(patterns).view(np.float64)
+    values = values.astype(dtype)
+    if missing is not None:
+        values[missing] = np.nan
+    return values, offset
+
+
+def encode_block(timestamps, columns):
+    count = len(timestamps)
+    parts = [BLOCK_HEADER.pack(MAGIC, count, len(columns)), encode_times(timestamps)]
+    for name, values in columns.items():
+        encoded_name = name.encode("utf-8")
+        parts.append(struct.pack("<B", len(encoded_name)) + encoded_name)
+        parts.append(encode_values(values))
+    return b"".join(parts)
+
+
+def encode(timestamps, columns, block_size=BLOCK_SIZE):
+    # timestamps: Unix seconds; columns: name -> array of the same length
+    timestamps = np.asarray(timestamps)
+    blocks = []
+    for start in range(0, len(timestamps), block_size):
+        end = start + block_size
+        blocks.append(encode_block(timestamps[start:end], {name: np.asarray(values)[start:end]
+                                                           for name, values in columns.items()}))
+    return b"".join(blocks)
+
+
+def decode(data):
+    # Returns (timestamps, {name: values}) over all blocks of `data`
+    data = memoryview(data)
+    times = []
+    columns = {}
+    offset = 0
+    while offset < len(data):
+        magic, count, ncolumns = BLOCK_HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError("Not a time series block")
+        offset += BLOCK_HEADER.size
+        t, offset = decode_times(data, offset, count)
+        times.append(t)
+        for _ in range(ncolumns):
+            length = data[offset]
+            name = bytes(data[offset + 1:offset + 1 + length]).decode("utf-8")
+            offset += 1 + length
+            values, offset = decode_values(data, offset, count)
+            columns.setdefault(name, []).append(values)
+    if not times:
+        return np.empty(0), {}
+    return np.concatenate(times), {name: np.concatenate(parts) for name, parts in columns.items()}
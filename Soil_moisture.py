@@ -7,10 +7,15 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QPushButton, QFrame, 
                              QGridLayout, QTabWidget, QGroupBox, QProgressBar,
                              QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (QFont, QPixmap)
 import pyqtgraph as pg
 
+from plot_curves import SeriesCurve, TargetLine
+from zone_model import format_reading
+from history_view import HistoryRange
+from rolling_stats import format_summary, format_duration
+
 
 class Soil_moisture_Dashboard(QMainWindow):
     def __init__(self, back_to_main, main_system=None):
@@ -39,15 +44,25 @@ class Soil_moisture_Dashboard(QMainWindow):
         # Setup UI
         self.initUI()
         
-        # Start timer for real-time updates
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_values)
-        self.timer.start(1000)
+        # Real-time updates run on the main system's scheduler while shown
+        self.update_task = None
 
     def go_back(self):
         self.back_to_main()
         self.close()  
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.update_task is None:
+            self.update_task = self.main_system.scheduler.add_task(
+                f"{type(self).__name__}.update_values", self.update_values, period=1.0)
+
+    def closeEvent(self, event):
+        if self.update_task is not None:
+            self.main_system.scheduler.remove_task(self.update_task)
+            self.update_task = None
+        super().closeEvent(event)
+
     def initUI(self):
         # Create central widget
         central_widget = QWidget()
@@ -185,7 +200,7 @@ class Soil_moisture_Dashboard(QMainWindow):
                     background-color: #2980b9;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_watering)
+            self.power_btn.clicked.connect(lambda: self.toggle_watering())
         # Power button
         else:
             self.power_btn = QPushButton("🚿 Watering OFF")
@@ -201,7 +216,7 @@ class Soil_moisture_Dashboard(QMainWindow):
                     background-color: #1abc9c;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_watering)
+            self.power_btn.clicked.connect(lambda: self.toggle_watering())
 
 
     def create_moisture_control_section(self):
@@ -309,7 +324,7 @@ class Soil_moisture_Dashboard(QMainWindow):
         moisture_tab = QWidget()
         moisture_layout = QVBoxLayout(moisture_tab)
         self.moisture_graph = self.create_graph("Soil Moisture (%)")
-        self.update_graph(self.moisture_graph, self.moisture_data, '#8B4513')
+        self.update_graph(self.moisture_graph, '#8B4513')
         moisture_layout.addWidget(self.moisture_graph)
         
         # Add tabs to widget
@@ -493,47 +508,43 @@ class Soil_moisture_Dashboard(QMainWindow):
         return card
     
     def create_graph(self, title):
-        graph = pg.PlotWidget()
+        graph = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         graph.setBackground('w')
         graph.showGrid(x=True, y=True, alpha=0.3)
         graph.setTitle(title)
         graph.setLabel('left', 'Value')
         graph.setLabel('bottom', 'Time')
-        
 
-        # Disable all mouse interactions
-        graph.setMouseEnabled(x=False, y=False)
+        # Zoom and pan along the time axis, double click returns to live
+        graph.setMouseEnabled(x=True, y=False)
         graph.setMenuEnabled(False)
+        graph.enableAutoRange(y=True)
+        graph.setAutoVisible(y=True)
+
+        # Start on the last 24 hours
+        graph.setXRange(self.time_points[0].timestamp(), self.time_points[-1].timestamp(), padding=0)
 
-        # Set the x-axis to display time values
-        axis = graph.getAxis('bottom')
-        axis.setTicks([[(i, self.time_axis[i]) for i in range(0, len(self.time_axis), 4)]])
+        # Plot items are created by the first update and reused afterwards
+        graph.series = None
+        graph.target = None
+        graph.history = None
         
         return graph
     
-    def update_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
+    def update_graph(self, graph, color):
+        # Persisted history of the visible time range, reloaded as the view moves
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+            graph.history = HistoryRange(graph, graph.series, self.main_system.history_store, "soil_moisture")
+        graph.history.refresh()
         
         # Add target moisture line
-        target_pen = pg.mkPen(color='#2980b9', width=2, style=Qt.DashLine)
-        target_line = pg.InfiniteLine(pos=self.target_moisture, angle=0, pen=target_pen, 
-                                       label=f'Target: {self.target_moisture}%', 
-                                       labelOpts={'color': '#2980b9', 'position': 0.95})
-        graph.addItem(target_line)
-    
+        label = f'Target: {self.target_moisture}%'
+        if graph.target is None:
+            graph.target = TargetLine(graph, self.target_moisture, label)
+        else:
+            graph.target.set_value(self.target_moisture, label)
+        
     def generate_moisture_data(self):
         # Generate moisture pattern: fluctuating throughout the day
         base = np.sin(np.linspace(0, 2*np.pi, 25)) * 15 + 60
@@ -559,11 +570,11 @@ class Soil_moisture_Dashboard(QMainWindow):
         self.moisture_data[-1] = self.soil_moisture
         
         # Update graph displays
-        self.update_graph(self.moisture_graph, self.moisture_data, '#8B4513')
+        self.update_graph(self.moisture_graph, '#8B4513')
         
         # Update summary text
-        avg_moisture = round(np.mean(self.moisture_data), 1)
-        self.summary_text.setText(f"Today's average soil moisture: {avg_moisture}%\nTarget moisture: {self.target_moisture}%\nWatering status: {'ON' if self.watering_on else 'OFF'}\nSystem health: Optimal")
+        today = self.main_system.stats["soil_moisture"].today()
+        self.summary_text.setText(f"Today's average soil moisture: {format_summary(today, '%')}\nTarget moisture: {self.target_moisture}%\nBelow target today: {format_duration(today['below'])}\nWatering status: {'ON' if self.watering_on else 'OFF'}\nSystem health: Optimal")
         
         # If auto climate is active, manage irrigation control
         if self.auto_climate_active:
@@ -577,7 +588,7 @@ class Soil_moisture_Dashboard(QMainWindow):
                 for j in range(item.count()):
                     widget = item.itemAt(j).widget()
                     if isinstance(widget, QLabel) and widget.text() != "🌱":
-                        widget.setText(str(self.soil_moisture))
+                        widget.setText(format_reading(self.soil_moisture))
                         break
                         
         # Find the target moisture card value label and update it
@@ -609,7 +620,7 @@ class Soil_moisture_Dashboard(QMainWindow):
         
         self.main_layout.addWidget(dashboard)
 
-    def toggle_watering(self):
+    def toggle_watering(self, cause="manual"):
         self.watering_on = not self.watering_on
         if self.watering_on:
             self.power_btn.setText("🚿 Watering ON")
@@ -626,7 +637,7 @@ class Soil_moisture_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.watering_status = False
-            self.main_system.toggle_watering()
+            self.main_system.toggle_watering(cause)
         else:
             self.power_btn.setText("🚿 Watering OFF")
             self.power_btn.setStyleSheet("""
@@ -642,7 +653,7 @@ class Soil_moisture_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.watering_status = True
-            self.main_system.toggle_watering()
+            self.main_system.toggle_watering(cause)
 
     def toggle_auto_climate(self):
         self.auto_climate_active = not self.auto_climate_active
@@ -721,7 +732,7 @@ class Soil_moisture_Dashboard(QMainWindow):
         self.update_cards()
         
         # Update graph to show new target line
-        self.update_graph(self.moisture_graph, self.moisture_data, '#8B4513')
+        self.update_graph(self.moisture_graph, '#8B4513')
         
         # If auto climate is active, check if watering needs adjustment
         if self.auto_climate_active:
@@ -732,7 +743,12 @@ class Soil_moisture_Dashboard(QMainWindow):
 
     def manage_irrigation_control(self):
         # Auto-manage watering based on target soil moisture
-        if self.soil_moisture < (self.target_moisture - 5.0) and not self.watering_on:
-            self.toggle_watering()
-        elif self.soil_moisture > (self.target_moisture + 5.0) and self.watering_on:
-            self.toggle_watering()
+        if not self.main_system.sensor_ok("soil_moisture"):
+            # Faulty probe, see AgriculturalMonitoringSystem.check_sensors
+            return
+        band = self.main_system.control_rules.band_for("soil", 5.0)
+        soil_moisture = self.main_system.control_value("soil", self.soil_moisture)
+        if soil_moisture < (self.target_moisture - band) and not self.watering_on:
+            self.toggle_watering("auto")
+        elif soil_moisture > (self.target_moisture + band) and self.watering_on:
+            self.toggle_watering("auto")
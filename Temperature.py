@@ -7,10 +7,15 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QPushButton, QFrame, 
                              QGridLayout, QTabWidget, QGroupBox, QProgressBar,
                              QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (QFont, QPixmap)
 import pyqtgraph as pg
 
+from plot_curves import SeriesCurve, TargetLine
+from zone_model import format_reading
+from history_view import HistoryRange
+from rolling_stats import format_summary, format_duration
+
 class Temperature_Dashboard(QMainWindow):
     def __init__(self, back_to_main, main_system=None):
         super().__init__()
@@ -38,15 +43,25 @@ class Temperature_Dashboard(QMainWindow):
         # Setup UI
         self.initUI()
         
-        # Start timer for real-time updates
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_values)
-        self.timer.start(1000)
+        # Real-time updates run on the main system's scheduler while shown
+        self.update_task = None
 
     def go_back(self):
         self.back_to_main()
         self.close()    
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.update_task is None:
+            self.update_task = self.main_system.scheduler.add_task(
+                f"{type(self).__name__}.update_values", self.update_values, period=1.0)
+
+    def closeEvent(self, event):
+        if self.update_task is not None:
+            self.main_system.scheduler.remove_task(self.update_task)
+            self.update_task = None
+        super().closeEvent(event)
+
     def initUI(self):
         # Create central widget
         central_widget = QWidget()
@@ -184,7 +199,7 @@ class Temperature_Dashboard(QMainWindow):
                     background-color: #c0392b;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_heating)
+            self.power_btn.clicked.connect(lambda: self.toggle_heating())
         # Power button
         else:
             self.power_btn = QPushButton("🔌 Heating OFF")
@@ -200,7 +215,7 @@ class Temperature_Dashboard(QMainWindow):
                     background-color: #1abc9c;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_heating)
+            self.power_btn.clicked.connect(lambda: self.toggle_heating())
 
     def create_temperature_control_section(self):
         # Create temperature control frame
@@ -307,7 +322,7 @@ class Temperature_Dashboard(QMainWindow):
         temp_tab = QWidget()
         temp_layout = QVBoxLayout(temp_tab)
         self.temp_graph = self.create_graph("Temperature (°C)")
-        self.update_graph(self.temp_graph, self.temp_data, '#FF5733')
+        self.update_graph(self.temp_graph, '#FF5733')
         temp_layout.addWidget(self.temp_graph)
         
         # Add tabs to widget
@@ -486,46 +501,43 @@ class Temperature_Dashboard(QMainWindow):
         return card
     
     def create_graph(self, title):
-        graph = pg.PlotWidget()
+        graph = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         graph.setBackground('w')
         graph.showGrid(x=True, y=True, alpha=0.3)
         graph.setTitle(title)
         graph.setLabel('left', 'Value')
         graph.setLabel('bottom', 'Time')
 
-        # Disable all mouse interactions
-        graph.setMouseEnabled(x=False, y=False)
+        # Zoom and pan along the time axis, double click returns to live
+        graph.setMouseEnabled(x=True, y=False)
         graph.setMenuEnabled(False)
+        graph.enableAutoRange(y=True)
+        graph.setAutoVisible(y=True)
+
+        # Start on the last 24 hours
+        graph.setXRange(self.time_points[0].timestamp(), self.time_points[-1].timestamp(), padding=0)
 
-        # Set the x-axis to display time values
-        axis = graph.getAxis('bottom')
-        axis.setTicks([[(i, self.time_axis[i]) for i in range(0, len(self.time_axis), 4)]])
+        # Plot items are created by the first update and reused afterwards
+        graph.series = None
+        graph.target = None
+        graph.history = None
         
         return graph
     
-    def update_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
+    def update_graph(self, graph, color):
+        # Persisted history of the visible time range, reloaded as the view moves
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+            graph.history = HistoryRange(graph, graph.series, self.main_system.history_store, "temperature")
+        graph.history.refresh()
         
         # Add target temperature line
-        target_pen = pg.mkPen(color='#2980b9', width=2, style=Qt.DashLine)
-        target_line = pg.InfiniteLine(pos=self.target_temperature, angle=0, pen=target_pen, 
-                                       label=f'Target: {self.target_temperature}°C', 
-                                       labelOpts={'color': '#2980b9', 'position': 0.95})
-        graph.addItem(target_line)
-    
+        label = f'Target: {self.target_temperature}°C'
+        if graph.target is None:
+            graph.target = TargetLine(graph, self.target_temperature, label)
+        else:
+            graph.target.set_value(self.target_temperature, label)
+        
     def generate_temperature_data(self):
         # Generate temperature pattern: cooler at night, warmer in day
         base = np.sin(np.linspace(0, 2*np.pi, 25)) * 10 + 20
@@ -545,11 +557,11 @@ class Temperature_Dashboard(QMainWindow):
         self.temp_data[-1] = self.temperature
         
         # Update graph displays
-        self.update_graph(self.temp_graph, self.temp_data, '#FF5733')
+        self.update_graph(self.temp_graph, '#FF5733')
         
         # Update summary text
-        avg_temp = round(np.mean(self.temp_data), 1)
-        self.summary_text.setText(f"Today's average temperature: {avg_temp}°C\nTarget temperature: {self.target_temperature}°C\nHeating status: {'ON' if self.heating_on else 'OFF'}\nSystem health: Optimal")
+        today = self.main_system.stats["temperature"].today()
+        self.summary_text.setText(f"Today's average temperature: {format_summary(today, '°C')}\nTarget temperature: {self.target_temperature}°C\nBelow target today: {format_duration(today['below'])}\nHeating status: {'ON' if self.heating_on else 'OFF'}\nSystem health: Optimal")
         
         # If auto climate is active, manage climate control
         if self.auto_climate_active:
@@ -563,7 +575,7 @@ class Temperature_Dashboard(QMainWindow):
                 for j in range(item.count()):
                     widget = item.itemAt(j).widget()
                     if isinstance(widget, QLabel) and widget.text() != "°C":
-                        widget.setText(str(self.temperature))
+                        widget.setText(format_reading(self.temperature))
                         break
                         
         # Find the target temperature card value label and update it
@@ -619,7 +631,7 @@ class Temperature_Dashboard(QMainWindow):
         
         self.main_layout.addWidget(dashboard)
 
-    def toggle_heating(self):
+    def toggle_heating(self, cause="manual"):
         self.heating_on = not self.heating_on
         if self.heating_on:
             self.power_btn.setText("🔌 Heating ON")
@@ -636,7 +648,7 @@ class Temperature_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.heater_status = False
-            self.main_system.toggle_heater()
+            self.main_system.toggle_heater(cause)
         else:
             self.power_btn.setText("🔌 Heating OFF")
             self.power_btn.setStyleSheet("""
@@ -652,7 +664,7 @@ class Temperature_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.heater_status = True
-            self.main_system.toggle_heater()
+            self.main_system.toggle_heater(cause)
 
     def toggle_auto_climate(self):
         self.auto_climate_active = not self.auto_climate_active
@@ -734,7 +746,7 @@ class Temperature_Dashboard(QMainWindow):
         self.update_cards()
         
         # Update graph to show new target line
-        self.update_graph(self.temp_graph, self.temp_data, '#FF5733')
+        self.update_graph(self.temp_graph, '#FF5733')
         
         # If auto climate is active, check if heating needs adjustment
         if self.auto_climate_active:
@@ -745,7 +757,12 @@ class Temperature_Dashboard(QMainWindow):
 
     def manage_climate_control(self):
         # Auto-manage heating based on target temperature
-        if self.temperature < (self.target_temperature - 1.0) and not self.heating_on:
-            self.toggle_heating()
-        elif self.temperature > (self.target_temperature + 1.0) and self.heating_on:
-            self.toggle_heating()
+        if not self.main_system.sensor_ok("temperature"):
+            # Faulty probe, see AgriculturalMonitoringSystem.check_sensors
+            return
+        band = self.main_system.control_rules.band_for("temperature", 1.0)
+        temperature = self.main_system.control_value("temperature", self.temperature)
+        if temperature < (self.target_temperature - band) and not self.heating_on:
+            self.toggle_heating("auto")
+        elif temperature > (self.target_temperature + band) and self.heating_on:
+            self.toggle_heating("auto")
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import random
 from datetime import datetime, timedelta
 import numpy as np
@@ -7,10 +8,14 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QPushButton, QFrame, 
                              QGridLayout, QTabWidget, QGroupBox, QProgressBar,
                              QSlider, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (QFont, QPixmap)
 import pyqtgraph as pg
 
+from plot_curves import SeriesCurve, TargetLine
+from history_view import HistoryRange
+from rolling_stats import format_summary, format_duration
+
 
 class Water_pH_Dashboard(QMainWindow):
     def __init__(self, back_to_main, main_system=None):
@@ -41,10 +46,8 @@ class Water_pH_Dashboard(QMainWindow):
         # Setup UI
         self.initUI()
         
-        # Start timer for real-time updates
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_values)
-        self.timer.start(1000)
+        # Real-time updates run on the main system's scheduler while shown
+        self.update_task = None
         
     def initUI(self):
         # Create central widget
@@ -181,6 +184,18 @@ class Water_pH_Dashboard(QMainWindow):
         self.back_to_main()
         self.close()    
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.update_task is None:
+            self.update_task = self.main_system.scheduler.add_task(
+                f"{type(self).__name__}.update_values", self.update_values, period=1.0)
+
+    def closeEvent(self, event):
+        if self.update_task is not None:
+            self.main_system.scheduler.remove_task(self.update_task)
+            self.update_task = None
+        super().closeEvent(event)
+
     def create_water_level_control_section(self):
         # Create water level control frame
         water_level_control_frame = QFrame()
@@ -293,7 +308,7 @@ class Water_pH_Dashboard(QMainWindow):
         ph_level_tab = QWidget()
         ph_level_layout = QVBoxLayout(ph_level_tab)
         self.ph_level_graph = self.create_graph("pH Level")
-        self.update_ph_level_graph(self.ph_level_graph, self.ph_level_data, '#e74c3c')
+        self.update_ph_level_graph(self.ph_level_graph, '#8E44AD')
         ph_level_layout.addWidget(self.ph_level_graph)
         
         # Add tabs to widget
@@ -473,74 +488,52 @@ class Water_pH_Dashboard(QMainWindow):
         return card
     
     def create_graph(self, title):
-        graph = pg.PlotWidget()
+        graph = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         graph.setBackground('w')
         graph.showGrid(x=True, y=True, alpha=0.3)
         graph.setTitle(title)
         graph.setLabel('left', 'Value')
         graph.setLabel('bottom', 'Time')
 
-        # Disable all mouse interactions
-        graph.setMouseEnabled(x=False, y=False)
+        # Zoom and pan along the time axis, double click returns to live
+        graph.setMouseEnabled(x=True, y=False)
         graph.setMenuEnabled(False)
+        graph.enableAutoRange(y=True)
+        graph.setAutoVisible(y=True)
+
+        # Start on the last 24 hours
+        graph.setXRange(self.time_points[0].timestamp(), self.time_points[-1].timestamp(), padding=0)
 
-        # Set the x-axis to display time values
-        axis = graph.getAxis('bottom')
-        axis.setTicks([[(i, self.time_axis[i]) for i in range(0, len(self.time_axis), 4)]])
+        # Plot items are created by the first update and reused afterwards
+        graph.series = None
+        graph.target = None
+        graph.history = None
         
         return graph
     
     def update_water_level_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
+        # Water level is not persisted yet, plot the in-memory samples
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+        graph.series.set_data([t.timestamp() for t in self.time_points], data)
         
         # Add target water level line
-        target_pen = pg.mkPen(color='#2980b9', width=2, style=Qt.DashLine)
-        target_line = pg.InfiniteLine(pos=self.target_water_level, angle=0, pen=target_pen, 
-                                       label=f'Target: {self.target_water_level}%', 
-                                       labelOpts={'color': '#2980b9', 'position': 0.95})
-        graph.addItem(target_line)
-        
-    def update_ph_level_graph(self, graph, data, color):
-        # Clear the graph
-        graph.clear()
-        
-        # Plot data line
-        pen = pg.mkPen(color=color, width=3)
-        graph.plot(list(range(len(data))), data, pen=pen)
-        
-        # Add fill under the line
-        fill = pg.FillBetweenItem(
-            pg.PlotCurveItem(list(range(len(data))), data, pen=pen),
-            pg.PlotCurveItem(list(range(len(data))), [0] * len(data)),
-            brush=pg.mkBrush(color + '50')
-        )
-        graph.addItem(fill)
-        
-        # Add optimal pH range lines
-        optimal_min_pen = pg.mkPen(color='#27ae60', width=2, style=Qt.DashLine)
-        optimal_min_line = pg.InfiniteLine(pos=6.5, angle=0, pen=optimal_min_pen, 
-                                           label='Min Optimal: 6.5', 
-                                           labelOpts={'color': '#27ae60', 'position': 0.95})
-        graph.addItem(optimal_min_line)
-        
-        optimal_max_pen = pg.mkPen(color='#27ae60', width=2, style=Qt.DashLine)
-        optimal_max_line = pg.InfiniteLine(pos=7.5, angle=0, pen=optimal_max_pen, 
-                                           label='Max Optimal: 7.5', 
-                                           labelOpts={'color': '#27ae60', 'position': 0.95})
-        graph.addItem(optimal_max_line)
+        label = f'Target: {self.target_water_level}%'
+        if graph.target is None:
+            graph.target = TargetLine(graph, self.target_water_level, label)
+        else:
+            graph.target.set_value(self.target_water_level, label)
+        
+    def update_ph_level_graph(self, graph, color):
+        # Persisted history of the visible time range, reloaded as the view moves
+        if graph.series is None:
+            graph.series = SeriesCurve(graph, color)
+            graph.history = HistoryRange(graph, graph.series, self.main_system.history_store, "ph")
+            
+            # Add optimal pH range lines
+            TargetLine(graph, 6.5, 'Min Optimal: 6.5', color='#27ae60')
+            TargetLine(graph, 7.5, 'Max Optimal: 7.5', color='#27ae60')
+        graph.history.refresh()
     
     def generate_water_level_data(self, main_system=None):
         # Generate water level pattern: fluctuating throughout the day
@@ -560,6 +553,7 @@ class Water_pH_Dashboard(QMainWindow):
         # Update water level with slight changes
         self.water_level += random.uniform(-1.0, 1.0)
         self.water_level = round(max(min(self.water_level, 90), 30), 1)
+        self.main_system.water_level_stats.add(time.time(), self.water_level, self.target_water_level)
         
         # Update pH level with slight changes
         if self.main_system:
@@ -581,15 +575,16 @@ class Water_pH_Dashboard(QMainWindow):
         
         # Update graph displays
         self.update_water_level_graph(self.water_level_graph, self.water_level_data, '#4ECDC4')
-        self.update_ph_level_graph(self.ph_level_graph, self.ph_level_data, '#8E44AD')
+        self.update_ph_level_graph(self.ph_level_graph, '#8E44AD')
         
         # Update summary text
-        avg_water_level = round(np.mean(self.water_level_data), 1)
-        avg_ph_level = round(np.mean(self.ph_level_data), 1)
-        self.summary_text.setText(f"Today's average water level: {avg_water_level}%\n"
+        water_level = self.main_system.water_level_stats.today()
+        ph_level = self.main_system.stats["ph"].today()
+        self.summary_text.setText(f"Today's average water level: {format_summary(water_level, '%')}\n"
                                 f"Target water level: {self.target_water_level}%\n"
+                                f"Below target today: {format_duration(water_level['below'])}\n"
                                 f"Pump status: {'ON' if self.pump_on else 'OFF'}\n"
-                                f"Average pH level: {avg_ph_level}\n"
+                                f"Average pH level: {format_summary(ph_level, '', 2)}\n"
                                 f"System health: Optimal")
         
         # If auto climate is active, manage water control
@@ -643,7 +638,7 @@ class Water_pH_Dashboard(QMainWindow):
                     background-color: #2980b9;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_pump)
+            self.power_btn.clicked.connect(lambda: self.toggle_pump())
         # Power button
         else:
             self.power_btn = QPushButton("💧 Water Pump OFF")
@@ -659,10 +654,10 @@ class Water_pH_Dashboard(QMainWindow):
                     background-color: #1abc9c;
                 }
             """)
-            self.power_btn.clicked.connect(self.toggle_pump)
+            self.power_btn.clicked.connect(lambda: self.toggle_pump())
 
 
-    def toggle_pump(self):
+    def toggle_pump(self, cause="manual"):
         self.pump_on = not self.pump_on
         if self.pump_on:
             self.power_btn.setText("💧 Pump Water ON")
@@ -679,7 +674,7 @@ class Water_pH_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.pump_water_status = False
-            self.main_system.toggle_pump_water()
+            self.main_system.toggle_pump_water(cause)
         else:
             self.power_btn.setText("💧 Pump Water OFF")
             self.power_btn.setStyleSheet("""
@@ -695,7 +690,7 @@ class Water_pH_Dashboard(QMainWindow):
                 }
             """)
             self.main_system.pump_water_status = True
-            self.main_system.toggle_pump_water()
+            self.main_system.toggle_pump_water(cause)
 
     def toggle_auto_climate(self):
         self.auto_climate_active = not self.auto_climate_active
@@ -786,7 +781,8 @@ class Water_pH_Dashboard(QMainWindow):
 
     def manage_water_control(self):
         # Auto-manage pump based on target water level
-        if self.water_level < (self.target_water_level - 5.0) and not self.pump_on:
-            self.toggle_pump()
-        elif self.water_level > (self.target_water_level + 5.0) and self.pump_on:
-            self.toggle_pump()
+        band = self.main_system.control_rules.band_for("water", 5.0)
+        if self.water_level < (self.target_water_level - band) and not self.pump_on:
+            self.toggle_pump("auto")
+        elif self.water_level > (self.target_water_level + band) and self.pump_on:
+            self.toggle_pump("auto")
@@ -0,0 +1,170 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+
+DEVICES = ["HEATING", "HUMIDIFIER", "WATERING", "WATER_PUMP", "LIGHTNING"]
+CAUSES = ["manual", "auto", "schedule", "edge", "restore"]
+
+# One state change: time, device and cause indexes, old and new state
+EVENT = np.dtype([("t", "<f8"), ("device", "u1"), ("cause", "u1"), ("old", "u1"), ("new", "u1")])
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "journal", "actuators.bin")
+
+
+class ActuatorJournal:
+    # Append-only journal of actuator state changes. record() only queues
+    # the event; a writer thread appends whatever is queued in one write and
+    # one fsync (group commit) every `flush_interval` seconds, or sooner
+    # once `batch_size` events are waiting, so the control tick never waits
+    # on the disk. Repeated states are dropped: an event is written only
+    # when a device's state actually changes, starting from the last state
+    # in the file, so the owner records its starting states once it knows
+    # them. A batch cut short by a power loss is dropped at start-up, so
+    # the events appended after it stay aligned.
+    def __init__(self, path=DEFAULT_PATH, flush_interval=1.0, batch_size=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.drop_torn_tail()
+        self.file = open(path, "ab")
+        self.pending = []
+        self.states = self.last_states()
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.written = 0
+        self.flushes = 0
+        self.thread = threading.Thread(target=self.run, name="actuator-journal", daemon=True)
+        self.thread.start()
+
+    def drop_torn_tail(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        torn = size % EVENT.itemsize
+        if torn:
+            os.truncate(self.path, size - torn)
+            print(f"Dropped {torn} bytes of a torn event at the end of {self.path}")
+
+    def last_states(self):
+        # Device states as of the end of the existing journal
+        reader = JournalReader(self.path)
+        return {device: reader.state_at(device, np.inf) for device in DEVICES}
+
+    def record(self, device, state, cause, timestamp=None):
+        state = bool(state)
+        with self.condition:
+            old = self.states.get(device, False)
+            if old == state:
+                return
+            self.states[device] = state
+            self.pending.append((time.time() if timestamp is None else timestamp,
+                                 DEVICES.index(device), CAUSES.index(cause), old, state))
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.pending) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                batch, self.pending = self.pending, []
+                stopping = self.stopping
+            if batch:
+                self.write(batch)
+            if stopping:
+                return
+
+    def write(self, batch):
+        events = np.array(batch, dtype=EVENT)
+        self.file.write(events.tobytes())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.written += len(events)
+        self.flushes += 1
+
+    def close(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+        self.file.close()
+
+
+class JournalReader:
+    # Memory-maps the journal and keeps, per device, the positions of its
+    # events; refresh() only indexes the events appended since the last call
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.events = np.empty(0, dtype=EVENT)
+        self.index = {device: np.empty(0, dtype=np.int64) for device in DEVICES}
+        self.refresh()
+
+    def refresh(self):
+        try:
+            count = os.path.getsize(self.path) // EVENT.itemsize
+        except OSError:
+            return
+        indexed = len(self.events)
+        if count == indexed:
+            return
+        self.events = np.memmap(self.path, dtype=EVENT, mode="r", shape=(count,))
+        devices = np.asarray(self.events["device"][indexed:])
+        for i, device in enumerate(DEVICES):
+            positions = np.flatnonzero(devices == i) + indexed
+            self.index[device] = np.concatenate((self.index[device], positions))
+
+    def device_events(self, device, start=-np.inf, end=np.inf):
+        events = self.events[self.index[device]]
+        t = events["t"]
+        return events[np.searchsorted(t, start, side="left"):np.searchsorted(t, end, side="left")]
+
+    def state_at(self, device, timestamp):
+        events = self.events[self.index[device]]
+        i = np.searchsorted(events["t"], timestamp, side="right")
+        return bool(events["new"][i - 1]) if i else False
+
+    def on_intervals(self, device, start, end):
+        # (on, off) pairs clipped to [start, end)
+        events = self.device_events(device, start, end)
+        t = np.concatenate(([start], events["t"], [end]))
+        states = np.concatenate(([self.state_at(device, start)], events["new"].astype(bool)))
+        on = np.flatnonzero(states)
+        return np.column_stack((t[on], t[on + 1]))
+
+    def duty_cycle(self, device, start, end):
+        # Fraction of [start, end) the device was on, and the seconds on
+        intervals = self.on_intervals(device, start, end)
+        seconds = float(np.sum(intervals[:, 1] - intervals[:, 0]))
+        return seconds / (end - start) if end > start else 0.0, seconds
+
+    def summary(self, start, end):
+        return {device: self.duty_cycle(device, start, end) for device in DEVICES}
+
+
+def main():
+    # Audit from the command line: events and duty cycles of the last hours
+    parser = argparse.ArgumentParser(description="Show actuator state changes and duty cycles")
+    parser.add_argument("--hours", type=float, default=24.0, help="look back this many hours")
+    parser.add_argument("--device", choices=DEVICES, help="only this device")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    reader = JournalReader(args.path)
+    end = time.time()
+    start = end - args.hours * 3600
+    for device in [args.device] if args.device else DEVICES:
+        fraction, seconds = reader.duty_cycle(device, start, end)
+        print(f"{device}: on {seconds / 3600:.2f} h ({fraction:.0%})")
+        for event in reader.device_events(device, start, end):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event["t"]))
+            print(f"  {stamp}  {'ON ' if event['new'] else 'OFF'}  {CAUSES[event['cause']]}")
+
+
+if __name__ == '__main__':
+    main()
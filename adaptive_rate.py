@@ -0,0 +1,61 @@
+import math
+
+
+class AdaptivePoller:
+    # Picks the next acquisition period from how the readings behave. For
+    # each channel it keeps an EWMA of |dv/dt| and estimates the time until
+    # the value reaches the nearest switching threshold; the channel wants
+    # `samples_to_threshold` samples before that happens. The fastest
+    # channel wins, clamped to [min_period, max_period]. Speeding up is
+    # immediate, slowing down is limited to `slowdown` per tick so a single
+    # quiet sample does not throw the rate back to the maximum.
+    def __init__(self, min_period=0.25, max_period=5.0, base_period=0.5,
+                 alpha=0.3, samples_to_threshold=4.0, slowdown=1.5):
+        self.min_period = min_period
+        self.max_period = max_period
+        self.base_period = base_period
+        self.alpha = alpha
+        self.samples_to_threshold = samples_to_threshold
+        self.slowdown = slowdown
+        self.period = base_period
+        self.last = {}
+        self.rates = {}
+
+    def update(self, now, values, thresholds):
+        # values: channel -> reading (None for a failed read)
+        # thresholds: channel -> iterable of values where an actuator switches
+        wanted = self.max_period
+        for channel, value in values.items():
+            if value is None:
+                # Failed read, retry at the nominal rate
+                wanted = min(wanted, self.base_period)
+                continue
+
+            previous = self.last.get(channel)
+            self.last[channel] = (now, value)
+            if previous is None or now <= previous[0]:
+                wanted = min(wanted, self.base_period)
+                continue
+            slope = abs(value - previous[1]) / (now - previous[0])
+            rate = self.rates.get(channel, slope)
+            rate = self.alpha * slope + (1 - self.alpha) * rate
+            self.rates[channel] = rate
+
+            levels = thresholds.get(channel, ())
+            if not levels:
+                continue
+            distance = min(abs(value - level) for level in levels)
+            if distance == 0:
+                wanted = min(wanted, self.base_period)
+                continue
+            if rate <= 0:
+                continue
+            wanted = min(wanted, distance / rate / self.samples_to_threshold)
+
+        if math.isnan(wanted):
+            wanted = self.base_period
+        wanted = max(self.min_period, min(self.max_period, wanted))
+        if wanted > self.period:
+            wanted = min(wanted, self.period * self.slowdown)
+        self.period = wanted
+        return self.period
@@ -0,0 +1,162 @@
+import numpy as np
+
+
+# Flag bits of a channel
+STUCK = 1
+RAIL = 2
+RANGE = 4
+SPIKE = 8
+DRIFT = 16
+
+REASONS = {
+    STUCK: "stuck",
+    RAIL: "at the ADC rail",
+    RANGE: "out of range",
+    SPIKE: "spiking",
+    DRIFT: "drifting"
+}
+
+# Channels read through the Pi's PCF8591. Nothing between the Pi and the
+# GUI converts them, so they arrive as raw ADC bytes (0-255); a probe
+# disconnected or shorted sits on one of the rails.
+ADC_CHANNELS = ("temperature", "soil_moisture", "humidity")
+ADC_LIMITS = (0.0, 255.0)
+RAILS = (0.0, 255.0)
+
+# Plausible readings of the other channels, in their own units; anything
+# else is a wiring or probe fault
+LIMITS = {
+    "ph": (0.0, 14.0),
+    "light": (0.0, 100.0),
+    "water_level": (0.0, 100.0)
+}
+
+
+class AnomalyDetector:
+    # Streaming checks on every channel of every zone, one vectorized O(1)
+    # update per tick over (zones x channels) arrays:
+    #   stuck   zero spread (one unchanged value) over the last
+    #           `stuck_seconds` of wall time, with at least
+    #           `stuck_min_samples` readings in it, whatever the poll rate
+    #   rail    an ADC channel at 0 or 255 for `rail_samples` samples
+    #   range   outside the channel's plausible limits (raw bytes for ADC
+    #           channels, LIMITS for the others)
+    #   spike   |z| over `spike_z` against a fast EWMA mean and variance
+    #           (standard deviation floored at the channel's resolution),
+    #           flagged once the EWMA of spike indicators passes `spike_rate`
+    #   drift   the fast EWMA mean more than `drift_sigma` fast standard
+    #           deviations and `drift_floor` of the range off the slow mean,
+    #           for `drift_samples` samples in a row: a reading running away
+    # A flag clears after `clear_samples` clean samples in a row. NaN
+    # (missing) readings change nothing.
+    def __init__(self, channels, zones=1, limits=LIMITS, adc_channels=ADC_CHANNELS, fast_alpha=0.05,
+                 slow_alpha=0.0002, warmup=60, stuck_seconds=4 * 3600, stuck_min_samples=100,
+                 rail_samples=10, spike_z=6.0, spike_rate=0.1, std_floor=0.005, drift_sigma=4.0,
+                 drift_floor=0.1, drift_samples=1200, clear_samples=20):
+        self.channels = list(channels)
+        shape = (zones, len(self.channels))
+        self.adc = np.array([name in adc_channels for name in self.channels])
+        bounds = np.array([ADC_LIMITS if name in adc_channels else limits.get(name, (-np.inf, np.inf))
+                           for name in self.channels], dtype=float)
+        self.low = bounds[:, 0]
+        self.high = bounds[:, 1]
+        span = np.where(np.isfinite(self.high - self.low), self.high - self.low, 0.0)
+        self.drift_min = drift_floor * span
+        # Smallest standard deviation a z-score divides by: one count on an
+        # ADC channel, `std_floor` of the range on the others, so a
+        # one-step change of a steady reading is not a spike
+        self.std_min = np.where(self.adc, 1.0, std_floor * span)
+
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.warmup = warmup
+        self.stuck_seconds = stuck_seconds
+        self.stuck_min_samples = stuck_min_samples
+        self.rail_samples = rail_samples
+        self.spike_z = spike_z
+        self.spike_rate_limit = spike_rate
+        self.drift_sigma = drift_sigma
+        self.drift_samples = drift_samples
+        self.clear_samples = clear_samples
+
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.last = np.full(shape, np.nan)
+        self.same_run = np.zeros(shape, dtype=np.int64)
+        self.same_since = np.full(shape, np.nan)
+        self.rail_run = np.zeros(shape, dtype=np.int64)
+        self.drift_run = np.zeros(shape, dtype=np.int64)
+        self.clean_run = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.slow_mean = np.zeros(shape)
+        self.slow_var = np.zeros(shape)
+        self.spike_rate = np.zeros(shape)
+        self.z = np.zeros(shape)
+        self.flags = np.zeros(shape, dtype=np.uint8)
+
+    def update(self, t, values):
+        # t: Unix time; values: (zones x channels) readings. Returns the
+        # flags raised and cleared by this sample as (zones x channels) bit
+        # masks.
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        v = np.where(present, values, 0.0)
+        first = present & (self.count == 0)
+        self.mean[first] = self.slow_mean[first] = v[first]
+        self.count += present
+
+        same = v == self.last
+        self.same_run = np.where(present, np.where(same, self.same_run + 1, 0), self.same_run)
+        self.same_since = np.where(present & ~same, t, self.same_since)
+        self.last = np.where(present, v, self.last)
+        railed = self.adc & np.isin(v, RAILS)
+        self.rail_run = np.where(present, np.where(railed, self.rail_run + 1, 0), self.rail_run)
+
+        # z-score against the fast EWMA before it takes this sample in
+        warm = present & (self.count > self.warmup)
+        std = np.maximum(np.sqrt(self.var), self.std_min)
+        diff = v - self.mean
+        self.z = np.where(warm & (std > 0), diff / np.where(std > 0, std, 1.0), 0.0)
+        spike = warm & (np.abs(self.z) > self.spike_z)
+        self.spike_rate = np.where(present, self.spike_rate + self.fast_alpha * (spike - self.spike_rate),
+                                   self.spike_rate)
+
+        # EWMA mean and variance; a spike enters clipped so one outlier
+        # does not inflate the variance
+        limit = self.spike_z * std
+        diff = np.where(spike, np.clip(diff, -limit, limit), diff)
+        self.update_ewma(self.mean, self.var, diff, self.fast_alpha, present)
+        self.update_ewma(self.slow_mean, self.slow_var, v - self.slow_mean, self.slow_alpha, present)
+
+        active = np.zeros(self.flags.shape, dtype=np.uint8)
+        with np.errstate(invalid="ignore"):
+            unchanged = t - self.same_since >= self.stuck_seconds
+        active[unchanged & (self.same_run >= self.stuck_min_samples)] |= STUCK
+        active[self.rail_run >= self.rail_samples] |= RAIL
+        active[present & ((v < self.low) | (v > self.high))] |= RANGE
+        active[warm & (self.spike_rate > self.spike_rate_limit)] |= SPIKE
+        offset = np.abs(self.mean - self.slow_mean)
+        drifting = warm & (offset > self.drift_sigma * np.sqrt(self.var)) & (offset > self.drift_min)
+        self.drift_run = np.where(present, np.where(drifting, self.drift_run + 1, 0), self.drift_run)
+        active[self.drift_run >= self.drift_samples] |= DRIFT
+
+        self.clean_run = np.where(present, np.where(active == 0, self.clean_run + 1, 0), self.clean_run)
+        old = self.flags
+        flags = old | active
+        flags[self.clean_run >= self.clear_samples] = 0
+        self.flags = flags
+        return flags & ~old, old & ~flags
+
+    @staticmethod
+    def update_ewma(mean, var, diff, alpha, mask):
+        increment = alpha * diff
+        mean += np.where(mask, increment, 0.0)
+        var[:] = np.where(mask, (1 - alpha) * (var + diff * increment), var)
+
+    def flagged(self):
+        # (zones x channels) bool
+        return self.flags != 0
+
+    def reasons(self, zone, channel):
+        flags = int(self.flags[zone, self.channels.index(channel)])
+        return [reason for bit, reason in REASONS.items() if flags & bit]
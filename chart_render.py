@@ -0,0 +1,128 @@
+import threading
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import Qt, QObject, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+
+
+# Charts are rasterized with the plain Agg backend on a worker thread so the
+# Qt main thread never blocks inside matplotlib. Each chart owns its own
+# Figure (no pyplot state is shared between threads) and the worker only
+# keeps the newest request per chart, so a slow render never queues up a
+# backlog of stale frames.
+class ChartRenderWorker(QObject):
+    frame_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, timing=None):
+        super().__init__()
+        self.timing = timing
+        self.figures = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="chart-render", daemon=True)
+        self.thread.start()
+
+    def request(self, name, spec, width, height, dpi=100):
+        # Replace any request for this chart that has not been rendered yet
+        with self.lock:
+            self.pending[name] = (spec, width, height, dpi)
+        self.wakeup.set()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=2.0)
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while self.running:
+                with self.lock:
+                    if not self.pending:
+                        break
+                    name, (spec, width, height, dpi) = self.pending.popitem()
+                try:
+                    if self.timing is not None:
+                        with self.timing.span(f"render {name} chart"):
+                            image = self.render(name, spec, width, height, dpi)
+                    else:
+                        image = self.render(name, spec, width, height, dpi)
+                except Exception as e:
+                    print(f"Failed to render chart {name}:", e)
+                    continue
+                self.frame_ready.emit(name, image)
+
+    def render(self, name, spec, width, height, dpi):
+        fig, canvas, ax = self.figures.get(name, (None, None, None))
+        if fig is None:
+            fig = Figure(dpi=dpi)
+            canvas = FigureCanvasAgg(fig)
+            ax = fig.add_subplot(111)
+            self.figures[name] = (fig, canvas, ax)
+        fig.set_size_inches(max(width, 1) / dpi, max(height, 1) / dpi)
+
+        ax.clear()
+        values = np.asarray(spec["data"], dtype=float)
+        x = np.arange(len(values))
+        ax.plot(x, values, 'o-', color=spec["color"])
+        ax.fill_between(x, values, color=spec["color"], alpha=0.2)
+        ax.set_ylim(*spec["ylim"])
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.set_xticks(spec["xticks"])
+        ax.set_xticklabels(spec["xticklabels"])
+        canvas.draw()
+
+        # Copy out of the Agg buffer, it is reused by the next draw
+        buffer = canvas.buffer_rgba()
+        h, w = buffer.shape[0], buffer.shape[1]
+        return QImage(bytes(buffer), w, h, 4 * w, QImage.Format_RGBA8888).copy()
+
+
+class ChartView(QWidget):
+    # Displays the latest frame produced by the render worker. Painting is a
+    # plain image blit, the expensive work happens on the worker thread.
+    def __init__(self, name, worker, width=12, height=5, dpi=100):
+        super().__init__()
+        self.name = name
+        self.worker = worker
+        self.dpi = dpi
+        self.spec = None
+        self.image = None
+        self.setMinimumSize(width * dpi // 4, height * dpi // 4)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setStyleSheet("background-color:white;")
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        worker.frame_ready.connect(self.on_frame_ready)
+
+    def set_spec(self, spec):
+        self.spec = spec
+        self.request_render()
+
+    def request_render(self):
+        if self.spec is None:
+            return
+        self.worker.request(self.name, self.spec, self.width(), self.height(), self.dpi)
+
+    def on_frame_ready(self, name, image):
+        if name != self.name:
+            return
+        self.image = image
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.request_render()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.image is not None:
+            # Stretch the last frame until the resized one arrives
+            painter.drawImage(self.rect(), self.image)
+        painter.end()
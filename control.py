@@ -0,0 +1,226 @@
+import json
+import os
+import time
+
+import numpy as np
+
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "control_rules.json")
+
+DIRECTIONS = {"raise": 1, "lower": -1}
+
+
+class RuleTable:
+    # Control rules compiled into index and parameter arrays. Rules are
+    # sorted by (actuator, priority descending) so the rules of one actuator
+    # form a contiguous group whose first decisive rule wins; interlocks
+    # become (actuators x actuators) matrices.
+    #
+    # Rule fields (control_rules.json):
+    #   name, sensor, actuator  identifiers
+    #   target                  attribute of the main window or a number
+    #   band                    hysteresis half-width around the target
+    #   direction               "raise" (on below the band) or "lower"
+    #   priority                higher wins between rules of one actuator
+    #                           and between interlocked actuators
+    #   auto_flag               per-loop auto mode attribute (optional)
+    #   interlocks              actuators that must be off to switch this on
+    #   lookahead               act on the reading forecast this many
+    #                           seconds ahead (optional, 0: current reading)
+    #
+    # `sensors`, `actuators` and `targets` (optional) are the names the
+    # owner can serve; a rule using any other one is rejected here rather
+    # than failing on every tick.
+    def __init__(self, rules, sensors=None, actuators=None, targets=None):
+        if not rules:
+            raise ValueError("No control rules")
+        names = [rule["name"] for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate control rule names")
+        for rule in rules:
+            if sensors is not None and rule["sensor"] not in sensors:
+                raise ValueError(f"Rule {rule['name']} reads unknown sensor {rule['sensor']}")
+            if actuators is not None and rule["actuator"] not in actuators:
+                raise ValueError(f"Rule {rule['name']} drives unknown actuator {rule['actuator']}")
+            target = rule["target"]
+            if isinstance(target, str):
+                if targets is not None and target not in targets:
+                    raise ValueError(f"Rule {rule['name']} has unknown target {target}")
+            elif not isinstance(target, (int, float)):
+                raise ValueError(f"Rule {rule['name']} has an invalid target {target!r}")
+
+        self.sensors = sorted({rule["sensor"] for rule in rules})
+        self.actuators = sorted({rule["actuator"] for rule in rules})
+        for rule in rules:
+            for other in rule.get("interlocks", []):
+                if other not in self.actuators:
+                    raise ValueError(f"Rule {rule['name']} interlocks unknown actuator {other}")
+            if rule.get("direction", "raise") not in DIRECTIONS:
+                raise ValueError(f"Rule {rule['name']} has unknown direction {rule['direction']}")
+
+        rules = sorted(rules, key=lambda rule: (self.actuators.index(rule["actuator"]), -rule.get("priority", 0)))
+        self.rules = rules
+        self.names = [rule["name"] for rule in rules]
+        self.targets = [rule["target"] for rule in rules]
+        self.auto_flags = [rule.get("auto_flag") for rule in rules]
+
+        self.sensor_index = np.array([self.sensors.index(rule["sensor"]) for rule in rules])
+        self.actuator_index = np.array([self.actuators.index(rule["actuator"]) for rule in rules])
+        self.band = np.array([float(rule["band"]) for rule in rules])
+        self.lookahead = np.array([float(rule.get("lookahead", 0)) for rule in rules])
+        self.direction = np.array([DIRECTIONS[rule.get("direction", "raise")] for rule in rules], dtype=np.int8)
+        self.priority = np.array([rule.get("priority", 0) for rule in rules])
+        self.group_starts = np.flatnonzero(np.diff(np.concatenate(([-1], self.actuator_index))))
+
+        # Priority of an actuator is the one of its strongest rule
+        n = len(self.actuators)
+        actuator_priority = np.full(n, -np.inf)
+        np.maximum.at(actuator_priority, self.actuator_index, self.priority)
+        self.interlock = np.zeros((n, n), dtype=bool)
+        for rule in rules:
+            a = self.actuators.index(rule["actuator"])
+            for other in rule.get("interlocks", []):
+                b = self.actuators.index(other)
+                self.interlock[a, b] = self.interlock[b, a] = True
+        # yields[a, b]: a may not switch on in the same tick as b
+        index = np.arange(n)
+        self.yields = self.interlock & ((actuator_priority[None, :] > actuator_priority[:, None]) |
+                                        ((actuator_priority[None, :] == actuator_priority[:, None]) &
+                                         (index[None, :] < index[:, None])))
+
+    def rule_index(self, name):
+        return self.names.index(name)
+
+    def band_for(self, name, default=None):
+        # `default` when the table has no rule of that name
+        if name not in self.names and default is not None:
+            return default
+        return float(self.band[self.rule_index(name)])
+
+
+def load_rules(path=RULES_PATH, **known):
+    # known: the sensors, actuators and targets the rules may use
+    with open(path) as f:
+        return RuleTable(json.load(f)["rules"], **known)
+
+
+class ZoneControl:
+    # Control state of every zone as NumPy arrays: sensor values
+    # (zones x sensors), targets and auto flags (zones x rules) and actuator
+    # states (zones x actuators). step() evaluates every rule of every zone
+    # in one vectorized pass and returns the (zone, actuator) positions that
+    # changed. A NaN reading (failed or missing sensor) never switches.
+    # Rules with a lookahead compare level + trend * lookahead instead of
+    # the reading, when a forecast (zones x sensors, NaN: none) is set.
+    def __init__(self, table, zones=1):
+        self.table = table
+        self.values = np.full((zones, len(table.sensors)), np.nan)
+        self.level = np.full((zones, len(table.sensors)), np.nan)
+        self.trend = np.full((zones, len(table.sensors)), np.nan)
+        self.target = np.zeros((zones, len(table.names)))
+        self.enabled = np.zeros((zones, len(table.names)), dtype=bool)
+        self.state = np.zeros((zones, len(table.actuators)), dtype=bool)
+
+    @property
+    def zones(self):
+        return self.values.shape[0]
+
+    def step(self):
+        t = self.table
+        current = self.evaluated()
+        low = current < self.target - t.band
+        high = current > self.target + t.band
+        raising = t.direction > 0
+        switch_on = np.where(raising, low, high) & self.enabled
+        switch_off = np.where(raising, high, low) & self.enabled
+        decision = switch_on.astype(np.int8) - switch_off.astype(np.int8)
+
+        # First decisive rule of each actuator group (groups are priority sorted)
+        rules = decision.shape[1]
+        position = np.where(decision != 0, np.arange(rules), rules)
+        first = np.minimum.reduceat(position, t.group_starts, axis=1)
+        chosen = np.take_along_axis(np.concatenate((decision, np.zeros((self.zones, 1), np.int8)), axis=1), first, axis=1)
+
+        turning_on = (chosen > 0) & ~self.state
+        staying_on = self.state & ~(chosen < 0)
+        # Interlocks: no switching on next to a running partner, and only the
+        # higher priority one of two partners switching on in the same tick
+        blocked = (staying_on.astype(np.int32) @ t.interlock.T.astype(np.int32) > 0) | \
+                  (turning_on.astype(np.int32) @ t.yields.T.astype(np.int32) > 0)
+        turning_on &= ~blocked
+
+        new_state = (staying_on | turning_on)
+        zones, actuators = np.nonzero(new_state != self.state)
+        self.state = new_state
+        return zones, actuators
+
+    def evaluated(self):
+        # Value each rule compares with its band, (zones x rules)
+        t = self.table
+        current = self.values[:, t.sensor_index]
+        if not t.lookahead.any():
+            return current
+        predicted = self.level[:, t.sensor_index] + self.trend[:, t.sensor_index] * t.lookahead
+        use = (t.lookahead > 0) & ~np.isnan(predicted) & ~np.isnan(current)
+        return np.where(use, predicted, current)
+
+    def thresholds(self, zone=0):
+        # sensor -> switching levels of the rules reading it
+        t = self.table
+        levels = {}
+        for i, sensor_index in enumerate(t.sensor_index):
+            sensor = t.sensors[sensor_index]
+            target = self.target[zone, i]
+            band = t.band[i]
+            levels.setdefault(sensor, []).extend([target - band, target + band])
+        return levels
+
+
+class ControlRules:
+    # Owns the compiled rule table and hot-reloads control_rules.json when
+    # its modification time changes (checked at most every `check_interval`
+    # seconds). A broken file, or one naming a sensor, actuator or target
+    # the owner does not know, is reported and the previous table stays
+    # live.
+    def __init__(self, path=RULES_PATH, zones=1, check_interval=2.0, sensors=None, actuators=None, targets=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.known = {"sensors": sensors, "actuators": actuators, "targets": targets}
+        self.mtime = os.stat(path).st_mtime
+        self.last_check = time.monotonic()
+        self.control = ZoneControl(load_rules(path, **self.known), zones)
+
+    @property
+    def table(self):
+        return self.control.table
+
+    def band_for(self, name, default=None):
+        return self.table.band_for(name, default)
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return False
+        self.last_check = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            table = load_rules(self.path, **self.known)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print("Keeping previous control rules, failed to load:", e)
+            return False
+
+        # Carry actuator states over by name
+        old = self.control
+        control = ZoneControl(table, old.zones)
+        for a, actuator in enumerate(table.actuators):
+            if actuator in old.table.actuators:
+                control.state[:, a] = old.state[:, old.table.actuators.index(actuator)]
+        self.control = control
+        print(f"Reloaded {len(table.names)} control rules")
+        return True
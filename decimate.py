@@ -0,0 +1,142 @@
+import numpy as np
+
+
+def m4_indices(x, y, x_min, bucket_width):
+    # M4 aggregation: for every pixel column keep the first, min, max and
+    # last sample. Returns the bucket id of each column and the four sample
+    # indices per column (shape: columns x 4), all computed without Python
+    # level loops.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.int64)
+
+    buckets = np.floor((x - x_min) / bucket_width).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], n) - 1
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+
+    # NaN gaps (failed reads) must not hide the real peaks of a column
+    lows = np.fmin.reduceat(y, starts)
+    highs = np.fmax.reduceat(y, starts)
+    index = np.arange(n)
+    imin = np.minimum.reduceat(np.where(y == lows[segment], index, n), starts)
+    imax = np.minimum.reduceat(np.where(y == highs[segment], index, n), starts)
+    imin = np.where(imin == n, starts, imin)
+    imax = np.where(imax == n, starts, imax)
+
+    return buckets[starts], np.stack([starts, imin, imax, ends], axis=1)
+
+
+def flatten_m4(columns):
+    # Order the four picks of each column by position and drop repeats
+    # (single-sample columns, or a min that is also the first sample)
+    idx = np.sort(columns, axis=1).ravel()
+    if len(idx) == 0:
+        return idx
+    keep = np.concatenate(([True], np.diff(idx) != 0))
+    return idx[keep]
+
+
+def m4_decimate(x, y, width, x_range=None):
+    # One-shot decimation of (x, y) to about 4 points per pixel column
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x_range is None:
+        if len(x) == 0:
+            return x, y
+        x_range = (x[0], x[-1])
+    lo, hi = x_range
+    i0 = max(np.searchsorted(x, lo, side='left') - 1, 0)
+    i1 = min(np.searchsorted(x, hi, side='right') + 1, len(x))
+    if i1 - i0 <= 4 * width or hi <= lo:
+        return x[i0:i1], y[i0:i1]
+    _, columns = m4_indices(x[i0:i1], y[i0:i1], lo, (hi - lo) / width)
+    idx = flatten_m4(columns) + i0
+    return x[idx], y[idx]
+
+
+class M4Decimator:
+    # Keeps the full series and a cache of per-column M4 picks. The columns
+    # are anchored to absolute x positions, so the cache stays valid when new
+    # samples are appended (only the last column is recomputed) and is only
+    # rebuilt when the pixel width or the visible range changes.
+    def __init__(self):
+        self.x = np.empty(0, dtype=float)
+        self.y = np.empty(0, dtype=float)
+        self.size = 0
+        self.reset_cache()
+
+    def reset_cache(self):
+        self.bucket_width = None
+        self.cache_start = 0
+        self.cache_end = 0
+        self.cache_columns = np.empty((0, 4), dtype=np.int64)
+
+    def set_data(self, x, y):
+        self.x = np.array(x, dtype=float)
+        self.y = np.array(y, dtype=float)
+        self.size = len(self.x)
+        self.reset_cache()
+
+    def append(self, x, y):
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        needed = self.size + len(x)
+        if needed > len(self.x):
+            capacity = max(needed, 2 * len(self.x), 64)
+            self.x = np.resize(self.x, capacity)
+            self.y = np.resize(self.y, capacity)
+        self.x[self.size:needed] = x
+        self.y[self.size:needed] = y
+        self.size = needed
+
+    def data(self):
+        return self.x[:self.size], self.y[:self.size]
+
+    def decimate(self, x_range, width):
+        x, y = self.data()
+        width = max(int(width), 1)
+        lo, hi = x_range
+        if self.size == 0 or hi <= lo:
+            return x, y
+
+        i0 = max(np.searchsorted(x, lo, side='left') - 1, 0)
+        i1 = min(np.searchsorted(x, hi, side='right') + 1, self.size)
+        if i1 - i0 <= 4 * width:
+            self.reset_cache()
+            return x[i0:i1], y[i0:i1]
+
+        bucket_width = (hi - lo) / width
+        if self.bucket_width is None or not np.isclose(bucket_width, self.bucket_width, rtol=1e-9, atol=0.0):
+            self.reset_cache()
+            self.bucket_width = bucket_width
+
+        if i0 < self.cache_start or i1 > self.cache_end:
+            if self.cache_end > self.cache_start and self.cache_start <= i0 <= self.cache_end:
+                # Appended samples: redo the last (still open) column onwards
+                self.extend_cache(self.cache_columns[-1, 0], i1)
+            else:
+                # Moved outside the cached range: rebuild with some slack so
+                # small pans stay cached
+                margin = (i1 - i0) // 2
+                self.rebuild_cache(max(i0 - margin, 0), min(i1 + margin, self.size))
+
+        visible = (self.cache_columns[:, 3] >= i0) & (self.cache_columns[:, 0] < i1)
+        idx = flatten_m4(self.cache_columns[visible])
+        return x[idx], y[idx]
+
+    def rebuild_cache(self, start, end):
+        x, y = self.data()
+        _, columns = m4_indices(x[start:end], y[start:end], 0.0, self.bucket_width)
+        self.cache_columns = columns + start
+        self.cache_start = start
+        self.cache_end = end
+
+    def extend_cache(self, start, end):
+        x, y = self.data()
+        _, columns = m4_indices(x[start:end], y[start:end], 0.0, self.bucket_width)
+        keep = self.cache_columns[:, 0] < start
+        self.cache_columns = np.concatenate((self.cache_columns[keep], columns + start))
+        self.cache_end = end
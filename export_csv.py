@@ -0,0 +1,109 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from history_store import CHANNELS, DEFAULT_ROOT, HistoryStore
+from actuator_journal import DEVICES, DEFAULT_PATH as JOURNAL_PATH, JournalReader
+
+
+CHUNK_ROWS = 65536
+FORMATS = {
+    "temperature": "%.1f",
+    "soil_moisture": "%.1f",
+    "humidity": "%.1f",
+    "ph": "%.2f",
+    "light": "%.1f"
+}
+
+
+def parse_time(value):
+    # Unix seconds, or an ISO date / date-time in local time
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def chunks(store, start, end, rows=CHUNK_ROWS):
+    # Records of [start, end) in slices of at most `rows`: a day file at a
+    # time, so memory stays bounded whatever the range
+    for records in store.read_range(start, end):
+        for i in range(0, len(records), rows):
+            yield records[i:i + rows]
+
+
+def with_actuators(record_chunks, reader, devices):
+    # Adds the state of each device at every sample time
+    times = {device: reader.events[reader.index[device]]["t"] for device in devices}
+    # State after event i is states[i + 1]; off before the first event
+    states = {device: np.concatenate(([0], reader.events[reader.index[device]]["new"])) for device in devices}
+    for records in record_chunks:
+        t = np.asarray(records["t"])
+        yield records, {device: states[device][np.searchsorted(times[device], t, side="right")]
+                        for device in devices}
+
+
+def format_column(values, fmt):
+    text = np.char.mod(fmt, values)
+    if values.dtype.kind == "f":
+        text = np.where(np.isnan(values), "", text)
+    return text
+
+
+def to_csv(rows, channels, devices):
+    # Formats whole columns with NumPy string operations, one block per chunk
+    for records, actuators in rows:
+        t = np.asarray(records["t"])
+        columns = [
+            np.datetime_as_string((t * 1000).astype("datetime64[ms]"), unit="ms", timezone="UTC"),
+            np.char.mod("%.3f", t)
+        ]
+        columns += [format_column(np.asarray(records[name], dtype=float), FORMATS[name]) for name in channels]
+        columns += [np.char.mod("%d", actuators[device]) for device in devices]
+        lines = columns[0]
+        for column in columns[1:]:
+            lines = np.char.add(np.char.add(lines, ","), column)
+        yield "\n".join(lines.tolist()) + "\n"
+
+
+def export(out, start, end, channels=CHANNELS, devices=DEVICES, root=DEFAULT_ROOT, journal=JOURNAL_PATH,
+           rows=CHUNK_ROWS):
+    out.write(",".join(["time", "unix_time"] + list(channels) + list(devices)) + "\n")
+    reader = JournalReader(journal)
+    written = 0
+    for block in to_csv(with_actuators(chunks(HistoryStore(root), start, end, rows), reader, devices),
+                        channels, devices):
+        out.write(block)
+        written += block.count("\n")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sensor and actuator history as CSV")
+    parser.add_argument("--start", type=parse_time, help="Unix time or ISO date (default: 24 h ago)")
+    parser.add_argument("--end", type=parse_time, help="Unix time or ISO date (default: now)")
+    parser.add_argument("--channels", nargs="+", choices=CHANNELS, default=CHANNELS)
+    parser.add_argument("--devices", nargs="*", choices=DEVICES, default=DEVICES,
+                        help="actuator state columns (none with an empty list)")
+    parser.add_argument("--output", "-o", help="CSV file (default: standard output)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows formatted per block")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="history directory")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="actuator journal")
+    args = parser.parse_args()
+
+    end = args.end if args.end is not None else time.time()
+    start = args.start if args.start is not None else end - 86400
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        written = export(out, start, end, args.channels, args.devices, args.root, args.journal, args.chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Exported {written} rows", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class Forecaster:
+    # Short-horizon forecast of every channel of every zone from a window of
+    # the last `window` samples (times shared, values window x zones x
+    # channels). Each add() refits, as whole-array operations:
+    #   slope   least-squares slope over the window, units per second
+    #   level   simple exponential smoothing of the readings, moved forward
+    #           by the lag SES has on a linear trend ((1 - alpha) / alpha
+    #           sample periods) so it estimates the value now
+    # predict(h) is level + slope * h. Channels with fewer than
+    # `min_samples` readings in the window forecast NaN.
+    def __init__(self, channels, zones=1, window=120, alpha=0.3, min_samples=10):
+        self.channels = list(channels)
+        shape = (zones, len(self.channels))
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.times = np.full(window, np.nan)
+        self.values = np.full((window,) + shape, np.nan)
+        self.head = 0
+        self.smoothed = np.full(shape, np.nan)
+        self.slope = np.full(shape, np.nan)
+        self.level = np.full(shape, np.nan)
+
+    @property
+    def window(self):
+        return len(self.times)
+
+    def add(self, t, values):
+        values = np.asarray(values, dtype=float)
+        self.times[self.head] = t
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.window
+
+        present = ~np.isnan(values)
+        self.smoothed = np.where(np.isnan(self.smoothed), values,
+                                 np.where(present, self.smoothed + self.alpha * (values - self.smoothed),
+                                          self.smoothed))
+        self.fit()
+
+    def fit(self):
+        # Per-channel least squares over the samples present in the window;
+        # times relative to the newest sample keep the sums well conditioned
+        t = self.times - np.nanmax(self.times)
+        mask = ~np.isnan(self.values) & ~np.isnan(t)[:, None, None]
+        tt = np.where(mask, t[:, None, None], 0.0)
+        vv = np.where(mask, self.values, 0.0)
+        n = mask.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t_mean = tt.sum(axis=0) / n
+            v_mean = vv.sum(axis=0) / n
+            dt = np.where(mask, tt - t_mean, 0.0)
+            slope = (dt * (vv - v_mean)).sum(axis=0) / (dt * dt).sum(axis=0)
+            # Mean sample period of each channel's window
+            period = -t_mean * 2 / np.maximum(n - 1, 1)
+        enough = (n >= self.min_samples) & np.isfinite(slope)
+        self.slope = np.where(enough, slope, np.nan)
+        lag = (1 - self.alpha) / self.alpha * period
+        self.level = np.where(enough, self.smoothed + self.slope * lag, np.nan)
+
+    def predict(self, horizon):
+        # horizon: seconds, a scalar or one per channel
+        return self.level + self.slope * np.asarray(horizon, dtype=float)
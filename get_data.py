@@ -1,24 +1,84 @@
+import json
+import struct
+import zlib
+
+import numpy as np
 import requests
 import time
 
-def read_sensor():
-    RPI_IP = '192.168.16.54'  # Replace with your Pi’s IP
+from RaspberryPi.ts_codec import decode
+
+RPI_IP = '192.168.16.54'  # Replace with your Pi’s IP
 
+
+def read_sample():
+    # Latest reading with the sequence number of the Pi's newest buffered
+    # sample, or None when the Pi cannot be reached
     try:
         response = requests.get(f'http://{RPI_IP}:5000/sensor')
         response.raise_for_status()
-        data = response.json()
-
-        temperature = data['temperature']
-        soil_moisture = data['soil_moisture']
-        humidity = data['humidity']
-
-        return temperature, soil_moisture, humidity
+        return response.json()
 
     except requests.RequestException as e:
         print("Failed to get sensor data:", e)
+        return None
+
+
+def read_sensor():
+    data = read_sample()
+    if data is None:
         return None, None, None
 
+    temperature = data['temperature']
+    soil_moisture = data['soil_moisture']
+    humidity = data['humidity']
+
+    return temperature, soil_moisture, humidity
+
+
+def unpack_columns(payload):
+    # Decodes a batch from the Pi's /history endpoint into a dict of NumPy
+    # columns (seq, ts and one per sensor); see RaspberryPi/sample_ring.py
+    data = zlib.decompress(payload)
+    if data[:4] != b"SAH1":
+        raise ValueError("Not a sample history batch")
+    header_length, = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_length].decode('utf-8'))
+    offset = 8 + header_length
+    count = header["count"]
+    columns = {}
+    for name, dtype in header["columns"]:
+        column = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        columns[name] = column.astype(column.dtype.newbyteorder("="))
+        offset += column.nbytes
+    return columns
+
+
+def fetch_history(start=None, end=None, since=None, limit=None, codec="tsc"):
+    # Buffered samples in [start, end) or after sequence number `since`, as
+    # NumPy columns, in one compressed round trip. codec "tsc" is the
+    # delta/XOR block codec, None the zlib-compressed columns.
+    params = {"start": start, "end": end, "since": since, "limit": limit, "codec": codec}
+    response = requests.get(f'http://{RPI_IP}:5000/history',
+                            params={k: v for k, v in params.items() if v is not None}, timeout=30)
+    response.raise_for_status()
+    if codec != "tsc":
+        return unpack_columns(response.content)
+    ts, columns = decode(response.content)
+    columns["ts"] = ts
+    return columns
+
+
+def fetch_backfill(since):
+    # Samples the Pi buffered after sequence number `since`, as NumPy
+    # columns, or None when they cannot be fetched
+    try:
+        return fetch_history(since=since)
+
+    except (requests.RequestException, ValueError, struct.error, zlib.error) as e:
+        print("Failed to get backfill:", e)
+        return None
+
 # # Example usage
 # while True:
 #     temp, moisture, hum = read_sensor()
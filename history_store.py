@@ -0,0 +1,228 @@
+import calendar
+import functools
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from decimate import m4_decimate
+from RaspberryPi.ts_codec import encode, decode
+
+
+CHANNELS = ["temperature", "soil_moisture", "humidity", "ph", "light"]
+
+RECORD = np.dtype([("t", "<f8")] + [(name, "<f4") for name in CHANNELS])
+
+DAY = 86400
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+
+RAW_SUFFIX = ".bin"
+COMPACT_SUFFIX = ".tsc"
+
+
+@functools.lru_cache(maxsize=8)
+def read_compact(path, mtime):
+    # Decoded day file as records; cached per (path, mtime) so zooming
+    # around one closed day decodes it once
+    with open(path, "rb") as f:
+        timestamps, columns = decode(f.read())
+    records = np.zeros(len(timestamps), dtype=RECORD)
+    records["t"] = timestamps
+    for name in CHANNELS:
+        if name in columns:
+            records[name] = columns[name]
+    records.flags.writeable = False
+    return records
+
+
+def drop_torn_tail(path, itemsize):
+    # A write cut short (power loss) can leave part of a record at the end
+    # of an append-only file; cut it off so later records stay aligned.
+    # Returns the number of bytes dropped.
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    torn = size % itemsize
+    if torn:
+        os.truncate(path, size - torn)
+        print(f"Dropped {torn} bytes of a torn record at the end of {path}")
+    return torn
+
+
+class HistoryStore:
+    # Sensor history persisted as one append-only file of fixed-size records
+    # per UTC day (history/YYYY-MM-DD.bin). Reads memory-map the day files
+    # and binary search the timestamps, so a query only touches the pages of
+    # the requested range. Closed days are compacted in the background into
+    # YYYY-MM-DD.tsc with the delta/XOR codec of RaspberryPi/ts_codec.py.
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.current_day = None
+        self.current_file = None
+        # Serializes writers (appends, compaction) on the day files
+        self.lock = threading.RLock()
+        self.compacting = False
+
+    def day_path(self, day, suffix=RAW_SUFFIX):
+        return os.path.join(self.root, time.strftime("%Y-%m-%d", time.gmtime(day * DAY)) + suffix)
+
+    def append(self, timestamp, values):
+        # values: dict channel -> reading, missing or None readings become NaN
+        record = np.zeros(1, dtype=RECORD)
+        record["t"] = timestamp
+        for name in CHANNELS:
+            value = values.get(name)
+            record[name] = np.nan if value is None else value
+
+        day = int(timestamp // DAY)
+        with self.lock:
+            if day != self.current_day:
+                self.open_day(day)
+            # One write per record keeps a concurrent reader on whole records
+            self.current_file.write(record.tobytes())
+            self.current_file.flush()
+
+    def open_day(self, day):
+        rolled_over = self.current_day is not None and day > self.current_day
+        self.close()
+        path = self.day_path(day)
+        drop_torn_tail(path, RECORD.itemsize)
+        self.current_file = open(path, "ab")
+        self.current_day = day
+        if rolled_over:
+            self.start_compaction()
+
+    def append_many(self, timestamps, values):
+        # Bulk append of time-ordered samples; values: channel -> array,
+        # missing channels become NaN. One write per day file.
+        timestamps = np.asarray(timestamps, dtype=float)
+        if len(timestamps) == 0:
+            return
+        records = np.zeros(len(timestamps), dtype=RECORD)
+        records["t"] = timestamps
+        for name in CHANNELS:
+            records[name] = values.get(name, np.nan)
+
+        days = (timestamps // DAY).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        with self.lock:
+            for chunk in np.split(records, bounds):
+                day = int(chunk["t"][0] // DAY)
+                if day != self.current_day:
+                    self.open_day(day)
+                self.current_file.write(chunk.tobytes())
+                self.current_file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.current_file is not None:
+                self.current_file.close()
+                self.current_file = None
+                self.current_day = None
+
+    def read_raw_day(self, day):
+        path = self.day_path(day)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty(0, dtype=RECORD)
+        count = size // RECORD.itemsize
+        if count == 0:
+            return np.empty(0, dtype=RECORD)
+        return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+    def read_day(self, day):
+        raw = self.read_raw_day(day)
+        path = self.day_path(day, COMPACT_SUFFIX)
+        try:
+            compact = read_compact(path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return raw
+        if len(raw) == 0:
+            return compact
+        # Late records (e.g. a backfill) written after the day was compacted,
+        # or a raw file that could not be removed yet: merge, dropping
+        # duplicate timestamps
+        records = np.concatenate((compact, raw))
+        _, first = np.unique(records["t"], return_index=True)
+        return records[first]
+
+    def start_compaction(self):
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact_closed_days, name="history-compaction", daemon=True).start()
+
+    def compact_closed_days(self):
+        try:
+            today = int(time.time() // DAY)
+            for path in sorted(glob.glob(os.path.join(self.root, "*" + RAW_SUFFIX))):
+                stamp = os.path.basename(path)[:-len(RAW_SUFFIX)]
+                try:
+                    day = calendar.timegm(time.strptime(stamp, "%Y-%m-%d")) // DAY
+                except ValueError:
+                    continue
+                if day < today and day != self.current_day:
+                    self.compact_day(day)
+        finally:
+            self.compacting = False
+
+    def compact_day(self, day):
+        # Encodes the day (merged with an earlier compaction, if any) into
+        # the .tsc file, atomically replaced, then drops the raw file
+        with self.lock:
+            if not os.path.exists(self.day_path(day)):
+                return
+            records = self.read_day(day)
+            if len(records) == 0:
+                return
+            data = encode(records["t"], {name: np.asarray(records[name]) for name in CHANNELS})
+            path = self.day_path(day, COMPACT_SUFFIX)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            raw_path = self.day_path(day)
+            try:
+                os.remove(raw_path)
+            except OSError as e:
+                # Still mapped by a reader (Windows), retried next time;
+                # until then read_day merges both files
+                print(f"Keeping {raw_path} for now:", e)
+                return
+            print(f"Compacted {os.path.basename(raw_path)}: {len(records) * RECORD.itemsize} -> {len(data)} bytes")
+
+    def read_range(self, start, end):
+        # Yields the records of [start, end) one day file at a time
+        for day in range(int(start // DAY), int(end // DAY) + 1):
+            records = self.read_day(day)
+            if len(records) == 0:
+                continue
+            i0 = np.searchsorted(records["t"], start, side="left")
+            i1 = np.searchsorted(records["t"], end, side="left")
+            if i1 > i0:
+                yield records[i0:i1]
+
+    def query(self, channel, start, end, width=None):
+        # Returns (timestamps, values) of one channel in [start, end). With a
+        # pixel width the series is M4-decimated to that resolution per day
+        # file, so memory stays bounded by the width and not by the range.
+        times = []
+        values = []
+        for records in self.read_range(start, end):
+            t = np.asarray(records["t"])
+            v = np.asarray(records[channel], dtype=float)
+            if width:
+                t, v = m4_decimate(t, v, width, (start, end))
+            times.append(t)
+            values.append(v)
+        if not times:
+            return np.empty(0), np.empty(0)
+        return np.concatenate(times), np.concatenate(values)
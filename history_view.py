@@ -0,0 +1,164 @@
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+TILE_BASE = 60.0        # seconds covered by a level 0 tile
+TILE_COLUMNS = 1024     # M4 columns fetched per tile
+LIVE_TILE_TTL = 1.0     # seconds before a tile that contains "now" is refetched
+DEBOUNCE_MS = 200
+DEFAULT_SPAN = 24 * 3600
+
+# Store reads run off the GUI thread, one at a time
+loader_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+
+
+class TileCache:
+    # LRU of decimated tiles shared by every graph, so reopening a dashboard
+    # or panning back over a range does not hit the store again
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        entry = self.tiles.get(key)
+        if entry is None:
+            return None
+        t, v, expires = entry
+        if expires is not None and time.time() > expires:
+            return None
+        self.tiles.move_to_end(key)
+        return t, v
+
+    def put(self, key, t, v, expires=None):
+        self.tiles[key] = (t, v, expires)
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+
+
+tile_cache = TileCache()
+
+
+def tile_level(span):
+    # Smallest power-of-two tile that is at least as wide as the view, so a
+    # view never covers more than two tiles
+    return max(0, math.ceil(math.log2(max(span, TILE_BASE) / TILE_BASE)))
+
+
+class HistoryRange(QObject):
+    # Feeds a SeriesCurve with the persisted history of whatever time range
+    # its graph shows. Range changes are debounced, the visible range is
+    # fetched as fixed tiles at a resolution matching the tile span, and the
+    # neighbouring tiles are prefetched so short pans are served from cache.
+    loaded = pyqtSignal(object, object, object)
+
+    def __init__(self, graph, series, store, channel, span=DEFAULT_SPAN):
+        super().__init__()
+        self.graph = graph
+        self.series = series
+        self.store = store
+        self.channel = channel
+        self.span = span
+        self.follow = True
+        self.moving = False
+        self.pending = set()
+        self.visible_keys = []
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.load)
+        self.loaded.connect(self.on_loaded)
+
+        view_box = graph.getViewBox()
+        view_box.sigXRangeChanged.connect(self.on_range_changed)
+        view_box.sigResized.connect(self.on_range_changed)
+        graph.scene().sigMouseClicked.connect(self.on_mouse_clicked)
+
+    def refresh(self):
+        # Called on every dashboard update, keeps a live view on the newest data
+        if self.follow:
+            now = time.time()
+            self.moving = True
+            try:
+                self.graph.setXRange(now - self.span, now, padding=0)
+            finally:
+                self.moving = False
+        self.debounce.start()
+
+    def go_live(self):
+        self.follow = True
+        self.refresh()
+
+    def on_mouse_clicked(self, event):
+        if event.double():
+            self.go_live()
+
+    def on_range_changed(self, *args):
+        if not self.moving:
+            # The user zoomed or panned: stay live only if the right edge
+            # is still at the present
+            x_min, x_max = self.graph.getViewBox().viewRange()[0]
+            self.span = max(x_max - x_min, 1.0)
+            self.follow = x_max >= time.time() - 0.02 * self.span
+        self.debounce.start()
+
+    def tile_key(self, level, index):
+        return (self.store.root, self.channel, level, index)
+
+    def load(self):
+        # Hidden dashboards never query the store
+        if not self.graph.isVisible():
+            return
+        x_min, x_max = self.graph.getViewBox().viewRange()[0]
+        level = tile_level(x_max - x_min)
+        tile_span = TILE_BASE * 2 ** level
+        first = int(x_min // tile_span)
+        last = int(x_max // tile_span)
+
+        self.visible_keys = [self.tile_key(level, k) for k in range(first, last + 1)]
+        prefetch = [self.tile_key(level, first - 1), self.tile_key(level, last + 1)]
+        for key in self.visible_keys + prefetch:
+            if tile_cache.get(key) is None and key not in self.pending:
+                self.pending.add(key)
+                loader_pool.submit(self.fetch, key, tile_span)
+        self.show_tiles()
+
+    def fetch(self, key, tile_span):
+        # Runs on the loader thread
+        index = key[3]
+        start = index * tile_span
+        end = start + tile_span
+        try:
+            t, v = self.store.query(self.channel, start, end, TILE_COLUMNS)
+        except Exception as e:
+            print(f"Failed to load {self.channel} history:", e)
+            t, v = np.empty(0), np.empty(0)
+        self.loaded.emit(key, (t, v), end)
+
+    def on_loaded(self, key, data, end):
+        self.pending.discard(key)
+        t, v = data
+        # The tile holding "now" keeps growing, only cache it briefly
+        expires = time.time() + LIVE_TILE_TTL if end > time.time() else None
+        tile_cache.put(key, t, v, expires)
+        if key in self.visible_keys:
+            self.show_tiles()
+
+    def show_tiles(self):
+        times = []
+        values = []
+        for key in self.visible_keys:
+            tile = tile_cache.get(key)
+            if tile is None:
+                # Keep showing the old data until the whole range is loaded
+                return
+            times.append(tile[0])
+            values.append(tile[1])
+        if times:
+            self.series.set_data(np.concatenate(times), np.concatenate(values))
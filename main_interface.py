@@ -1,18 +1,19 @@
 
 import json
+import os
 import socket
 import sys
 import random
+import threading
 import time
+import numpy as np
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, QSlider, 
                             QTabWidget, QFrame, QGridLayout, QScrollArea,
-                            QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer, QSize
-from PyQt5.QtGui import QFont, QColor, QPalette, QIcon
+                            QSizePolicy, QShortcut)
+from PyQt5.QtCore import Qt, QSize, pyqtSignal
+from PyQt5.QtGui import QFont, QColor, QPalette, QIcon, QKeySequence
 
 from Temperature import Temperature_Dashboard
 from Humidity import Humidity_Dashboard
@@ -21,19 +22,84 @@ from Water_pH import Water_pH_Dashboard
 from Lighting import Lighting_Dashboard
 
 from getaway import function_call
-from get_data import read_sensor
+from get_data import read_sample, fetch_backfill
+from pi_client import PiClient
+from ws_session import PiSession
 
 from Warning import RoundedWarningDialog
 
+from chart_render import ChartRenderWorker, ChartView
+from history_store import HistoryStore
+from tick_timing import StageTimer
+from profiler_toggle import ProfilerToggle
+from stall_watchdog import StallWatchdog, setup_stall_log
+from scheduler import FixedRateScheduler
+from adaptive_rate import AdaptivePoller
+from control import ControlRules
+from actuator_journal import ActuatorJournal
+from state_snapshot import StateSnapshot
+from zone_model import ZoneModel, zone_value, zone_state, zone_history, format_reading
+from anomaly import AnomalyDetector
+from forecast import Forecaster
+from rolling_stats import ChannelStats, format_summary, format_duration
+
+
+# Base period of the control tick, seconds
+TICK_PERIOD = 0.5
+
+TRACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")
+
+# Sensors wired to the Pi's ADC; their loops can run on the Pi (edge control)
+EDGE_SENSORS = ("temperature", "soil_moisture", "humidity")
+
+# State saved for a warm start, see restore_snapshot()
+SNAPSHOT_TARGETS = ["target_heat", "target_humidity", "target_water_level", "target_moisture", "target_light"]
+SNAPSHOT_FLAGS = ["auto_climate_temperature", "auto_climate_lighting", "auto_climate_humidity",
+                  "auto_climate_soil", "auto_climate_water"]
+SNAPSHOT_HISTORY = ["temp_history", "humidity_history", "moisture_history", "ph_history", "light_history"]
+# Older recent history is not shown again after a restart
+SNAPSHOT_HISTORY_MAX_AGE = 3600
+# Actuators are only switched back on from a snapshot this recent (a
+# reboot); a stale one restores targets and flags only
+SNAPSHOT_ACTUATOR_MAX_AGE = 600
+
+# Target each channel's time above / below is measured against
+STATS_TARGETS = {
+    "temperature": "target_heat",
+    "humidity": "target_humidity",
+    "soil_moisture": "target_moisture",
+    "light": "target_light",
+    "water_level": "target_water_level"
+}
+
 
 
-class MplCanvas(FigureCanvas):
-    def __init__(self, width=5, height=4, dpi=100):
-        self.fig, self.ax = plt.subplots(figsize=(width, height), dpi=dpi)
-        super(MplCanvas, self).__init__(self.fig)
-        self.setStyleSheet("background-color:white;")
-        
 class AgriculturalMonitoringSystem(QMainWindow):
+    # Readings, actuator states and chart history live in the zone model
+    # (self.zones); these scalar views of zone 0 serve the cards, the
+    # dashboards and the toggles
+    temperature = zone_value("temperature")
+    moisture = zone_value("soil_moisture")
+    humidity = zone_value("humidity")
+    ph = zone_value("ph")
+    light_level = zone_value("light")
+    water_level = zone_value("water_level")
+
+    heater_status = zone_state("HEATING")
+    humidifier_status = zone_state("HUMIDIFIER")
+    watering_status = zone_state("WATERING")
+    pump_water_status = zone_state("WATER_PUMP")
+    light_status = zone_state("LIGHTNING")
+
+    temp_history = zone_history("temperature")
+    humidity_history = zone_history("humidity")
+    moisture_history = zone_history("soil_moisture")
+    ph_history = zone_history("ph")
+    light_history = zone_history("light")
+
+    # (since, until, now, samples) of a backfill fetched off the GUI thread
+    backfill_ready = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Agricultural Monitoring System")
@@ -74,12 +140,21 @@ class AgriculturalMonitoringSystem(QMainWindow):
         self.auto_climate_soil = False
         self.auto_climate_water = False
 
-        # Initialize system states
-        self.light_status = False
-        self.watering_status = False
-        self.heater_status = False
-        self.humidifier_status = False
-        self.pump_water_status = False
+        # Zones x channels readings, zones x actuators states and
+        # zones x time x channels history; one greenhouse zone for now
+        self.zones = ZoneModel(zones=1)
+        # Rolling and per-day statistics of every channel, for the summaries
+        # (seeded with today's stored history once the store is open)
+        self.stats = {channel: ChannelStats() for channel in self.zones.channels}
+        # The Water/pH dashboard simulates its water level; its statistics
+        # live here so they outlast the dashboard window
+        self.water_level_stats = ChannelStats()
+        # Stuck, railed, out of range, spiking or drifting probes; their
+        # control loops leave auto mode while flagged
+        self.anomalies = AnomalyDetector(self.zones.channels, zones=self.zones.zones)
+        # Trend and smoothed level of every channel, for rules that act on
+        # the reading forecast `lookahead` seconds ahead
+        self.forecaster = Forecaster(self.zones.channels, zones=self.zones.zones)
         self.auto_climate_active = False 
 
         self.target_heat = 15.0
@@ -88,12 +163,76 @@ class AgriculturalMonitoringSystem(QMainWindow):
         self.target_moisture = 60.0
         self.target_light = 60.0
 
-        # Data history
-        self.temp_history = [random.uniform(15, 35) for _ in range(24)]
-        self.humidity_history = [random.uniform(20, 50) for _ in range(24)]
-        self.moisture_history = [random.uniform(60, 95) for _ in range(24)]
-        self.ph_history = [random.uniform(5.5, 7.0) for _ in range(24)]
-        self.light_history = [random.uniform(65, 95) for _ in range(24)]
+        self.actuator_attributes = {
+            "HEATING": ("heater_status", "toggle_heater"),
+            "HUMIDIFIER": ("humidifier_status", "toggle_humidifier"),
+            "WATERING": ("watering_status", "toggle_watering"),
+            "WATER_PUMP": ("pump_water_status", "toggle_pump_water"),
+            "LIGHTNING": ("light_status", "toggle_light")
+        }
+        # Vectorized hysteresis control compiled from control_rules.json,
+        # one row per zone of the zone model
+        self.control_rules = ControlRules(zones=self.zones.zones, sensors=self.zones.channels,
+                                          actuators=list(self.actuator_attributes), targets=SNAPSHOT_TARGETS)
+        # Edge control: the Pi runs the loops of its own sensors and the GUI
+        # only pushes targets and follows the reported device states
+        self.edge_control = os.environ.get("SMARTAGR_EDGE_CONTROL") == "1"
+        # Without edge control, whether the Pi confirmed its edge loop is off
+        # (it may still run one an earlier session enabled)
+        self.edge_released = False
+        # Devices the Pi reported as driven by itself, with the cause
+        # ("edge" loop or timed "schedule")
+        self.pi_managed = {}
+        # Unified Pi service: sensors and commands over one connection
+        self.pi_client = PiClient() if os.environ.get("SMARTAGR_PI_SERVICE") == "1" else None
+        # WebSocket session (e.g. ws://localhost:8765 for ws_standin.py):
+        # telemetry pushed down, commands up, on one connection
+        self.ws_session = None
+        if os.environ.get("SMARTAGR_WS_URL"):
+            self.ws_session = PiSession(os.environ["SMARTAGR_WS_URL"], self)
+            self.ws_session.open()
+
+        # Warm start: targets, flags and recent history from the last
+        # snapshot (actuators once the control panel exists)
+        self.snapshot = StateSnapshot()
+        saved = self.snapshot.load()
+        if saved is not None:
+            self.restore_snapshot(saved)
+
+        # Per-stage timings of the sensor tick
+        self.timing = StageTimer()
+        QShortcut(QKeySequence("Ctrl+Shift+T"), self, activated=self.export_tick_trace)
+
+        # Attach a profiler to the live session (env var, key combo or SIGUSR2)
+        self.profiler = ProfilerToggle(self)
+        QShortcut(QKeySequence("Ctrl+Alt+Shift+P"), self, activated=self.profiler.toggle)
+        self.profiler.install()
+
+        # Log the main thread's stack whenever the event loop freezes
+        setup_stall_log()
+        self.stall_watchdog = StallWatchdog(self, threshold=float(os.environ.get("SMARTAGR_STALL_THRESHOLD", 1.0)))
+        self.stall_watchdog.start()
+
+        # Persisted sensor history, read back by the zoomable dashboard graphs.
+        # Outages are filled from the Pi's sample ring on reconnect.
+        self.history_store = HistoryStore()
+        self.history_store.start_compaction()
+        self.seed_stats()
+        self.last_stored = None
+        self.pi_offline = False
+        self.pi_seq = None
+        # Samples read while a backfill is being fetched, stored after it so
+        # the day files stay in time order
+        self.backfill_pending = False
+        self.held_samples = []
+        self.backfill_ready.connect(self.finish_backfill)
+        # The backfill has its own connection, the tick keeps the shared one
+        self.backfill_client = None
+        if self.pi_client is not None:
+            self.backfill_client = PiClient(self.pi_client.host, self.pi_client.port, timeout=30.0)
+
+        # Every actuator state change with its cause, written in batches
+        self.journal = ActuatorJournal()
         
         # Set up main widget and layout
         self.central_widget = QWidget()
@@ -116,23 +255,61 @@ class AgriculturalMonitoringSystem(QMainWindow):
         
         # Create control panel
         self.setup_control_panel()
+        if saved is not None:
+            self.restore_actuators(saved)
+        # The journal may end with a device on that starts off here: record
+        # the starting states so its duty cycles do not run on across the gap
+        for actuator, (attribute, _) in self.actuator_attributes.items():
+            self.journal.record(actuator, getattr(self, attribute), "restore")
         
-        # Setup timer for sensor updates
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_sensor_data)
-        self.timer.start(500)
-        
-        # Initial sensor update
-        self.update_sensor_data()
+        # Optional adaptive acquisition: poll slowly while readings are
+        # stable and far from any switching threshold
+        self.adaptive_poller = None
+        if os.environ.get("SMARTAGR_ADAPTIVE_POLLING") == "1":
+            self.adaptive_poller = AdaptivePoller(base_period=TICK_PERIOD)
+
+        # Fixed-rate control tick: acquisition, control, actuation, display.
+        # The first tick runs as soon as the event loop starts. Adaptive
+        # acquisition has a task period of its own on a grid fine enough for
+        # its fastest rate; the other tasks keep the base rate.
+        grid = TICK_PERIOD if self.adaptive_poller is None else self.adaptive_poller.min_period
+        base = None if grid == TICK_PERIOD else TICK_PERIOD
+        self.scheduler = FixedRateScheduler(self, period=grid,
+                                            policy=os.environ.get("SMARTAGR_TICK_POLICY", "skip"),
+                                            timing=self.timing)
+        self.acquire_task = self.scheduler.add_task("acquire", self.update_sensor_data, period=base)
+        self.scheduler.add_task("control", self.run_control, period=base)
+        self.scheduler.add_task("actuate", self.send_device_states, period=base)
+        self.scheduler.add_task("update_charts", self.update_charts, period=base)
+        self.scheduler.add_task("snapshot", self.submit_snapshot, period=self.snapshot.interval)
+        self.scheduler.start()
 
-    def send_status_to_raspberry(self, device_states: dict):
+    def send_status_to_raspberry(self, device_states: dict, reply=False):
         HOST = '192.168.16.54'
         PORT = 65432
 
+        if self.ws_session is not None:
+            # Acks arrive asynchronously, report the latest one
+            self.ws_session.send_command(device_states)
+            return self.ws_session.last_ack if reply else None
+        if self.pi_client is not None:
+            ack = self.pi_client.send(device_states)
+            return ack if reply else None
+
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((HOST, PORT))
             message = json.dumps(device_states)
             s.sendall(message.encode('utf-8'))
+            if not reply:
+                return None
+            s.settimeout(2.0)
+            chunks = []
+            while True:
+                chunk = s.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            return json.loads(b"".join(chunks).decode('utf-8'))
 
     def open_dashboard(self, open_dashboard):
         self.dashboard_window = open_dashboard(back_to_main=self.show, main_system=self)
@@ -387,12 +564,21 @@ class AgriculturalMonitoringSystem(QMainWindow):
         """)
         
         charts_layout = QVBoxLayout(charts_container)
+
+        # Charts are drawn off the main thread and blitted when ready
+        self.chart_worker = ChartRenderWorker(timing=self.timing)
     
         # Chart title
         chart_title = QLabel("Daily Summary")
         chart_title.setFont(QFont("Arial", 16, QFont.Bold))
         chart_title.setAlignment(Qt.AlignCenter)
         charts_layout.addWidget(chart_title)
+
+        # Today's numbers, from the streaming statistics
+        self.summary_label = QLabel("")
+        self.summary_label.setAlignment(Qt.AlignCenter)
+        self.summary_label.setStyleSheet("font-size: 13px; color: #555;")
+        charts_layout.addWidget(self.summary_label)
     
         # Chart tabs
         chart_tabs = QTabWidget()
@@ -419,19 +605,19 @@ class AgriculturalMonitoringSystem(QMainWindow):
         # Temperature chart
         temp_chart_widget = QWidget()
         temp_chart_layout = QVBoxLayout(temp_chart_widget)
-        self.temp_canvas = MplCanvas(width=12, height=5, dpi=100)
+        self.temp_canvas = ChartView("temp", self.chart_worker, width=12, height=5, dpi=100)
         temp_chart_layout.addWidget(self.temp_canvas)
     
         # Humidity chart
         humidity_chart_widget = QWidget()
         humidity_chart_layout = QVBoxLayout(humidity_chart_widget)
-        self.humidity_canvas = MplCanvas(width=12, height=5, dpi=100)
+        self.humidity_canvas = ChartView("humidity", self.chart_worker, width=12, height=5, dpi=100)
         humidity_chart_layout.addWidget(self.humidity_canvas)
     
         # Soil moisture chart
         moisture_chart_widget = QWidget()
         moisture_chart_layout = QVBoxLayout(moisture_chart_widget)
-        self.moisture_canvas = MplCanvas(width=12, height=5, dpi=100)
+        self.moisture_canvas = ChartView("moisture", self.chart_worker, width=12, height=5, dpi=100)
         moisture_chart_layout.addWidget(self.moisture_canvas)
     
         # Add tabs
@@ -468,23 +654,23 @@ class AgriculturalMonitoringSystem(QMainWindow):
         
         # Light control
         light_btn = QPushButton("Lighting: OFF")
-        light_btn.clicked.connect(self.toggle_light)
+        light_btn.clicked.connect(lambda: self.toggle_light())
         
         # Watering control
         water_btn = QPushButton("Watering: OFF")
-        water_btn.clicked.connect(self.toggle_watering)
+        water_btn.clicked.connect(lambda: self.toggle_watering())
         
         # Humidifier control
         humidifier_btn = QPushButton("Humidifier: OFF")
-        humidifier_btn.clicked.connect(self.toggle_humidifier)
+        humidifier_btn.clicked.connect(lambda: self.toggle_humidifier())
         
         # Heater control
         heater_btn = QPushButton("Heating: OFF")
-        heater_btn.clicked.connect(self.toggle_heater)               
+        heater_btn.clicked.connect(lambda: self.toggle_heater())               
 
         # Water Pump control
         water_pump_btn = QPushButton("Water Pump: OFF")
-        water_pump_btn.clicked.connect(self.toggle_pump_water)    
+        water_pump_btn.clicked.connect(lambda: self.toggle_pump_water())    
 
         # Auto climate control
         climate_btn = QPushButton("Auto Climate: OFF")
@@ -507,8 +693,9 @@ class AgriculturalMonitoringSystem(QMainWindow):
         
         self.main_layout.addWidget(control_container)
 
-    def toggle_light(self):
+    def toggle_light(self, cause="manual"):
         self.light_status = not self.light_status
+        self.journal.record("LIGHTNING", self.light_status, cause)
         if self.light_status:
             self.light_btn.setText("Lighting: ON")
             self.light_btn.setStyleSheet("background-color: #4CAF50; color: white;")
@@ -516,8 +703,9 @@ class AgriculturalMonitoringSystem(QMainWindow):
             self.light_btn.setText("Lighting: OFF")
             self.light_btn.setStyleSheet("background-color: #00c4a7; color: white;")
         
-    def toggle_watering(self):
+    def toggle_watering(self, cause="manual"):
         self.watering_status = not self.watering_status
+        self.journal.record("WATERING", self.watering_status, cause)
         if self.watering_status:
             self.water_btn.setText("Watering: ON")
             self.water_btn.setStyleSheet("background-color: #4CAF50; color: white;")
@@ -525,8 +713,9 @@ class AgriculturalMonitoringSystem(QMainWindow):
             self.water_btn.setText("Watering: OFF")
             self.water_btn.setStyleSheet("background-color: #00c4a7; color: white;")
             
-    def toggle_humidifier(self):
+    def toggle_humidifier(self, cause="manual"):
         self.humidifier_status = not self.humidifier_status
+        self.journal.record("HUMIDIFIER", self.humidifier_status, cause)
         if self.humidifier_status:
             self.humidifier_btn.setText("Humidifier: ON")
             self.humidifier_btn.setStyleSheet("background-color: #4CAF50; color: white;")
@@ -534,8 +723,9 @@ class AgriculturalMonitoringSystem(QMainWindow):
             self.humidifier_btn.setText("Humidifier: OFF")
             self.humidifier_btn.setStyleSheet("background-color: #00c4a7; color: white;")
             
-    def toggle_heater(self):
+    def toggle_heater(self, cause="manual"):
         self.heater_status = not self.heater_status
+        self.journal.record("HEATING", self.heater_status, cause)
         if self.heater_status:
             self.heater_btn.setText("Heating: ON")
             self.heater_btn.setStyleSheet("background-color: #4CAF50; color: white;")
@@ -543,8 +733,9 @@ class AgriculturalMonitoringSystem(QMainWindow):
             self.heater_btn.setText("Heating: OFF")
             self.heater_btn.setStyleSheet("background-color: #00c4a7; color: white;")
 
-    def toggle_pump_water(self):
+    def toggle_pump_water(self, cause="manual"):
         self.pump_water_status = not self.pump_water_status
+        self.journal.record("WATER_PUMP", self.pump_water_status, cause)
         if self.pump_water_status:
             self.water_pump_btn.setText("Water Pump: ON")
             self.water_pump_btn.setStyleSheet("background-color: #4CAF50; color: white;")
@@ -567,104 +758,429 @@ class AgriculturalMonitoringSystem(QMainWindow):
             self.climate_btn.setStyleSheet("background-color: #00c4a7; color: white;")
 
     def update_sensor_data(self):
-        temp_test_value, soil_moisture_value, humidity_test_value = read_sensor()
-        self.moisture = soil_moisture_value
-        self.moisture_value.setText(f"{self.moisture}")
-        self.moisture_history.append(self.moisture)
-        self.moisture_history = self.moisture_history[-24:]
-
-        self.temperature = temp_test_value
-        self.temp_value.setText(f"{self.temperature}")
-        self.temp_history.append(self.temperature)
-        self.temp_history = self.temp_history[-24:]
-        self.set_warning(self.temperature, self.target_heat, "Temperature is too low! Please take action.", "red")
-
-        self.humidity = humidity_test_value
-        self.humidity_value.setText(f"{self.humidity}%")
-        self.humidity_history.append(self.humidity)
-        self.humidity_history = self.humidity_history[-24:]
-
-        self.ph = round(random.uniform(5.5, 6.2), 1)
-        self.ph_value.setText(f"{self.ph}")
-        self.ph_history.append(self.ph)
-        self.ph_history = self.ph_history[-24:]
-        
-        # # Water level update (range 0–100%)
-        # self.water_level = round(random.uniform(30, 80), 1)
-        # self.water_value.setText(f"{self.water_level}%")
-        # self.water_history.append(self.water_level)
-        # self.water_history = self.water_history[-24:]
-
-        # Light level update (range 200–1000 lux)
-        self.light_level = round(random.uniform(30, 50), 0)
-        self.lighting_value.setText(f"{self.light_level}%")
-        self.light_history.append(self.light_level)
-        self.light_history = self.light_history[-24:]
-
-        self.send_status_to_raspberry({
+        with self.timing.span("read_sensor"):
+            sample = None
+            if self.ws_session is not None:
+                temp_test_value, soil_moisture_value, humidity_test_value = self.ws_session.read_sensor()
+            else:
+                sample = self.pi_client.read_sample() if self.pi_client is not None else read_sample()
+                if sample is None:
+                    temp_test_value, soil_moisture_value, humidity_test_value = None, None, None
+                else:
+                    temp_test_value = sample['temperature']
+                    soil_moisture_value = sample['soil_moisture']
+                    humidity_test_value = sample['humidity']
+
+        with self.timing.span("labels"):
+            self.moisture = soil_moisture_value
+            self.moisture_value.setText(format_reading(self.moisture))
+
+            self.temperature = temp_test_value
+            self.temp_value.setText(format_reading(self.temperature))
+            self.set_warning(self.temperature, self.target_heat, "Temperature is too low! Please take action.", "red")
+
+            self.humidity = humidity_test_value
+            self.humidity_value.setText(format_reading(self.humidity, unit="%"))
+
+            self.ph = round(random.uniform(5.5, 6.2), 1)
+            self.ph_value.setText(format_reading(self.ph, 1))
+            
+            # # Water level update (range 0–100%)
+            # self.water_level = round(random.uniform(30, 80), 1)
+            # self.water_value.setText(f"{self.water_level}%")
+            # self.water_history.append(self.water_level)
+            # self.water_history = self.water_history[-24:]
+
+            # Light level update (range 200–1000 lux)
+            self.light_level = round(random.uniform(30, 50), 0)
+            self.lighting_value.setText(format_reading(self.light_level, unit="%"))
+
+            # One history row for every channel of every zone
+            self.zones.push()
+
+        with self.timing.span("anomaly"):
+            self.check_sensors()
+
+        with self.timing.span("forecast"):
+            self.forecaster.add(time.time(), self.zones.values)
+
+        with self.timing.span("stats"):
+            now = time.time()
+            for channel, stats in self.stats.items():
+                target = STATS_TARGETS.get(channel)
+                stats.add(now, self.zones.get(0, channel), getattr(self, target) if target else None)
+
+        with self.timing.span("history_store"):
+            now = time.time()
+            if temp_test_value is None:
+                # Pi unreachable: leave the gap for the backfill to close
+                self.pi_offline = True
+            else:
+                if self.pi_offline:
+                    self.backfill_history(now, sample.get("seq") if sample is not None else None)
+                    self.pi_offline = False
+                values = {
+                    "temperature": self.temperature,
+                    "soil_moisture": self.moisture,
+                    "humidity": self.humidity,
+                    "ph": self.ph,
+                    "light": self.light_level
+                }
+                if self.backfill_pending:
+                    self.held_samples.append((now, values))
+                else:
+                    self.history_store.append(now, values)
+                    self.last_stored = now
+            if sample is not None and sample.get("seq") is not None:
+                self.pi_seq = sample["seq"]
+
+        if self.adaptive_poller is not None:
+            # Measured channels only (light is simulated)
+            period = self.adaptive_poller.update(time.monotonic(), {
+                "temperature": self.temperature,
+                "soil_moisture": self.moisture,
+                "humidity": self.humidity
+            }, self.switching_thresholds())
+            # Only re-anchor the acquisition task for meaningful changes
+            current = self.acquire_task.period
+            if abs(period - current) > 0.05 * current:
+                self.scheduler.set_task_period(self.acquire_task, period)
+
+    def backfill_history(self, now, seq):
+        # Close the outage gap with the samples the Pi buffered meanwhile:
+        # those after the last sequence number stored and up to `seq`, the
+        # one read on reconnect. Fetched on a worker thread (the request may
+        # take up to its 30 s timeout), finished by finish_backfill().
+        since = self.pi_seq
+        if since is None or seq is None or self.ws_session is not None or self.backfill_pending:
+            # Nothing to fill with, at least break the line across the gap
+            self.break_gap(now)
+            return
+        fetch = self.backfill_client.fetch_backfill if self.backfill_client is not None else fetch_backfill
+        self.backfill_pending = True
+        threading.Thread(target=lambda: self.backfill_ready.emit((since, seq, now, fetch(since))),
+                         name="history-backfill", daemon=True).start()
+
+    def finish_backfill(self, result):
+        since, until, now, samples = result
+        if samples is None:
+            self.break_gap(now)
+        else:
+            # By sequence number only: the Pi's clock is not the GUI's
+            seq = samples["seq"]
+            keep = (seq > since) & (seq <= until)
+            filled = int(keep.sum())
+            if filled:
+                ts = samples["ts"][keep]
+                self.history_store.append_many(ts, {
+                    "temperature": samples["temperature"][keep],
+                    "soil_moisture": samples["soil_moisture"][keep],
+                    "humidity": samples["humidity"][keep]
+                })
+                self.last_stored = float(ts[-1])
+            print(f"Backfilled {filled} samples buffered by the Pi")
+        self.store_held_samples()
+
+    def store_held_samples(self):
+        self.backfill_pending = False
+        held, self.held_samples = self.held_samples, []
+        for t, values in held:
+            self.history_store.append(t, values)
+            self.last_stored = t
+
+    def break_gap(self, now):
+        if self.last_stored is not None:
+            self.history_store.append((self.last_stored + now) / 2, {})
+
+    def seed_stats(self):
+        # Today's statistics from the stored history, so a restart does not
+        # start the summaries empty. Time above / below is measured against
+        # the current targets.
+        now = time.time()
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        chunks = list(self.history_store.read_range(midnight, now))
+        if not chunks:
+            return
+        records = np.concatenate(chunks)
+        for channel, stats in self.stats.items():
+            if channel not in records.dtype.names:
+                continue
+            target = STATS_TARGETS.get(channel)
+            stats.add_many(records["t"], records[channel], getattr(self, target) if target else None)
+
+    def check_sensors(self):
+        raised, cleared = self.anomalies.update(time.time(), self.zones.values)
+        table = self.control.table
+        for zone, channel in zip(*np.nonzero(raised)):
+            if zone != 0:
+                continue
+            name = self.zones.channels[channel]
+            reasons = ", ".join(self.anomalies.reasons(zone, name))
+            print(f"Sensor {name} flagged: {reasons}")
+            # Fail safe: switch off what its loops were driving in auto mode
+            for rule in table.rules:
+                if rule["sensor"] != name or not self.rule_enabled(rule.get("auto_flag")):
+                    continue
+                attribute, toggle = self.actuator_attributes[rule["actuator"]]
+                if getattr(self, attribute):
+                    getattr(self, toggle)("auto")
+            if not self.warning_dialog_open:
+                self.show_yellow_warning("red", f"The {name.replace('_', ' ')} sensor looks faulty ({reasons}). "
+                                                f"Its automatic control is paused.")
+        for zone, channel in zip(*np.nonzero(cleared)):
+            if zone == 0:
+                print(f"Sensor {self.zones.channels[channel]} back to normal")
+
+    def sensor_ok(self, channel, zone=0):
+        return not self.anomalies.flags[zone, self.zones.channel_index[channel]]
+
+    def control_value(self, name, reading, zone=0):
+        # What the named rule acts on: the forecast `lookahead` seconds
+        # ahead when it has one and a forecast exists, else the reading
+        table = self.control.table
+        if name not in table.names:
+            return reading
+        i = table.rule_index(name)
+        lookahead = table.lookahead[i]
+        if lookahead <= 0 or reading is None:
+            return reading
+        predicted = self.forecaster.predict(lookahead)[zone, self.zones.channel_index[table.rules[i]["sensor"]]]
+        return reading if np.isnan(predicted) else float(predicted)
+
+    def switching_thresholds(self):
+        # Values at which the control loops (and the low temperature warning) switch
+        self.sync_control()
+        thresholds = self.control.thresholds()
+        thresholds["temperature"].append(self.target_heat)
+        return thresholds
+
+    def send_device_states(self):
+        device_states = {
                 "HEATING": self.heater_status,
                 "WATERING": self.watering_status,
                 "HUMIDIFIER": self.humidifier_status,
                 "WATER_PUMP": self.pump_water_status,
                 "LIGHTNING": self.light_status
-            })
-        # Update charts
-        self.update_charts()
-        dashboards = {
-            "temperature": (Temperature_Dashboard, "manage_climate_control", "auto_climate_temperature"),
-            "humidity": (Humidity_Dashboard, "manage_climate_control", "auto_climate_humidity"),
-            "soil": (Soil_moisture_Dashboard, "manage_irrigation_control", "auto_climate_soil"),
-            "water": (Water_pH_Dashboard, "manage_water_control", "auto_climate_water"),
-            "lighting": (Lighting_Dashboard, "manage_light_control", "auto_climate_lighting")
+            }
+        if not self.edge_control and self.edge_released and not self.pi_managed:
+            self.send_status_to_raspberry(device_states)
+            return
+
+        if self.edge_control:
+            device_states["EDGE"] = {"enabled": True, "rules": self.edge_rules()}
+        elif not self.edge_released:
+            # Until the Pi reports no edge devices: it ignores these states
+            # for the devices its edge loop drives
+            device_states["EDGE"] = {"enabled": False}
+        reply = self.send_status_to_raspberry(device_states, reply=True)
+        if not self.edge_control and reply:
+            self.edge_released = not reply.get("edge")
+        self.follow_pi(reply)
+
+    def schedule_device(self, job):
+        # Timed command run by the Pi, e.g. {"device": "WATER_PUMP", "on_for": 30}
+        # or {"device": "LIGHTNING", "daily": {"on": "06:00", "off": "20:00"}}
+        self.follow_pi(self.send_status_to_raspberry({"SCHEDULE": [job]}, reply=True))
+
+    def follow_pi(self, reply):
+        # Mirror the devices the Pi drives itself (edge loop or timed job)
+        if not reply:
+            return
+        managed = {actuator: "edge" for actuator in reply.get("edge", [])}
+        managed.update((actuator, "schedule") for actuator in reply.get("schedule", {}))
+        # Devices the Pi just released (a timed job ended) are mirrored once
+        # more, so the GUI does not send the job's state back as its own
+        released = {actuator: cause for actuator, cause in self.pi_managed.items() if actuator not in managed}
+        self.pi_managed = managed
+        for actuator, cause in {**released, **managed}.items():
+            if actuator not in self.actuator_attributes:
+                continue
+            attribute, toggle = self.actuator_attributes[actuator]
+            if getattr(self, attribute) != reply["states"][actuator]:
+                getattr(self, toggle)(cause)
+
+    def edge_rules(self):
+        # Rules handed to the Pi: enabled loops on its own sensors, the
+        # strongest rule per actuator. Interlocked rules stay in the GUI.
+        table = self.control.table
+        rules = {}
+        for i, rule in enumerate(table.rules):
+            if rule["sensor"] not in EDGE_SENSORS or rule.get("interlocks"):
+                continue
+            if not self.sensor_ok(rule["sensor"]):
+                continue
+            if rule["actuator"] in rules or not self.rule_enabled(table.auto_flags[i]):
+                continue
+            rules[rule["actuator"]] = {
+                "sensor": rule["sensor"],
+                "actuator": rule["actuator"],
+                "target": float(self.control.target[0, i]),
+                "band": float(table.band[i]),
+                "direction": rule.get("direction", "raise")
+            }
+            if table.lookahead[i] > 0:
+                # Overrides the Pi's reading while fresh; without it (or
+                # with the GUI gone) the Pi runs the plain hysteresis rule
+                predicted = self.forecaster.predict(table.lookahead[i])[0, self.zones.channel_index[rule["sensor"]]]
+                if not np.isnan(predicted):
+                    rules[rule["actuator"]]["forecast"] = float(predicted)
+        return list(rules.values())
+
+    def rule_enabled(self, flag):
+        return self.auto_climate_active or bool(flag and getattr(self, flag, False))
+
+    def edge_rule_mask(self):
+        table = self.control.table
+        delegated = {rule["actuator"] for rule in self.edge_rules()}
+        return [rule["actuator"] in delegated for rule in table.rules]
+
+    @property
+    def control(self):
+        return self.control_rules.control
+
+    def sync_control(self):
+        # Readings and states of every zone are slices of the zone model;
+        # targets and auto modes are shared by the zones
+        control = self.control
+        table = control.table
+        sensors = self.zones.channel_indexes(table.sensors)
+        control.values[:] = self.zones.values[:, sensors]
+        control.level[:] = self.forecaster.level[:, sensors]
+        control.trend[:] = self.forecaster.slope[:, sensors]
+        control.target[:] = [getattr(self, target) if isinstance(target, str) else target
+                             for target in table.targets]
+        control.enabled[:] = [self.rule_enabled(flag) for flag in table.auto_flags]
+        # Rules reading a flagged sensor are out of auto mode
+        flagged = self.anomalies.flagged()[:, sensors]
+        control.enabled &= ~flagged[:, table.sensor_index]
+        control.state[:] = self.zones.states[:, self.zones.actuator_indexes(table.actuators)]
+        if self.edge_control:
+            # Actuators handed to the Pi are not switched from here
+            control.enabled[0] &= ~np.array(self.edge_rule_mask())
+
+    def run_control(self):
+        # One vectorized pass over every rule of every zone
+        self.control_rules.reload_if_changed()
+        self.sync_control()
+        zones, actuators = self.control.step()
+        for zone, actuator in zip(zones, actuators):
+            name = self.control.table.actuators[actuator]
+            if zone == 0:
+                # Through the toggle: button, journal
+                getattr(self, self.actuator_attributes[name][1])("auto")
+            else:
+                self.zones.set_state(zone, name, self.control.state[zone, actuator])
+
+    def snapshot_state(self):
+        return {
+            "targets": {name: getattr(self, name) for name in SNAPSHOT_TARGETS},
+            "flags": {name: getattr(self, name) for name in SNAPSHOT_FLAGS},
+            "auto_climate_active": self.auto_climate_active,
+            "actuators": {actuator: getattr(self, attribute)
+                          for actuator, (attribute, _) in self.actuator_attributes.items()},
+            "history": {name: list(getattr(self, name)) for name in SNAPSHOT_HISTORY}
         }
-        instances = {}
 
-        for key, (DashboardClass, _, _) in dashboards.items():
-            instances[key] = DashboardClass(back_to_main=self.show, main_system=self)
+    def submit_snapshot(self):
+        self.snapshot.submit(self.snapshot_state())
 
-        if self.auto_climate_active:
-            for key, (_, method_name, _) in dashboards.items():
-                getattr(instances[key], method_name)()
+    def restore_snapshot(self, saved):
+        for name, value in saved.get("targets", {}).items():
+            if name in SNAPSHOT_TARGETS:
+                setattr(self, name, float(value))
+        for name, value in saved.get("flags", {}).items():
+            if name in SNAPSHOT_FLAGS:
+                setattr(self, name, bool(value))
+        if time.time() - saved.get("saved_at", 0) < SNAPSHOT_HISTORY_MAX_AGE:
+            for name, values in saved.get("history", {}).items():
+                if name in SNAPSHOT_HISTORY:
+                    setattr(self, name, list(values)[-24:])
 
-        for key, (_, method_name, flag_name) in dashboards.items():
-            if getattr(self, flag_name, False):
-                getattr(instances[key], method_name)()
+    def restore_actuators(self, saved):
+        # Through the toggles so buttons and journal follow
+        if saved.get("auto_climate_active") and not self.auto_climate_active:
+            self.toggle_auto_climate()
+        if time.time() - saved.get("saved_at", 0) >= SNAPSHOT_ACTUATOR_MAX_AGE:
+            return
+        for actuator, state in saved.get("actuators", {}).items():
+            if actuator not in self.actuator_attributes:
+                continue
+            attribute, toggle = self.actuator_attributes[actuator]
+            if getattr(self, attribute) != bool(state):
+                getattr(self, toggle)("restore")
+
+    def export_tick_trace(self):
+        # Ctrl+Shift+T: dump the stage histogram and a Chrome trace of recent ticks
+        path = os.path.join(TRACE_DIR, time.strftime("tick-%Y%m%d-%H%M%S.json"))
+        self.timing.export_chrome_trace(path)
+        print(self.timing.format_stats())
+        print("Scheduler:", self.scheduler.stats())
+        if self.ws_session is not None:
+            print("Session:", self.ws_session.stats())
+        print(f"Tick trace written to {path}")
 
     def update_charts(self):
+        # Hand the data to the render worker, the canvases only blit the result
+        hours_ticks = [0, 4, 8, 12, 16, 20, 23]
+        hours_labels = ['00:00', '04:00', '08:00', '12:00', '16:00', '20:00', '23:00']
+
+        temperature = self.stats["temperature"].today()
+        self.summary_label.setText(
+            f"Temperature: {format_summary(temperature, '°C')}, "
+            f"below target {format_duration(temperature['below'])}   "
+            f"Humidity: {format_summary(self.stats['humidity'].today(), '%')}   "
+            f"Soil moisture: {format_summary(self.stats['soil_moisture'].today(), '%')}")
+
         # Temperature chart
-        self.temp_canvas.ax.clear()
-        hours = range(24)
-        self.temp_canvas.ax.plot(hours, self.temp_history, 'o-', color='#00c4a7')
-        self.temp_canvas.ax.fill_between(hours, self.temp_history, color='#00c4a7', alpha=0.2)
-        self.temp_canvas.ax.set_ylim(15, 40)
-        self.temp_canvas.ax.grid(True, linestyle='--', alpha=0.7)
-        self.temp_canvas.ax.set_xticks([0, 4, 8, 12, 16, 20, 23])
-        self.temp_canvas.ax.set_xticklabels(['00:00', '04:00', '08:00', '12:00', '16:00', '20:00', '23:00'])
-        self.temp_canvas.draw()
-        
+        self.temp_canvas.set_spec({
+            "data": self.zones.recent(0, "temperature"),
+            "color": '#00c4a7',
+            "ylim": (15, 40),
+            "xticks": hours_ticks,
+            "xticklabels": hours_labels
+        })
+
         # Humidity chart
-        self.humidity_canvas.ax.clear()
-        self.humidity_canvas.ax.plot(hours, self.humidity_history, 'o-', color='#0087c4')
-        self.humidity_canvas.ax.fill_between(hours, self.humidity_history, color='#0087c4', alpha=0.2)
-        self.humidity_canvas.ax.set_ylim(30, 100)
-        self.humidity_canvas.ax.grid(True, linestyle='--', alpha=0.7)
-        self.humidity_canvas.ax.set_xticks([0, 4, 8, 12, 16, 20, 23])
-        self.humidity_canvas.ax.set_xticklabels(['00:00', '04:00', '08:00', '12:00', '16:00', '20:00', '23:00'])
-        self.humidity_canvas.draw()
-        
+        self.humidity_canvas.set_spec({
+            "data": self.zones.recent(0, "humidity"),
+            "color": '#0087c4',
+            "ylim": (30, 100),
+            "xticks": hours_ticks,
+            "xticklabels": hours_labels
+        })
+
         # Soil moisture chart
-        self.moisture_canvas.ax.clear()
-        self.moisture_canvas.ax.plot(hours, self.moisture_history, 'o-', color='#8c00c4')
-        self.moisture_canvas.ax.fill_between(hours, self.moisture_history, color='#8c00c4', alpha=0.2)
-        self.moisture_canvas.ax.set_ylim(50, 100)
-        self.moisture_canvas.ax.grid(True, linestyle='--', alpha=0.7)
-        self.moisture_canvas.ax.set_xticks([0, 4, 8, 12, 16, 20, 23])
-        self.moisture_canvas.ax.set_xticklabels(['00:00', '04:00', '08:00', '12:00', '16:00', '20:00', '23:00'])
-        self.moisture_canvas.draw()
-        
+        self.moisture_canvas.set_spec({
+            "data": self.zones.recent(0, "soil_moisture"),
+            "color": '#8c00c4',
+            "ylim": (50, 100),
+            "xticks": hours_ticks,
+            "xticklabels": hours_labels
+        })
 
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        self.chart_worker.stop()
+        self.stall_watchdog.stop()
+        self.profiler.stop()
+        self.store_held_samples()
+        self.history_store.close()
+        self.journal.close()
+        self.snapshot.close(self.snapshot_state())
+        if self.pi_client is not None:
+            self.pi_client.close()
+            self.backfill_client.close()
+        if self.ws_session is not None:
+            self.ws_session.close()
+        trace_path = os.environ.get("SMARTAGR_TICK_TRACE")
+        if trace_path:
+            self.timing.export_chrome_trace(trace_path)
+        super().closeEvent(event)
 
     def set_warning(self, sensor, value, message, color):
+        if sensor is None:
+            # Failed read, handled as an outage
+            return
         current_time = time.time()
         if sensor < value and not self.warning_dialog_open and (current_time - self.last_warning_time) >= 15:
             self.show_yellow_warning(color, message)
@@ -0,0 +1,89 @@
+import base64
+import itertools
+import json
+import socket
+import struct
+
+from RaspberryPi.ts_codec import decode
+
+
+class PiClient:
+    # Client of RaspberryPi/pi_service.py: one persistent connection for
+    # sensor reads and device commands, newline-delimited JSON requests
+    # matched to their replies by id. The connection is (re)opened on
+    # demand; a failed request drops it so the next one reconnects.
+    def __init__(self, host='192.168.16.54', port=65433, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.ids = itertools.count(1)
+        self.telemetry = None
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+
+    def close(self):
+        if self.sock is not None:
+            self.stream.close()
+            self.sock.close()
+        self.sock = None
+        self.stream = None
+
+    def request(self, op, **fields):
+        if self.sock is None:
+            self.connect()
+        request_id = next(self.ids)
+        message = dict(fields, id=request_id, op=op)
+        try:
+            self.sock.sendall(json.dumps(message).encode('utf-8') + b"\n")
+            while True:
+                line = self.stream.readline()
+                if not line:
+                    raise ConnectionError("Pi service closed the connection")
+                reply = json.loads(line.decode('utf-8'))
+                if reply.get("op") == "telemetry":
+                    self.telemetry = reply
+                elif reply.get("id") == request_id:
+                    break
+        except (OSError, ValueError):
+            self.close()
+            raise
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "Request failed"))
+        return reply
+
+    def read_sample(self):
+        # Same shape as get_data.read_sample()
+        try:
+            reply = self.request("read")
+        except (OSError, ValueError, RuntimeError) as e:
+            print("Failed to get sensor data:", e)
+            return None
+        return dict(reply["sensors"], seq=reply.get("seq"))
+
+    def read_sensor(self):
+        # Same shape as get_data.read_sensor()
+        sample = self.read_sample()
+        if sample is None:
+            return None, None, None
+        return sample['temperature'], sample['soil_moisture'], sample['humidity']
+
+    def fetch_backfill(self, since):
+        # Same shape as get_data.fetch_backfill(): one delta/XOR encoded
+        # batch, decoded into NumPy columns
+        try:
+            reply = self.request("history", since=since)
+            ts, columns = decode(base64.b64decode(reply["data"]))
+        except (OSError, ValueError, RuntimeError, KeyError, struct.error) as e:
+            print("Failed to get backfill:", e)
+            return None
+        columns["ts"] = ts
+        return columns
+
+    def send(self, device_states):
+        # Acknowledged with the device states and the sensors read afterwards
+        return self.request("set", states=device_states)
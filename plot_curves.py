@@ -0,0 +1,79 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import Qt
+
+from decimate import M4Decimator
+
+
+class SeriesCurve:
+    # A filled line plot whose data goes through M4 decimation before it
+    # reaches pyqtgraph. The plot items are created once and updated in place,
+    # and the series is only re-decimated when the data, the visible x range
+    # or the pixel width of the view changes.
+    def __init__(self, graph, color, width=3):
+        self.graph = graph
+        self.decimator = M4Decimator()
+        self.view_box = graph.getViewBox()
+
+        pen = pg.mkPen(color=color, width=width)
+        self.curve = pg.PlotCurveItem(pen=pen, connect='finite')
+        self.baseline = pg.PlotCurveItem()
+        self.fill = pg.FillBetweenItem(self.curve, self.baseline, brush=pg.mkBrush(color + '50'))
+        graph.addItem(self.fill)
+        graph.addItem(self.curve)
+
+        self.last_view = None
+        self.redrawing = False
+        self.view_box.sigResized.connect(self.on_view_changed)
+        self.view_box.sigXRangeChanged.connect(self.on_view_changed)
+
+    def set_data(self, x, y):
+        self.decimator.set_data(x, y)
+        self.redraw(force=True)
+
+    def append(self, x, y):
+        self.decimator.append(x, y)
+        self.redraw(force=True)
+
+    def view_state(self):
+        x, _ = self.decimator.data()
+        width = int(self.view_box.width()) or 640
+        if self.view_box.autoRangeEnabled()[0] and len(x):
+            # Auto-ranged views follow the data, decimate over all of it
+            return (float(x[0]), float(x[-1])), width
+        x_min, x_max = self.view_box.viewRange()[0]
+        return (float(x_min), float(x_max)), width
+
+    def on_view_changed(self, *args):
+        self.redraw()
+
+    def redraw(self, force=False):
+        if self.redrawing:
+            return
+        view = self.view_state()
+        if not force and view == self.last_view:
+            return
+        self.last_view = view
+        x_range, width = view
+        x, y = self.decimator.decimate(x_range, width)
+
+        # setData can move an auto-ranged view, which would call back in here
+        self.redrawing = True
+        try:
+            self.curve.setData(x, y)
+            self.baseline.setData(x, np.zeros(len(x)))
+        finally:
+            self.redrawing = False
+
+
+class TargetLine:
+    # Dashed horizontal target marker that is moved instead of re-created
+    def __init__(self, graph, value, label, color='#2980b9'):
+        pen = pg.mkPen(color=color, width=2, style=Qt.DashLine)
+        self.line = pg.InfiniteLine(pos=value, angle=0, pen=pen, label=label,
+                                    labelOpts={'color': color, 'position': 0.95})
+        graph.addItem(self.line)
+
+    def set_value(self, value, label):
+        self.line.setValue(value)
+        self.line.label.setFormat(label)
@@ -0,0 +1,124 @@
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from PyQt5.QtCore import QObject, QTimer
+
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+class StackSampler:
+    # Samples the main thread's Python stack from a background thread and
+    # counts collapsed stacks ("a;b;c count"), the input format of
+    # flamegraph.pl / speedscope. Much cheaper than cProfile on a long run.
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.target = threading.main_thread().ident
+        self.stacks = Counter()
+        self.running = False
+        self.thread = None
+
+    def enable(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def dump_stats(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilerToggle(QObject):
+    # Attaches a profiler to the running GUI for a fixed number of seconds
+    # and writes the result to profiles/. It can be triggered without a
+    # restart:
+    #   SMARTAGR_PROFILE=<seconds>       profile right after start-up
+    #   Ctrl+Alt+Shift+P                 hidden key combo on the kiosk
+    #   kill -USR2 <pid>                 from an ssh session
+    # SMARTAGR_PROFILE_MODE=sample uses the stack sampler instead of cProfile.
+    def __init__(self, parent=None, seconds=None, mode=None):
+        super().__init__(parent)
+        self.seconds = float(seconds or os.environ.get("SMARTAGR_PROFILE_SECONDS", 30))
+        self.mode = mode or os.environ.get("SMARTAGR_PROFILE_MODE", "cprofile")
+        self.profiler = None
+        self.started = None
+
+        self.stop_timer = QTimer(self)
+        self.stop_timer.setSingleShot(True)
+        self.stop_timer.timeout.connect(self.stop)
+
+        # Python only runs signal handlers when the interpreter gets control,
+        # which does not happen while Qt sits in its event loop
+        self.signal_poll = QTimer(self)
+        self.signal_poll.timeout.connect(lambda: None)
+
+    def install(self):
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.start())
+            self.signal_poll.start(250)
+        startup = os.environ.get("SMARTAGR_PROFILE")
+        if startup:
+            self.start(float(startup))
+
+    def toggle(self):
+        if self.profiler is None:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self, seconds=None):
+        if self.profiler is not None:
+            return
+        seconds = seconds or self.seconds
+        if self.mode == "sample":
+            self.profiler = StackSampler()
+        else:
+            self.profiler = cProfile.Profile()
+        self.started = time.strftime("%Y%m%d-%H%M%S")
+        self.profiler.enable()
+        self.stop_timer.start(int(seconds * 1000))
+        print(f"Profiling ({self.mode}) for {seconds:.0f} s")
+
+    def stop(self):
+        if self.profiler is None:
+            return
+        self.stop_timer.stop()
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        extension = "folded" if self.mode == "sample" else "prof"
+        path = os.path.join(PROFILE_DIR, f"gui-{self.started}.{extension}")
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+
+        if isinstance(profiler, cProfile.Profile):
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(20)
+            print(summary.getvalue())
+        return path
@@ -0,0 +1,239 @@
+import collections
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+def empty_summary():
+    return {"count": 0, "mean": None, "std": None, "min": None, "max": None, "above": 0.0, "below": 0.0}
+
+
+class RollingWindow:
+    # Mean, std, min and max of the samples of the last `window` seconds in
+    # amortized O(1) per sample: running sums of the values (shifted by a
+    # reference value for precision) for mean and std, monotonic deques for
+    # the extremes. Also sums the seconds spent above and below the target.
+    def __init__(self, window=3600.0):
+        self.window = window
+        # (t, value, seconds above, seconds below) in arrival order
+        self.samples = collections.deque()
+        self.minima = collections.deque()
+        self.maxima = collections.deque()
+        self.reference = None
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.above = 0.0
+        self.below = 0.0
+
+    def add(self, t, value, above=0.0, below=0.0):
+        # value None: no reading, only the target times count
+        self.samples.append((t, value, above, below))
+        self.above += above
+        self.below += below
+        if value is not None:
+            if self.reference is None:
+                self.reference = value
+            d = value - self.reference
+            self.count += 1
+            self.sum += d
+            self.sum_sq += d * d
+            while self.minima and self.minima[-1][1] > value:
+                self.minima.pop()
+            self.minima.append((t, value))
+            while self.maxima and self.maxima[-1][1] < value:
+                self.maxima.pop()
+            self.maxima.append((t, value))
+        self.expire(t - self.window)
+
+    def expire(self, before):
+        while self.samples and self.samples[0][0] <= before:
+            t, value, above, below = self.samples.popleft()
+            self.above -= above
+            self.below -= below
+            if value is not None:
+                d = value - self.reference
+                self.count -= 1
+                self.sum -= d
+                self.sum_sq -= d * d
+        while self.minima and self.minima[0][0] <= before:
+            self.minima.popleft()
+        while self.maxima and self.maxima[0][0] <= before:
+            self.maxima.popleft()
+        if self.count == 0:
+            # Restart the sums so removals do not leave rounding residue
+            self.reference = None
+            self.sum = self.sum_sq = 0.0
+        if not self.samples:
+            self.above = self.below = 0.0
+
+    def summary(self):
+        result = empty_summary()
+        result["above"] = max(self.above, 0.0)
+        result["below"] = max(self.below, 0.0)
+        if self.count:
+            mean = self.sum / self.count
+            result.update(count=self.count,
+                          mean=self.reference + mean,
+                          std=math.sqrt(max(self.sum_sq / self.count - mean * mean, 0.0)),
+                          min=self.minima[0][1],
+                          max=self.maxima[0][1])
+        return result
+
+
+class DayBucket:
+    # Statistics of one local calendar day, Welford's update per sample
+    def __init__(self, day):
+        self.day = day
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.above = 0.0
+        self.below = 0.0
+
+    def add(self, value, above=0.0, below=0.0):
+        self.above += above
+        self.below += below
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values, above=0.0, below=0.0):
+        # Bulk add (NaN: no reading), merged with the running statistics by
+        # Chan's parallel update
+        self.above += above
+        self.below += below
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        n = len(values)
+        mean = float(values.mean())
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += float(((values - mean) ** 2).sum()) + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def summary(self):
+        result = empty_summary()
+        result.update(above=self.above, below=self.below)
+        if self.count:
+            result.update(count=self.count, mean=self.mean, std=math.sqrt(self.m2 / self.count),
+                          min=self.min, max=self.max)
+        return result
+
+
+class ChannelStats:
+    # Streaming statistics of one channel: a rolling window and one bucket
+    # per local day (the last `days` closed ones are kept). A sample stands
+    # for the time until the next one, counted above or below the target it
+    # was compared with; gaps over `max_gap` seconds count nowhere.
+    def __init__(self, window=3600.0, max_gap=60.0, days=7):
+        self.rolling = RollingWindow(window)
+        self.max_gap = max_gap
+        self.days = collections.deque(maxlen=days)
+        self.bucket = None
+        self.day_end = None
+        self.last = None
+
+    def add(self, t, value, target=None):
+        if value is not None and math.isnan(value):
+            value = None
+        above = below = 0.0
+        if self.last is not None:
+            last_t, last_value, last_target = self.last
+            dt = t - last_t
+            if last_value is not None and last_target is not None and 0 < dt <= self.max_gap:
+                if last_value > last_target:
+                    above = dt
+                elif last_value < last_target:
+                    below = dt
+        self.last = (t, value, target)
+
+        if self.day_end is None or t >= self.day_end:
+            self.roll_day(t)
+        self.bucket.add(value, above, below)
+        self.rolling.add(t, value, above, below)
+
+    def add_many(self, times, values, target=None):
+        # Time-ordered samples at once, e.g. today's stored history at
+        # start-up. Only the samples of the last `window` seconds go through
+        # add(); the older ones reach the day buckets in whole-array steps.
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if len(times) == 0:
+            return
+        cut = int(np.searchsorted(times, times[-1] - self.rolling.window, side="right"))
+        start = 0
+        while start < cut:
+            if self.day_end is None or times[start] >= self.day_end:
+                self.roll_day(times[start])
+            end = min(cut, int(np.searchsorted(times, self.day_end, side="left")))
+            t = times[start:end]
+            v = values[start:end]
+            # Each sample's time counts for the one before it
+            if self.last is not None:
+                last_t, last_value, last_target = self.last
+                prev_t = np.concatenate(([last_t], t[:-1]))
+                prev_v = np.concatenate(([np.nan if last_value is None else last_value], v[:-1]))
+                prev_target = last_target
+            else:
+                prev_t = np.concatenate(([np.nan], t[:-1]))
+                prev_v = np.concatenate(([np.nan], v[:-1]))
+                prev_target = target
+            above = below = 0.0
+            if prev_target is not None and target is not None:
+                dt = t - prev_t
+                with np.errstate(invalid="ignore"):
+                    counted = (dt > 0) & (dt <= self.max_gap)
+                    above = float(dt[counted & (prev_v > target)].sum())
+                    below = float(dt[counted & (prev_v < target)].sum())
+            self.bucket.add_many(v, above, below)
+            last_value = float(v[-1])
+            self.last = (float(t[-1]), None if math.isnan(last_value) else last_value, target)
+            start = end
+        for t, value in zip(times[cut:], values[cut:]):
+            self.add(float(t), float(value), target)
+
+    def roll_day(self, t):
+        if self.bucket is not None:
+            self.days.append(self.bucket)
+        start = datetime.fromtimestamp(t).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.bucket = DayBucket(start.date())
+        self.day_end = (start + timedelta(days=1)).timestamp()
+
+    def today(self):
+        if self.bucket is None or time.time() >= self.day_end:
+            return empty_summary()
+        return self.bucket.summary()
+
+    def recent(self):
+        return self.rolling.summary()
+
+    def daily(self):
+        # Closed days, oldest first, as (date, summary)
+        return [(bucket.day, bucket.summary()) for bucket in self.days]
+
+
+def format_summary(summary, unit="", digits=1):
+    # "22.4°C (min 18.0, max 26.3)", or "--" without samples
+    if not summary["count"]:
+        return "--"
+    return (f"{summary['mean']:.{digits}f}{unit} "
+            f"(min {summary['min']:.{digits}f}, max {summary['max']:.{digits}f})")
+
+
+def format_duration(seconds):
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours} h {minutes:02d} min"
@@ -0,0 +1,182 @@
+import logging
+import math
+import time
+
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+
+
+logger = logging.getLogger("smartagr.scheduler")
+
+
+class ScheduledTask:
+    def __init__(self, name, callback, period=None):
+        self.name = name
+        self.callback = callback
+        # None: run on every tick, otherwise its own fixed rate in seconds
+        self.period = period
+        self.next_due = None
+        self.runs = 0
+        self.errors = 0
+        # Failures in a row, and those not logged since the last log line
+        self.failing = 0
+        self.unlogged = 0
+        self.logged_at = None
+
+
+class FixedRateScheduler(QObject):
+    # Runs its tasks on a fixed-rate grid of the monotonic clock: deadline k
+    # is start + k * period, regardless of how long the previous tick took,
+    # so the sample rate does not drift with load. A tick that ends past the
+    # next deadline is an overrun; missed deadlines are either skipped
+    # (policy "skip", the default) or run back to back up to `max_catch_up`
+    # ticks before skipping the rest (policy "catch_up"). A failing task is
+    # logged with its traceback, at most once per `error_log_interval`
+    # seconds while it keeps failing.
+    overrun = pyqtSignal(int)
+
+    def __init__(self, parent=None, period=0.5, policy="skip", max_catch_up=3, timing=None,
+                 error_log_interval=60.0):
+        super().__init__(parent)
+        self.period = period
+        self.error_log_interval = error_log_interval
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.timing = timing
+        self.tasks = []
+
+        self.deadline = None
+        self.running = False
+        self.catch_up_left = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.fire)
+
+    def add_task(self, name, callback, period=None):
+        task = ScheduledTask(name, callback, period)
+        self.tasks.append(task)
+        return task
+
+    def remove_task(self, task):
+        if task in self.tasks:
+            self.tasks.remove(task)
+
+    def start(self):
+        self.running = True
+        self.deadline = time.monotonic()
+        self.arm()
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def set_period(self, period):
+        # New rate from the next tick on, re-anchored so there is no burst
+        if period == self.period:
+            return
+        self.period = period
+        if self.running:
+            self.deadline = time.monotonic() + period
+            self.arm()
+
+    def set_task_period(self, task, period):
+        # New rate of one task (None: every tick), its next run re-anchored
+        # one new period from now
+        if period == task.period:
+            return
+        task.period = period
+        task.next_due = None if period is None else time.monotonic() + period
+
+    def arm(self):
+        delay = self.deadline - time.monotonic()
+        self.timer.start(max(0, int(math.ceil(delay * 1000))))
+
+    def fire(self):
+        if not self.running:
+            return
+        now = time.monotonic()
+        # QTimer may wake a little early, wait for the real deadline
+        if now < self.deadline:
+            self.arm()
+            return
+        self.last_lateness = now - self.deadline
+        self.max_lateness = max(self.max_lateness, self.last_lateness)
+        self.ticks += 1
+
+        if self.timing is not None:
+            with self.timing.span("tick"):
+                self.run_tasks(now)
+        else:
+            self.run_tasks(now)
+
+        self.deadline += self.period
+        end = time.monotonic()
+        if end > self.deadline:
+            missed = math.floor((end - self.deadline) / self.period) + 1
+            self.overruns += 1
+            if self.policy == "catch_up" and self.catch_up_left < self.max_catch_up:
+                # Run the next tick immediately, its deadline stays on the grid
+                self.catch_up_left += 1
+            else:
+                self.deadline += missed * self.period
+                self.skipped += missed
+                self.catch_up_left = 0
+            self.overrun.emit(missed)
+        else:
+            self.catch_up_left = 0
+        self.arm()
+
+    def run_tasks(self, now):
+        for task in list(self.tasks):
+            if task.period is not None:
+                if task.next_due is None:
+                    task.next_due = now
+                # Due within half a tick counts as due, so a task on a
+                # multiple of the grid does not slip a tick on timer jitter
+                if now < task.next_due - self.period / 2:
+                    continue
+                task.next_due += task.period * max(math.floor((now - task.next_due) / task.period) + 1, 1)
+            self.run_task(task)
+
+    def run_task(self, task):
+        try:
+            if self.timing is not None:
+                with self.timing.span(task.name):
+                    task.callback()
+            else:
+                task.callback()
+        except Exception:
+            task.errors += 1
+            task.failing += 1
+            now = time.monotonic()
+            if task.logged_at is not None and now - task.logged_at < self.error_log_interval:
+                task.unlogged += 1
+                return
+            logger.exception("Task %s failed (%d in a row, %d not logged since the last report)",
+                             task.name, task.failing, task.unlogged)
+            task.logged_at = now
+            task.unlogged = 0
+        else:
+            task.runs += 1
+            if task.failing:
+                logger.warning("Task %s recovered after %d failures", task.name, task.failing)
+                task.failing = 0
+                task.unlogged = 0
+                task.logged_at = None
+
+    def stats(self):
+        return {
+            "period": self.period,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "last_lateness": self.last_lateness,
+            "max_lateness": self.max_lateness,
+            "errors": {task.name: task.errors for task in self.tasks if task.errors}
+        }
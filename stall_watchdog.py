@@ -0,0 +1,77 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from PyQt5.QtCore import QObject, QTimer
+
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+logger = logging.getLogger("smartagr.stalls")
+
+
+def setup_stall_log(path=None):
+    path = path or os.path.join(LOG_DIR, "stalls.log")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(handler)
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+    return path
+
+
+class StallWatchdog(QObject):
+    # A QTimer on the GUI thread stamps a heartbeat every `interval_ms`; a
+    # watchdog thread checks how late that heartbeat is. Once the event loop
+    # has been stuck for `threshold` seconds the main thread's Python stack
+    # is captured and logged (again for every further `threshold` the stall
+    # lasts), and the total stall time is logged when the loop recovers.
+    def __init__(self, parent=None, threshold=1.0, interval_ms=100):
+        super().__init__(parent)
+        self.threshold = threshold
+        self.interval = interval_ms / 1000.0
+        self.main_ident = threading.main_thread().ident
+        self.last_beat = time.monotonic()
+        self.stall_reports = 0
+        self.max_lag = 0.0
+        self.running = False
+
+        self.heartbeat = QTimer(self)
+        self.heartbeat.timeout.connect(self.beat)
+        self.thread = threading.Thread(target=self.watch, name="stall-watchdog", daemon=True)
+
+    def start(self):
+        self.last_beat = time.monotonic()
+        self.running = True
+        self.heartbeat.start(int(self.interval * 1000))
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.heartbeat.stop()
+
+    def beat(self):
+        now = time.monotonic()
+        if self.stall_reports:
+            logger.warning(f"Event loop recovered after {now - self.last_beat:.2f} s stall")
+            self.stall_reports = 0
+        lag = now - self.last_beat - self.interval
+        self.max_lag = max(self.max_lag, lag)
+        self.last_beat = now
+
+    def watch(self):
+        while self.running:
+            time.sleep(self.interval / 2)
+            stalled = time.monotonic() - self.last_beat
+            if stalled >= self.threshold * (self.stall_reports + 1):
+                self.stall_reports += 1
+                self.report(stalled)
+
+    def report(self, stalled):
+        frame = sys._current_frames().get(self.main_ident)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>\n"
+        logger.warning(f"Event loop stalled for {stalled:.2f} s, main thread stack:\n{stack}")
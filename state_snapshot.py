@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state", "snapshot.json")
+VERSION = 1
+
+
+def write_atomic(path, data):
+    # Write to a temporary file next to `path`, fsync, then rename over it:
+    # a crash leaves either the old snapshot or the new one, never half of one
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable
+        fd = os.open(os.path.dirname(path), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class StateSnapshot:
+    # Last known GUI state (targets, auto flags, actuator states, recent
+    # history) kept on disk for a warm start. submit() only hands over the
+    # latest state; a writer thread saves it every `interval` seconds when
+    # it changed, so the control tick never waits on the disk. close()
+    # writes the final state before returning.
+    def __init__(self, path=DEFAULT_PATH, interval=30.0):
+        self.path = path
+        self.interval = interval
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.condition = threading.Condition()
+        self.pending = None
+        self.stopping = False
+        self.saves = 0
+        self.thread = threading.Thread(target=self.run, name="state-snapshot", daemon=True)
+        self.thread.start()
+
+    def load(self):
+        # The saved state, or None without a usable snapshot
+        try:
+            with open(self.path, "rb") as f:
+                state = json.loads(f.read().decode("utf-8"))
+        except OSError:
+            return None
+        except ValueError as e:
+            print(f"Ignoring unreadable snapshot {self.path}:", e)
+            return None
+        if not isinstance(state, dict) or state.get("version") != VERSION:
+            return None
+        return state
+
+    def submit(self, state):
+        with self.condition:
+            self.pending = state
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.stopping:
+                    self.condition.wait(self.interval)
+                state, self.pending = self.pending, None
+                stopping = self.stopping
+            if state is not None:
+                self.save(state)
+            if stopping:
+                return
+
+    def save(self, state):
+        state = dict(state, version=VERSION, saved_at=time.time())
+        try:
+            write_atomic(self.path, json.dumps(state).encode("utf-8"))
+        except OSError as e:
+            print("Failed to save state snapshot:", e)
+            return
+        self.saves += 1
+
+    def close(self, state=None):
+        with self.condition:
+            if state is not None:
+                self.pending = state
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
@@ -0,0 +1,33 @@
+from actuator_journal import CAUSES, EVENT, ActuatorJournal, JournalReader
+
+
+def test_state_changes_only(tmp_path):
+    path = str(tmp_path / "actuators.bin")
+    journal = ActuatorJournal(path)
+    journal.record("HEATING", True, "auto", timestamp=10.0)
+    journal.record("HEATING", True, "auto", timestamp=11.0)
+    journal.record("HEATING", False, "manual", timestamp=20.0)
+    journal.close()
+    reader = JournalReader(path)
+    assert [float(e["t"]) for e in reader.device_events("HEATING")] == [10.0, 20.0]
+    assert reader.duty_cycle("HEATING", 0.0, 40.0) == (0.25, 10.0)
+
+
+def test_torn_tail_is_dropped_before_appending(tmp_path):
+    path = str(tmp_path / "actuators.bin")
+    journal = ActuatorJournal(path)
+    journal.record("HEATING", True, "auto", timestamp=10.0)
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    journal = ActuatorJournal(path)
+    journal.record("HEATING", False, "manual", timestamp=20.0)
+    journal.record("WATER_PUMP", True, "schedule", timestamp=30.0)
+    journal.close()
+    reader = JournalReader(path)
+    assert len(reader.events) == 3
+    assert [float(e["t"]) for e in reader.events] == [10.0, 20.0, 30.0]
+    assert [CAUSES[e["cause"]] for e in reader.events] == ["auto", "manual", "schedule"]
+    with open(path, "rb") as f:
+        assert len(f.read()) == 3 * EVENT.itemsize
@@ -0,0 +1,50 @@
+import numpy as np
+
+from anomaly import RAIL, SPIKE, STUCK, AnomalyDetector
+
+
+def feed(detector, t, values, count, period=5.0):
+    raised = np.zeros(detector.flags.shape, dtype=np.uint8)
+    for _ in range(count):
+        new, _ = detector.update(t, [values])
+        raised |= new
+        t += period
+    return t, raised
+
+
+def test_one_count_step_is_not_a_spike():
+    detector = AnomalyDetector(["temperature"])
+    t, _ = feed(detector, 0.0, [120.0], 500)
+    _, raised = feed(detector, t, [121.0], 200)
+    assert not raised.any()
+
+
+def test_jumping_between_extremes_is_a_spike():
+    detector = AnomalyDetector(["temperature"])
+    t, _ = feed(detector, 0.0, [120.0], 500)
+    raised = 0
+    for i in range(30):
+        new, _ = detector.update(t, [[5.0 if i % 2 else 230.0]])
+        raised |= int(new[0, 0])
+        t += 5.0
+    assert raised & SPIKE
+
+
+def test_stuck_needs_four_hours_of_one_value():
+    detector = AnomalyDetector(["humidity"])
+    t, raised = feed(detector, 0.0, [90.0], int(3.9 * 3600 / 5))
+    assert not raised[0, 0] & STUCK
+    t, raised = feed(detector, t, [90.0], int(0.2 * 3600 / 5))
+    assert raised[0, 0] & STUCK
+    # A changing reading clears it after a run of clean samples
+    for i in range(30):
+        detector.update(t, [[90.0 + i % 3]])
+        t += 5.0
+    assert not detector.flagged().any()
+
+
+def test_rail_only_on_adc_channels():
+    detector = AnomalyDetector(["temperature", "light"])
+    _, raised = feed(detector, 0.0, [255.0, 0.0], 20)
+    assert raised[0, 0] & RAIL
+    assert not raised[0, 1]
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from control import RULES_PATH, ControlRules, RuleTable, ZoneControl
+
+
+SENSORS = ["temperature", "soil_moisture", "humidity", "ph", "light", "water_level"]
+ACTUATORS = ["HEATING", "HUMIDIFIER", "WATERING", "WATER_PUMP", "LIGHTNING"]
+TARGETS = ["target_heat", "target_humidity", "target_water_level", "target_moisture", "target_light"]
+KNOWN = {"sensors": SENSORS, "actuators": ACTUATORS, "targets": TARGETS}
+
+
+def shipped_rules():
+    with open(RULES_PATH) as f:
+        return json.load(f)["rules"]
+
+
+def test_shipped_rules_compile():
+    table = RuleTable(shipped_rules(), **KNOWN)
+    assert sorted(table.names) == sorted(rule["name"] for rule in shipped_rules())
+
+
+@pytest.mark.parametrize("field, value", [
+    ("sensor", "temprature"),
+    ("actuator", "HEATER"),
+    ("target", "target_heta"),
+    ("target", [15.0]),
+    ("direction", "up"),
+    ("interlocks", ["FAN"])
+])
+def test_unknown_names_are_rejected(field, value):
+    rules = shipped_rules()
+    rules[0][field] = value
+    with pytest.raises(ValueError):
+        RuleTable(rules, **KNOWN)
+
+
+def test_duplicate_names_are_rejected():
+    rules = shipped_rules()
+    rules[1]["name"] = rules[0]["name"]
+    with pytest.raises(ValueError):
+        RuleTable(rules, **KNOWN)
+
+
+def test_numeric_target_is_accepted():
+    rules = shipped_rules()
+    rules[0]["target"] = 18
+    RuleTable(rules, **KNOWN)
+
+
+def test_band_for_falls_back_to_default():
+    table = RuleTable(shipped_rules(), **KNOWN)
+    assert table.band_for("renamed", 5.0) == 5.0
+    with pytest.raises(ValueError):
+        table.band_for("renamed")
+
+
+def test_reload_keeps_previous_rules_on_unknown_target(tmp_path):
+    path = tmp_path / "rules.json"
+    rules = shipped_rules()
+    path.write_text(json.dumps({"rules": rules}))
+    control_rules = ControlRules(str(path), check_interval=0.0, **KNOWN)
+    control = control_rules.control
+
+    rules[0]["target"] = "target_heta"
+    path.write_text(json.dumps({"rules": rules}))
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert not control_rules.reload_if_changed()
+    assert control_rules.control is control
+
+    rules[0]["target"] = "target_heat"
+    rules[0]["band"] = 2.0
+    path.write_text(json.dumps({"rules": rules}))
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert control_rules.reload_if_changed()
+    assert control_rules.band_for(rules[0]["name"]) == 2.0
+
+
+def test_step_switches_with_hysteresis():
+    rules = [{"name": "heat", "sensor": "temperature", "actuator": "HEATING", "target": 20.0, "band": 1.0}]
+    control = ZoneControl(RuleTable(rules, **KNOWN), zones=2)
+    control.target[:] = 20.0
+    control.enabled[:] = True
+    control.values[:, 0] = [18.0, 20.5]
+    zones, actuators = control.step()
+    assert list(zones) == [0]
+    assert control.state[:, 0].tolist() == [True, False]
+    # Inside the band nothing changes, above it the heater goes off
+    control.values[:, 0] = [20.5, np.nan]
+    assert len(control.step()[0]) == 0
+    control.values[0, 0] = 21.5
+    control.step()
+    assert not control.state[0, 0]
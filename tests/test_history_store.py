@@ -0,0 +1,53 @@
+import numpy as np
+
+from history_store import DAY, RECORD, HistoryStore
+
+
+T0 = 1.79e9 // DAY * DAY + 3600
+
+
+def stored(store):
+    return np.concatenate(list(store.read_range(T0 - 10, T0 + 1000)))
+
+
+def test_append_and_read_range(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    for i in range(10):
+        store.append(T0 + i, {"temperature": 100 + i})
+    store.append_many(T0 + 10 + np.arange(5.0), {"humidity": np.full(5, 60.0)})
+    store.close()
+    records = stored(store)
+    assert len(records) == 15
+    assert records["temperature"][:10].tolist() == list(range(100, 110))
+    assert np.isnan(records["temperature"][10:]).all()
+    t, v = store.query("humidity", T0 + 12, T0 + 14)
+    assert t.tolist() == [T0 + 12, T0 + 13]
+
+
+def test_torn_tail_is_dropped_before_appending(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append(T0, {"temperature": 1.0})
+    store.close()
+    path = store.day_path(int(T0 // DAY))
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    store = HistoryStore(str(tmp_path))
+    store.append(T0 + 1, {"temperature": 2.0})
+    store.append(T0 + 2, {"temperature": 3.0})
+    store.close()
+    records = stored(store)
+    assert records["t"].tolist() == [T0, T0 + 1, T0 + 2]
+    assert records["temperature"].tolist() == [1.0, 2.0, 3.0]
+    with open(path, "rb") as f:
+        assert len(f.read()) == 3 * RECORD.itemsize
+
+
+def test_compacted_day_reads_back(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append_many(T0 + np.arange(100.0), {"temperature": np.arange(100.0)})
+    store.close()
+    store.compact_day(int(T0 // DAY))
+    records = stored(store)
+    assert len(records) == 100
+    assert records["temperature"].tolist() == list(range(100))
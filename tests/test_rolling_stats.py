@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+import pytest
+
+from rolling_stats import ChannelStats, RollingWindow
+
+
+def test_rolling_window_expires_old_samples():
+    window = RollingWindow(10.0)
+    for t, value in enumerate([5.0, 1.0, 9.0, 3.0]):
+        window.add(float(t), value)
+    window.add(12.0, 4.0)
+    summary = window.summary()
+    assert summary["count"] == 2
+    assert (summary["min"], summary["max"]) == (3.0, 4.0)
+    assert summary["mean"] == pytest.approx(3.5)
+
+
+def test_time_above_and_below_target():
+    stats = ChannelStats(max_gap=60.0)
+    start = time.time() - 100
+    for t, value in [(0, 10.0), (10, 30.0), (20, 30.0), (200, 10.0)]:
+        stats.add(start + t, value, target=20.0)
+    summary = stats.recent()
+    # 10 s below, 10 s above, the 180 s gap counts nowhere
+    assert (summary["below"], summary["above"]) == (10.0, 10.0)
+
+
+def test_add_many_matches_add():
+    rng = np.random.default_rng(6)
+    now = time.time()
+    t = np.arange(now - 20000, now, 0.5)
+    values = rng.uniform(10, 30, len(t))
+    values[::97] = np.nan
+    bulk = ChannelStats()
+    bulk.add_many(t, values, 20.0)
+    single = ChannelStats()
+    for ti, value in zip(t, values):
+        single.add(float(ti), float(value), 20.0)
+    for a, b in [(bulk.bucket.summary(), single.bucket.summary()), (bulk.recent(), single.recent())]:
+        assert a.keys() == b.keys()
+        for key in a:
+            assert a[key] == pytest.approx(b[key])
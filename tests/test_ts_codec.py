@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from RaspberryPi.ts_codec import encode, decode
+
+
+def round_trip(timestamps, columns, **kwargs):
+    ts, decoded = decode(encode(timestamps, columns, **kwargs))
+    # Timestamps are kept to the millisecond
+    np.testing.assert_array_equal(ts, np.round(np.asarray(timestamps) * 1000) / 1000)
+    assert set(decoded) == set(columns)
+    for name, values in columns.items():
+        values = np.asarray(values)
+        assert decoded[name].dtype == values.dtype
+        np.testing.assert_array_equal(decoded[name], values)
+    return decoded
+
+
+def test_empty():
+    ts, columns = decode(encode(np.empty(0), {}))
+    assert len(ts) == 0
+    assert columns == {}
+
+
+def test_single_sample():
+    round_trip(np.array([1.79e9]), {"temperature": np.array([21.5], dtype=np.float32)})
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_scaled_decimals(dtype):
+    rng = np.random.default_rng(1)
+    t = 1.79e9 + np.arange(5000) * 0.5
+    ph = np.round(6 + np.cumsum(rng.integers(-1, 2, len(t))) * 0.1, 1).astype(dtype)
+    round_trip(t, {"ph": ph})
+
+
+def test_noisy_floats_use_xor():
+    rng = np.random.default_rng(2)
+    t = 1.79e9 + np.arange(3000) * 0.5
+    round_trip(t, {"f4": rng.normal(20, 3, len(t)).astype(np.float32),
+                   "f8": rng.normal(0, 1, len(t))})
+
+
+def test_nan_and_leading_nan():
+    rng = np.random.default_rng(3)
+    t = 1.79e9 + np.arange(1000.0)
+    values = rng.normal(20, 3, len(t)).astype(np.float32)
+    values[::7] = np.nan
+    values[0] = np.nan
+    round_trip(t, {"noise": values, "all_nan": np.full(len(t), np.nan)})
+
+
+def test_integer_columns_at_their_extremes():
+    t = 1.79e9 + np.arange(6.0)
+    round_trip(t, {
+        "seq": np.array([1, 2, 3, 2 ** 63, 2 ** 64 - 1, 0], dtype=np.uint64),
+        "i8": np.array([0, -1, 2 ** 63 - 1, -2 ** 63, 5, -5], dtype=np.int64),
+        "u1": np.array([0, 255, 1, 128, 7, 9], dtype=np.uint8)
+    })
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1000])
+def test_odd_block_sizes(block_size):
+    rng = np.random.default_rng(4)
+    n = 333
+    t = 1.79e9 + np.arange(n) * 0.5 + rng.integers(-3, 4, n) / 1000
+    round_trip(t, {"temperature": rng.integers(0, 256, n).astype(np.float32),
+                   "seq": np.arange(1, n + 1, dtype=np.uint64)}, block_size=block_size)
+
+
+def test_irregular_timestamps():
+    rng = np.random.default_rng(5)
+    t = 1.79e9 + np.cumsum(rng.exponential(2.0, 2000))
+    round_trip(t, {"value": np.ones(len(t), dtype=np.float32)})
+
+
+def test_constant_series_compresses():
+    t = 1.79e9 + np.arange(10000) * 0.5
+    data = encode(t, {"temperature": np.full(len(t), 142.0, dtype=np.float32)})
+    assert len(data) < 200
+
+
+def test_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        decode(b"SAH1" + bytes(16))
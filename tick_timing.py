@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    # Low-overhead timing spans for the stages of the GUI tick. Each span
+    # costs two perf_counter_ns calls and two deque appends: the duration
+    # goes into a rolling window per stage (for p50/p95/max) and the raw
+    # span into a bounded ring that can be exported as a Chrome trace.
+    def __init__(self, window=600, trace_capacity=50000):
+        self.window = window
+        self.durations = {}
+        self.events = deque(maxlen=trace_capacity)
+        self.origin_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.record(name, start, end)
+
+    def record(self, name, start_ns, end_ns):
+        samples = self.durations.get(name)
+        if samples is None:
+            samples = self.durations[name] = deque(maxlen=self.window)
+        samples.append(end_ns - start_ns)
+        self.events.append((name, start_ns, end_ns - start_ns, threading.get_ident()))
+
+    def stats(self):
+        # stage -> dict of p50/p95/max/mean in milliseconds over the window
+        result = {}
+        for name, samples in list(self.durations.items()):
+            if not samples:
+                continue
+            values = np.fromiter(samples, dtype=np.int64) / 1e6
+            p50, p95 = np.percentile(values, [50, 95])
+            result[name] = {
+                "count": len(values),
+                "p50": float(p50),
+                "p95": float(p95),
+                "max": float(values.max()),
+                "mean": float(values.mean())
+            }
+        return result
+
+    def format_stats(self):
+        lines = [f"{'stage':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, s in sorted(self.stats().items(), key=lambda item: -item[1]["p95"]):
+            lines.append(f"{name:<28}{s['count']:>6}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['max']:>10.2f}")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        # Complete ("X") events, loadable in chrome://tracing or Perfetto
+        trace_events = [{
+            "name": name,
+            "cat": "tick",
+            "ph": "X",
+            "ts": (start - self.origin_ns) / 1000.0,
+            "dur": duration / 1000.0,
+            "pid": self.pid,
+            "tid": tid
+        } for name, start, duration, tid in list(self.events)]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return path
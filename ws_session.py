@@ -0,0 +1,140 @@
+import json
+import time
+
+from PyQt5.QtCore import QObject, QTimer, QUrl, QByteArray, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket
+from PyQt5.QtWebSockets import QWebSocket
+
+
+class PiSession(QObject):
+    # One full-duplex WebSocket session with the Pi (or ws_standin.py):
+    # telemetry is pushed down, commands go up, both as JSON text messages
+    # carrying a per-direction sequence number:
+    #   <- {"type": "telemetry", "seq": 41, "ts": ..., "sensors": {...}}
+    #   -> {"type": "command", "seq": 7, "states": {"HEATING": true}}
+    #   <- {"type": "ack", "seq": 42, "ack": 7, "states": {...}}
+    # Gaps in the incoming sequence are counted as lost messages. A
+    # WebSocket ping every `ping_interval` ms measures the round trip time.
+    # Everything runs on the GUI thread's event loop; readers only look at
+    # `latest`, so they never block on the network.
+    telemetry = pyqtSignal(dict)
+    acked = pyqtSignal(dict)
+    rtt_measured = pyqtSignal(float)
+
+    def __init__(self, url, parent=None, ping_interval=1000, reconnect_interval=2000):
+        super().__init__(parent)
+        self.url = QUrl(url)
+        self.socket = QWebSocket()
+        self.socket.setParent(self)
+        self.socket.connected.connect(self.on_connected)
+        self.socket.disconnected.connect(self.on_disconnected)
+        self.socket.textMessageReceived.connect(self.on_message)
+        self.socket.pong.connect(self.on_pong)
+
+        self.send_seq = 0
+        self.recv_seq = None
+        self.lost = 0
+        self.out_of_order = 0
+        self.latest = None
+        self.latest_at = None
+        self.last_ack = None
+        self.rtt = None
+        self.rtt_ewma = None
+        self.pending = {}
+        self.command_rtt = None
+
+        self.ping_timer = QTimer(self)
+        self.ping_timer.setInterval(ping_interval)
+        self.ping_timer.timeout.connect(self.ping)
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setInterval(reconnect_interval)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.open)
+
+    def open(self):
+        self.socket.open(self.url)
+
+    def close(self):
+        self.reconnect_timer.stop()
+        self.ping_timer.stop()
+        self.socket.disconnected.disconnect(self.on_disconnected)
+        self.socket.close()
+
+    def is_connected(self):
+        return self.socket.state() == QAbstractSocket.ConnectedState
+
+    def on_connected(self):
+        print(f"Session open to {self.url.toString()}")
+        self.recv_seq = None
+        self.ping_timer.start()
+
+    def on_disconnected(self):
+        self.ping_timer.stop()
+        self.pending.clear()
+        print(f"Session closed ({self.socket.errorString()}), reconnecting")
+        self.reconnect_timer.start()
+
+    def send_command(self, device_states):
+        # Returns the sequence number of the command, None when offline
+        if not self.is_connected():
+            return None
+        self.send_seq += 1
+        self.pending[self.send_seq] = time.perf_counter()
+        self.socket.sendTextMessage(json.dumps({"type": "command", "seq": self.send_seq, "states": device_states}))
+        return self.send_seq
+
+    def on_message(self, text):
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError as e:
+            print("Dropping malformed session message:", e)
+            return
+
+        seq = message.get("seq")
+        if seq is not None:
+            if self.recv_seq is not None:
+                if seq > self.recv_seq + 1:
+                    self.lost += seq - self.recv_seq - 1
+                elif seq <= self.recv_seq:
+                    self.out_of_order += 1
+                    return
+            self.recv_seq = seq
+
+        kind = message.get("type")
+        if kind == "telemetry":
+            self.latest = message
+            self.latest_at = time.monotonic()
+            self.telemetry.emit(message)
+        elif kind == "ack":
+            sent = self.pending.pop(message.get("ack"), None)
+            if sent is not None:
+                self.command_rtt = time.perf_counter() - sent
+            self.last_ack = message
+            self.acked.emit(message)
+
+    def ping(self):
+        self.socket.ping(QByteArray())
+
+    def on_pong(self, elapsed_ms, payload):
+        self.rtt = elapsed_ms / 1000.0
+        self.rtt_ewma = self.rtt if self.rtt_ewma is None else 0.8 * self.rtt_ewma + 0.2 * self.rtt
+        self.rtt_measured.emit(self.rtt)
+
+    def read_sensor(self, max_age=5.0):
+        # Latest pushed reading in the get_data.read_sensor() shape
+        if self.latest is None or time.monotonic() - self.latest_at > max_age:
+            return None, None, None
+        sensors = self.latest["sensors"]
+        return sensors.get('temperature'), sensors.get('soil_moisture'), sensors.get('humidity')
+
+    def stats(self):
+        return {
+            "connected": self.is_connected(),
+            "sent": self.send_seq,
+            "received": self.recv_seq,
+            "lost": self.lost,
+            "out_of_order": self.out_of_order,
+            "rtt": self.rtt,
+            "rtt_ewma": self.rtt_ewma,
+            "command_rtt": self.command_rtt
+        }
@@ -0,0 +1,101 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer
+from PyQt5.QtNetwork import QHostAddress
+from PyQt5.QtWebSockets import QWebSocketServer
+
+
+DEVICES = ["HEATING", "WATERING", "HUMIDIFIER", "WATER_PUMP", "LIGHTNING"]
+
+
+class SimulatedGreenhouse:
+    # Sensor values drifting with noise, pushed up or down by the devices
+    def __init__(self):
+        self.values = {"temperature": 20.0, "soil_moisture": 70.0, "humidity": 40.0}
+        self.states = {device: False for device in DEVICES}
+
+    def step(self, dt):
+        effects = {
+            "temperature": 0.5 if self.states["HEATING"] else -0.1,
+            "soil_moisture": 1.0 if self.states["WATERING"] else -0.2,
+            "humidity": 1.0 if self.states["HUMIDIFIER"] else -0.2
+        }
+        for name, rate in effects.items():
+            value = self.values[name] + rate * dt + random.gauss(0, 0.05)
+            self.values[name] = min(255.0, max(0.0, value))
+        return {name: round(value, 1) for name, value in self.values.items()}
+
+
+class StandInServer(QObject):
+    # Local stand-in for the Pi's WebSocket endpoint: pushes simulated
+    # telemetry to every client and applies and acknowledges commands,
+    # using the message format of ws_session.PiSession
+    def __init__(self, port=8765, interval=250, parent=None):
+        super().__init__(parent)
+        self.server = QWebSocketServer("SMARTAGR stand-in", QWebSocketServer.NonSecureMode, self)
+        if not self.server.listen(QHostAddress.Any, port):
+            raise OSError(self.server.errorString())
+        self.server.newConnection.connect(self.on_new_connection)
+        self.clients = {}
+        self.greenhouse = SimulatedGreenhouse()
+        self.last_step = time.monotonic()
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.push_telemetry)
+        self.timer.start()
+        print(f"Stand-in listening on ws://localhost:{port}")
+
+    def on_new_connection(self):
+        client = self.server.nextPendingConnection()
+        self.clients[client] = 0
+        client.textMessageReceived.connect(lambda text, client=client: self.on_message(client, text))
+        client.disconnected.connect(lambda client=client: self.on_disconnected(client))
+        print(f"Client connected from {client.peerAddress().toString()}")
+
+    def on_disconnected(self, client):
+        self.clients.pop(client, None)
+        client.deleteLater()
+
+    def send(self, client, message):
+        self.clients[client] += 1
+        message["seq"] = self.clients[client]
+        client.sendTextMessage(json.dumps(message))
+
+    def on_message(self, client, text):
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if message.get("type") != "command":
+            return
+        for device, state in message.get("states", {}).items():
+            if device.upper() in self.greenhouse.states:
+                self.greenhouse.states[device.upper()] = bool(state)
+        self.send(client, {"type": "ack", "ack": message.get("seq"), "states": dict(self.greenhouse.states)})
+
+    def push_telemetry(self):
+        now = time.monotonic()
+        sensors = self.greenhouse.step(now - self.last_step)
+        self.last_step = now
+        for client in list(self.clients):
+            self.send(client, {"type": "telemetry", "ts": time.time(), "sensors": sensors})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local WebSocket stand-in for the Pi")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--interval", type=int, default=250, help="telemetry push interval in ms")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    server = StandInServer(args.port, args.interval)
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()
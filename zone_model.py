@@ -0,0 +1,100 @@
+import numpy as np
+
+from actuator_journal import DEVICES
+
+
+CHANNELS = ["temperature", "soil_moisture", "humidity", "ph", "light", "water_level"]
+HISTORY_LENGTH = 24
+
+
+class ZoneModel:
+    # State of every zone as contiguous arrays: current readings
+    # (zones x channels), actuator states (zones x actuators) and the last
+    # `length` readings (zones x length x channels) in a ring written one
+    # tick at a time for all zones. NaN marks a missing reading. Cards,
+    # charts and control read slices; get()/set() serve single values.
+    def __init__(self, zones=1, channels=CHANNELS, actuators=DEVICES, length=HISTORY_LENGTH):
+        self.channels = list(channels)
+        self.actuators = list(actuators)
+        self.channel_index = {name: i for i, name in enumerate(self.channels)}
+        self.actuator_index = {name: i for i, name in enumerate(self.actuators)}
+        self.values = np.full((zones, len(self.channels)), np.nan)
+        self.states = np.zeros((zones, len(self.actuators)), dtype=bool)
+        self.history = np.full((zones, length, len(self.channels)), np.nan)
+        # Next ring slot and number of filled slots
+        self.head = 0
+        self.count = 0
+
+    @property
+    def zones(self):
+        return self.values.shape[0]
+
+    @property
+    def length(self):
+        return self.history.shape[1]
+
+    def channel_indexes(self, names):
+        return np.array([self.channel_index[name] for name in names], dtype=np.intp)
+
+    def actuator_indexes(self, names):
+        return np.array([self.actuator_index[name] for name in names], dtype=np.intp)
+
+    def get(self, zone, channel):
+        value = self.values[zone, self.channel_index[channel]]
+        return None if np.isnan(value) else float(value)
+
+    def set(self, zone, channel, value):
+        self.values[zone, self.channel_index[channel]] = np.nan if value is None else value
+
+    def state(self, zone, actuator):
+        return bool(self.states[zone, self.actuator_index[actuator]])
+
+    def set_state(self, zone, actuator, state):
+        self.states[zone, self.actuator_index[actuator]] = bool(state)
+
+    def push(self):
+        # Current readings of every zone become the newest history row
+        self.history[:, self.head, :] = self.values
+        self.head = (self.head + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def order(self):
+        # Ring slots of the filled history, oldest first
+        return (np.arange(self.count) + self.head - self.count) % self.length
+
+    def recent(self, zone, channel):
+        # History of one channel of one zone, oldest first
+        return self.history[zone, self.order(), self.channel_index[channel]]
+
+    def load_recent(self, zone, channel, values):
+        # Fills the newest slots with `values` (oldest first), e.g. from a
+        # saved snapshot
+        values = np.asarray([np.nan if v is None else v for v in values], dtype=float)[-self.length:]
+        if len(values) == 0:
+            return
+        slots = (np.arange(len(values)) + self.head - len(values)) % self.length
+        self.history[zone, slots, self.channel_index[channel]] = values
+        self.count = max(self.count, len(values))
+
+
+def format_reading(value, digits=0, unit=""):
+    # Card text of a reading: raw ADC bytes as "142", "--" when missing
+    if value is None or np.isnan(value):
+        return "--"
+    return f"{value:.{digits}f}{unit}"
+
+
+def zone_value(channel, zone=0):
+    # Scalar attribute backed by the owner's zone model (self.zones)
+    return property(lambda self: self.zones.get(zone, channel),
+                    lambda self, value: self.zones.set(zone, channel, value))
+
+
+def zone_state(actuator, zone=0):
+    return property(lambda self: self.zones.state(zone, actuator),
+                    lambda self, state: self.zones.set_state(zone, actuator, state))
+
+
+def zone_history(channel, zone=0):
+    return property(lambda self: self.zones.recent(zone, channel).tolist(),
+                    lambda self, values: self.zones.load_recent(zone, channel, values))